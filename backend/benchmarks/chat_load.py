@@ -0,0 +1,96 @@
+"""
+Load test for /api/chat against a fake OpenAI client.
+
+Runs batches of concurrent sessions through the chat pipeline and prints the
+throughput for each concurrency level. With the async client, throughput should
+grow with the number of sessions instead of staying flat at 1 / latency.
+
+Run from the backend directory:
+    python -m benchmarks.chat_load --latency 0.5 --requests 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import httpx
+from fastapi import FastAPI
+
+from routers import chatbot
+
+
+class FakeCompletions:
+    """Stand-in for client.chat.completions with a fixed response latency"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        content = json.dumps({
+            "text_explanation": "Sri Lanka is beautiful all year round 🌴",
+            "query_generation_status": "No",
+            "query": ""
+        })
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(chatbot.router, prefix="/api")
+    return app
+
+
+async def run_session(http: httpx.AsyncClient, session_index: int, requests_per_session: int):
+    session_id = (await http.post("/api/start_session")).json()["session_id"]
+    for i in range(requests_per_session):
+        response = await http.post("/api/chat", json={
+            "question": f"Tell me about Sri Lanka ({session_index}-{i})",
+            "session_id": session_id,
+            "settings": {
+                "language": "English",
+                "politeness_level": "Friendly",
+                "formality": "Casual",
+                "creativity": 0.7,
+                "response_length": "Medium"
+            }
+        })
+        response.raise_for_status()
+
+
+async def run_level(http: httpx.AsyncClient, sessions: int, requests_per_session: int) -> float:
+    start = time.perf_counter()
+    # The chat pipeline prints its prompts; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(run_session(http, s, requests_per_session) for s in range(sessions)))
+    elapsed = time.perf_counter() - start
+    return sessions * requests_per_session / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake completion latency in seconds")
+    parser.add_argument("--requests", type=int, default=4, help="Requests per session")
+    parser.add_argument("--levels", default="1,4,16,32,64", help="Comma separated session counts")
+    args = parser.parse_args()
+
+    chatbot.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(args.latency)))
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+        print(f"{'sessions':>8} {'req/s':>10} {'speedup':>8}")
+        baseline = None
+        for sessions in [int(level) for level in args.levels.split(",")]:
+            throughput = await run_level(http, sessions, args.requests)
+            baseline = baseline or throughput
+            print(f"{sessions:>8} {throughput:>10.2f} {throughput / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
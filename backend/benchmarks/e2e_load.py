@@ -0,0 +1,263 @@
+"""
+End-to-end load test of /api/chat, /api/chat_history and /weather with local stand-ins.
+
+Starts the fake OpenAI server (benchmarks.fake_openai) in a subprocess on
+127.0.0.1, replaces the Neo4j drivers with the fixture stub
+(benchmarks.stub_neo4j) and drives the real app in process with concurrent
+clients, then reports p50/p95/p99 latency and requests per second for each
+scenario. No network access, API key or database is needed, so it can run in
+CI: --save writes the results and --baseline fails the run when p95 latency
+or throughput regress by more than --tolerance.
+
+By default every chat question gets a request number, so each one goes through
+a completion; --cached asks the sample questions verbatim, which the fast
+path and the caches answer after the first round.
+
+Run from the backend directory:
+    python -m benchmarks.e2e_load --concurrency 32 --requests 200
+    python -m benchmarks.e2e_load --save benchmark.json
+    python -m benchmarks.e2e_load --baseline benchmark.json --tolerance 0.25
+
+Against a running server (start it with OPENAI_BASE_URL pointing at
+benchmarks.fake_openai and a local Neo4j loaded with data):
+    python -m benchmarks.e2e_load --target http://localhost:8000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.fake_openai import load_samples
+
+SETTINGS = {
+    "language": "English",
+    "politeness_level": "Friendly",
+    "formality": "Casual",
+    "creativity": 0.7,
+    "response_length": "Medium"
+}
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+          "November", "December", "all"]
+SCENARIOS = ("chat", "history", "weather")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_openai(latency: float, jitter: float) -> Tuple[subprocess.Popen, str]:
+    """Start benchmarks.fake_openai and wait until it answers; returns (process, base URL)"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(port), "--latency", str(latency),
+         "--jitter", str(jitter)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The fake OpenAI server exited during startup")
+        try:
+            httpx.get(f"{base_url}/v1/models", timeout=1).raise_for_status()
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("The fake OpenAI server did not start within 30 seconds")
+
+
+def build_app(openai_url: str, neo4j_latency: float, rows: int):
+    """Import the app with its stand-ins in place"""
+    # Table files of the run go to a scratch directory instead of static/temp
+    os.environ.setdefault("ARTIFACT_DIR", tempfile.mkdtemp(prefix="golk_benchmark_"))
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    from openai import AsyncOpenAI
+
+    import main
+    from benchmarks import stub_neo4j
+    from routers import chatbot
+    from routers.database import neo4j_registry
+
+    # Keep per-request logging out of the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    chatbot.client = AsyncOpenAI(base_url=f"{openai_url}/v1", api_key="benchmark", max_retries=0)
+    stub_neo4j.install(neo4j_registry, neo4j_latency, rows)
+    return main.app
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(percent / 100 * len(values)) - 1))]
+
+
+async def run_scenario(send: Callable[[int, int], Awaitable[httpx.Response]], requests: int,
+                       concurrency: int) -> Dict[str, Any]:
+    """Send requests from concurrency closed-loop workers and summarize their latencies"""
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        while True:
+            index = next(counter)
+            if index >= requests:
+                return
+            started = time.perf_counter()
+            try:
+                response = await send(worker_id, index)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1)
+    }
+
+
+async def run(http: httpx.AsyncClient, args) -> Dict[str, Dict[str, Any]]:
+    questions = [sample["question"] for sample in load_samples()]
+    sessions = [(await http.post("/api/start_session")).json()["session_id"] for _ in range(args.concurrency)]
+
+    def chat_question(index: int) -> str:
+        question = questions[index % len(questions)]
+        return question if args.cached else f"{question} (request {index})"
+
+    async def chat(worker_id: int, index: int) -> httpx.Response:
+        return await http.post("/api/chat", json={
+            "question": chat_question(index),
+            "session_id": sessions[worker_id],
+            "settings": SETTINGS
+        })
+
+    async def history(worker_id: int, index: int) -> httpx.Response:
+        return await http.get(f"/api/chat_history/{sessions[worker_id]}")
+
+    async def weather(worker_id: int, index: int) -> httpx.Response:
+        return await http.get(f"/weather/{MONTHS[index % len(MONTHS)]}")
+
+    senders = {"chat": chat, "history": history, "weather": weather}
+    results = {}
+    for name in args.scenarios:
+        if args.warmup:
+            await run_scenario(senders[name], args.warmup, min(args.warmup, args.concurrency))
+        results[name] = await run_scenario(senders[name], args.requests, args.concurrency)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float,
+            min_delta_ms: float) -> List[str]:
+    """Regressions of p95 latency and throughput against a saved run"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        # Sub-millisecond endpoints jitter by more than any tolerance, so small deltas are ignored
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance) and result["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms, baseline {base['p95_ms']} ms")
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']} req/s, baseline {base['rps']} req/s")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors, baseline {base['errors']}")
+    return regressions
+
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    print(f"{'scenario':<10} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['requests']:>8} {result['errors']:>6} {result['rps']:>9.2f} "
+              f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients, one chat session each")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests before each scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake completion latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra completion latency, as a fraction")
+    parser.add_argument("--neo4j-latency", type=float, default=0.005, help="Stub Neo4j round trip in seconds")
+    parser.add_argument("--rows", type=int, default=10, help="Rows the stub returns per generated query")
+    parser.add_argument("--cached", action="store_true", help="Ask the sample questions verbatim")
+    parser.add_argument("--target", help="Base URL of a running server instead of the in-process app")
+    parser.add_argument("--save", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Smallest p95 increase that counts")
+    args = parser.parse_args()
+
+    fake_openai = None
+    if args.target:
+        http = httpx.AsyncClient(base_url=args.target, timeout=120,
+                                 limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        fake_openai, openai_url = start_fake_openai(args.latency, args.jitter)
+        app = build_app(openai_url, args.neo4j_latency, args.rows)
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=120)
+
+    try:
+        # The chat pipeline prints its errors; keep them out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = await run(http, args)
+        if fake_openai is not None:
+            pipeline = (await http.get("/api/cache/stats")).json()
+            completions = httpx.get(f"{openai_url}/stats").json()
+            print(f"{completions['completions']} completions (max {completions['max_in_flight']} in flight), "
+                  f"fast path bypass rate {pipeline['fast_path']['bypass_rate']}, "
+                  f"{pipeline['single_flight']['query_generation']['coalesced']} coalesced generations")
+    finally:
+        await http.aclose()
+        if fake_openai is not None:
+            fake_openai.terminate()
+            fake_openai.wait()
+
+    print(f"{args.concurrency} clients, {args.requests} requests per scenario")
+    print_report(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+"""
+Fake OpenAI-compatible chat completions server with canned answers from routers/sample.json.
+
+Query generation requests (their prompt ends with the input question) are
+answered with the Cypher of the matching sample question, every other request
+(table insights, rejection messages) with a short canned text. Answers come
+after --latency seconds (plus up to --jitter of it at random), streamed in
+chunks spread over that time when stream=True, and report token usage.
+
+Run from the backend directory and point the backend at it:
+    python -m benchmarks.fake_openai --port 8100 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake python main.py
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SAMPLE_PATH = Path(__file__).resolve().parent.parent / "routers" / "sample.json"
+
+# The query prompt ends with the user's question; benchmarks.e2e_load may add a request suffix to it
+INPUT_QUESTION = re.compile(r"Input Question:\s*-+\s*(.*?)\s*$", re.DOTALL)
+REQUEST_SUFFIX = re.compile(r"\s*\(request \d+\)$")
+
+INSIGHTS = ("1. 🌴 Most of these places are rated 8 or higher.\n"
+            "2. 🏖️ The coastal options are the busiest from December to April.\n"
+            "3. 🚆 All of them are within a short drive of the nearest railway station.")
+
+STREAM_CHUNKS = 8
+
+
+def normalize(question: str) -> str:
+    return " ".join(REQUEST_SUFFIX.sub("", question).lower().split())
+
+
+def load_samples(path: Path = SAMPLE_PATH) -> List[Dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["data"]
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+class CannedAnswers:
+    """Answers for the chat pipeline's completions, looked up by the question in the prompt"""
+
+    def __init__(self, samples: List[Dict[str, str]]):
+        self.samples = samples
+        self.by_question = {normalize(sample["question"]): sample for sample in samples}
+
+    def answer(self, messages: List[Dict[str, Any]]) -> str:
+        # The question is in the last prompt message; a pre-flight retry adds feedback after it
+        match = next(filter(None, (INPUT_QUESTION.search(message_text(message)) for message in reversed(messages))),
+                     None)
+        if match is None:
+            return INSIGHTS
+        question = match.group(1)
+        # Unknown questions map onto a sample deterministically, so reruns generate the same queries
+        sample = self.by_question.get(normalize(question)) or \
+            self.samples[zlib.crc32(normalize(question).encode("utf-8")) % len(self.samples)]
+        return json.dumps({
+            "text_explanation": f"Here is what I found about {sample['question'].rstrip('?')} 🌴",
+            "query_generation_status": "Yes",
+            "query": sample["cypher_query"]
+        }, ensure_ascii=False)
+
+
+def usage(messages: List[Dict[str, Any]], content: str) -> Dict[str, Any]:
+    # About four characters per token is close enough for load numbers
+    prompt_tokens = sum(len(message_text(message)) for message in messages) // 4
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0}
+    }
+
+
+def create_app(latency: float = 0.5, jitter: float = 0.0, samples: Optional[List[Dict[str, str]]] = None) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    answers = CannedAnswers(samples or load_samples())
+    ids = itertools.count(1)
+    stats = {"completions": 0, "streamed": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def delay() -> float:
+        return latency * (1 + random.uniform(0, jitter))
+
+    def chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None,
+              usage_block: Optional[Dict[str, Any]] = None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [] if usage_block else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        if usage_block:
+            body["usage"] = usage_block
+        return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "fake")
+        content = answers.answer(messages)
+        completion_id = f"chatcmpl-fake-{next(ids)}"
+        stats["completions"] += 1
+
+        if body.get("stream"):
+            stats["streamed"] += 1
+
+            async def events():
+                stats["in_flight"] += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+                try:
+                    pause = delay() / STREAM_CHUNKS
+                    yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+                    size = -(-len(content) // STREAM_CHUNKS)
+                    for start in range(0, len(content), size):
+                        await asyncio.sleep(pause)
+                        yield chunk(completion_id, model, {"content": content[start:start + size]})
+                    yield chunk(completion_id, model, {}, finish_reason="stop")
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        yield chunk(completion_id, model, {}, usage_block=usage(messages, content))
+                    yield "data: [DONE]\n\n"
+                finally:
+                    stats["in_flight"] -= 1
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(delay())
+        finally:
+            stats["in_flight"] -= 1
+        return JSONResponse(content={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "finish_reason": "stop",
+                "logprobs": None
+            }],
+            "usage": usage(messages, content)
+        })
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "benchmark"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra latency, as a fraction of --latency")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.latency, args.jitter), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Bypass rate and accuracy of the template fast path against the sample.json golden set.
+
+Each sample question is answered leave-one-out: its own entry is removed from the
+retrieval candidates, so the fast path has to reuse a different sample as the
+template. The produced query is compared with the golden query after
+normalization. The questions are also tried with other area names to show how
+often a reworded near-duplicate skips the LLM.
+
+Run from the backend directory:
+    python -m benchmarks.fast_path
+"""
+import argparse
+import random
+
+from routers import cypher
+from routers.fast_path import (FAST_PATH_CANDIDATES, FAST_PATH_THRESHOLD, compile_template, known_entities,
+                                match_template)
+from routers.retrieval import few_shot_index
+
+AREAS = ["Ella", "Galle", "Kandy", "Mirissa", "Sigiriya", "Trincomalee", "Nuwara Eliya", "Arugam Bay", "Hikkaduwa"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=FAST_PATH_THRESHOLD)
+    parser.add_argument("--candidates", type=int, default=FAST_PATH_CANDIDATES)
+    parser.add_argument("--show-errors", action="store_true", help="print every mismatched query")
+    args = parser.parse_args()
+
+    snapshot = few_shot_index.snapshot
+    golden = list(zip(snapshot.questions, snapshot.queries))
+    entities = known_entities(snapshot.queries)
+    results = few_shot_index.search_batch([question for question, _ in golden], args.candidates + 1)
+
+    bypassed = correct = 0
+    for (question, query), candidates in zip(golden, results):
+        others = [candidate for candidate in candidates if candidate[0] != question][:args.candidates]
+        matched = match_template(question, others, args.threshold, entities)
+        if matched is None:
+            continue
+        bypassed += 1
+        if cypher.normalize(matched[0]) == cypher.normalize(query):
+            correct += 1
+        elif args.show_errors:
+            print(f"MISMATCH {question}\n  from: {matched[1]}\n  got:  {matched[0]}\n  want: {query}\n")
+
+    # Reworded near-duplicates: swap the area of each single-area sample for another one
+    random.seed(7)
+    variants = []
+    for question, query in golden:
+        template = compile_template(question, query)
+        areas = [value for kind, value, _ in template.slots.values() if kind == "string" and value in AREAS]
+        if len(template.slots) == 1 and areas:
+            variants.append(question.replace(areas[0], random.choice([a for a in AREAS if a != areas[0]]).lower()))
+    variant_results = few_shot_index.search_batch(variants, args.candidates)
+    variant_bypassed = sum(match_template(question, candidates, args.threshold, entities) is not None
+                           for question, candidates in zip(variants, variant_results))
+
+    print(f"golden set:           {len(golden)} questions (leave-one-out)")
+    print(f"threshold:            {args.threshold}  candidates: {args.candidates}")
+    print(f"bypass rate:          {bypassed / len(golden):.1%} ({bypassed})")
+    print(f"accuracy of bypassed: {correct / bypassed:.1%} ({correct}/{bypassed})" if bypassed else
+          "accuracy of bypassed: n/a")
+    print(f"reworded area swaps:  {variant_bypassed / len(variants):.1%} bypassed ({variant_bypassed}/{len(variants)})"
+          if variants else "reworded area swaps:  n/a")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark for the few-shot retrieval index.
+
+Compares the previous per-request lookup (dense cosine_similarity plus a full
+argsort) with the sparse dot product and argpartition top-k of the index, on
+sample.json replicated up to a larger example bank, and checks both return the
+same examples. Also times batch queries and a cold start from the saved artifact.
+
+Run from the backend directory:
+    python -m benchmarks.few_shot_index --examples 30000 --queries 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from routers.retrieval import FEW_SHOT_SAMPLES_PATH, FewShotIndex
+
+
+def build_samples(path: str, examples: int):
+    """Write an example bank of the requested size by varying the questions in sample.json"""
+    with open(FEW_SHOT_SAMPLES_PATH) as file:
+        items = json.load(file)["data"]
+    data = [
+        {"question": f"{item['question']} variant{index // len(items)}", "cypher_query": item["cypher_query"]}
+        for index, item in zip(range(examples), items * (examples // len(items) + 1))
+    ]
+    with open(path, "w") as file:
+        json.dump({"data": data}, file)
+    return [item["question"] for item in items]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, default=30000, help="size of the example bank")
+    parser.add_argument("--queries", type=int, default=200, help="number of questions to look up")
+    parser.add_argument("--top-n", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        samples_path = os.path.join(directory, "sample.json")
+        index_path = os.path.join(directory, "index.pkl")
+        originals = build_samples(samples_path, args.examples)
+        questions = [originals[i % len(originals)].lower() for i in range(args.queries)]
+
+        started = time.perf_counter()
+        index = FewShotIndex(samples_path, index_path)
+        fit_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        FewShotIndex(samples_path, index_path)
+        load_ms = (time.perf_counter() - started) * 1000
+        snapshot = index.snapshot
+
+        started = time.perf_counter()
+        previous = []
+        for question in questions:
+            similarities = cosine_similarity(snapshot.vectorizer.transform([question]), snapshot.matrix).flatten()
+            previous.append(similarities.argsort()[-args.top_n:][::-1])
+        previous_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        single = [index.search(question, args.top_n) for question in questions]
+        single_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        batch = index.search_batch(questions, args.top_n)
+        batch_ms = (time.perf_counter() - started) * 1000
+
+        mismatches = sum(
+            [round(score, 5) for _, _, score in results] != [round(score, 5) for _, _, score in batch_results]
+            for results, batch_results in zip(single, batch)
+        )
+        mismatches += sum(
+            sorted(round(float(value), 5) for value in cosine_similarity(
+                snapshot.vectorizer.transform([question]), snapshot.matrix).flatten()[indices])[::-1]
+            != [round(score, 5) for _, _, score in results]
+            for question, indices, results in zip(questions, previous, single)
+        )
+
+    print(f"examples: {args.examples}  queries: {args.queries}  top_n: {args.top_n}")
+    print(f"cold start, fit and save:   {fit_ms:9.1f} ms")
+    print(f"cold start, saved artifact: {load_ms:9.1f} ms")
+    print(f"dense cosine + argsort:     {previous_ms / args.queries:9.3f} ms/query")
+    print(f"sparse dot + argpartition:  {single_ms / args.queries:9.3f} ms/query")
+    print(f"batch search:               {batch_ms / args.queries:9.3f} ms/query")
+    print(f"mismatched results:         {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Entity extraction latency of the gazetteer.
+
+Loads the areas from Coordinates.csv plus a synthetic set of place, hotel and
+restaurant names of the size the Neo4j graph grows to, then times extraction over
+sample.json questions.
+
+Run from the backend directory:
+    python -m benchmarks.gazetteer --names 20000
+"""
+import argparse
+import random
+import time
+
+from routers.gazetteer import Entity, Gazetteer
+from routers.retrieval import few_shot_index
+
+WORDS = ["Lake", "View", "Rock", "Temple", "Beach", "Villa", "Hotel", "Resort", "Garden", "Hill", "Bay", "Fort",
+         "Falls", "Inn", "Lodge", "Cafe", "Kitchen", "Spice", "Palm", "Tea"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=20000, help="synthetic names added besides the areas")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(7)
+    gazetteer = Gazetteer()
+    labels = [("Place", "Place_To_Visit"), ("Accomadation", "Accommodation_Place_Name"), ("Restaurant", "Restaurant")]
+    synthetic = []
+    for index in range(args.names):
+        label, prop = labels[index % len(labels)]
+        synthetic.append(Entity(label, prop, f"{random.choice(WORDS)} {random.choice(WORDS)} {index}"))
+
+    started = time.perf_counter()
+    gazetteer.add_entities(synthetic)
+    questions = few_shot_index.snapshot.questions
+    gazetteer.extract(questions[0])  # Builds the failure links
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    mentions = 0
+    for _ in range(args.rounds):
+        for question in questions:
+            mentions += len(gazetteer.extract(question))
+    elapsed = time.perf_counter() - started
+    lookups = args.rounds * len(questions)
+
+    print(f"names: {gazetteer.stats()['entities']}  questions: {len(questions)}")
+    print(f"build:              {build_ms:9.1f} ms")
+    print(f"extract:            {elapsed / lookups * 1e6:9.1f} us/question")
+    print(f"mentions found:     {mentions // args.rounds}")
+
+
+if __name__ == "__main__":
+    main()
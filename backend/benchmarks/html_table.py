@@ -0,0 +1,86 @@
+"""
+Benchmark for rendering query results as HTML tables.
+
+Compares the old pandas pipeline (DataFrame, urlparse per URL cell, to_html and
+three full-string style replacements; kept here as the baseline) with the
+streaming TableRenderer.
+
+Run from the backend directory:
+    python -m benchmarks.html_table --rows 500
+"""
+import argparse
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from routers.html_table import render_html_table
+
+
+def legacy_make_url_link(value):
+    if pd.isna(value):
+        return ""
+    value_str = str(value).strip()
+    try:
+        result = urlparse(value_str)
+        is_valid = all([result.scheme, result.netloc])
+    except:
+        is_valid = False
+    if not is_valid:
+        return value_str
+    return f'<a href="{value_str}" style="color: #0066cc; text-decoration: none;" target="_blank">{value_str}</a>'
+
+
+def legacy_convert_to_html_table(data):
+    """convert_to_html_table as it was before the streaming renderer"""
+    df = pd.DataFrame(data)
+    url_columns = [col for col in df.columns if any(term in col.lower() for term in ['url', 'link', 'website', 'site'])]
+    for col in url_columns:
+        df[col] = df[col].apply(legacy_make_url_link)
+    html_table = df.to_html(classes=['table', 'table-striped', 'table-hover', 'table-bordered'], index=False,
+                            escape=False, table_id='result-table')
+    html_table = html_table.replace(
+        '<table', '<table style="border-collapse: collapse; border: 1px solid black; width: 100%;"')
+    html_table = html_table.replace(
+        '<th', '<th style="border: 1px solid black; text-align: center; padding: 8px; background-color: #f5f5f5;"')
+    html_table = html_table.replace(
+        '<td', '<td style="border: 1px solid black; text-align: left; padding: 8px; vertical-align: top;"')
+    return html_table
+
+
+def make_rows(count: int):
+    return [{
+        "Hotel": f"Hotel {i} & Spa",
+        "Area": "Nuwara-Eliya" if i % 2 else "Ella",
+        "Rating": round(6 + (i % 40) / 10, 1),
+        "Price": 12000 + i,
+        "Website": f"https://hotel{i}.example.lk/rooms?night=1&guests=2"
+    } for i in range(count)]
+
+
+def best_of(fn, rows, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(rows)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    legacy_ms = best_of(legacy_convert_to_html_table, rows, args.repeats)
+    # Render every row, as pandas does, instead of stopping at HTML_TABLE_MAX_ROWS
+    renderer_ms = best_of(lambda data: render_html_table(data, max_rows=len(data)), rows, args.repeats)
+    print(f"{args.rows} rows x {len(rows[0])} columns, best of {args.repeats}:")
+    print(f"  pandas DataFrame.to_html + replaces: {legacy_ms:8.2f} ms")
+    print(f"  TableRenderer:                       {renderer_ms:8.2f} ms  ({legacy_ms / renderer_ms:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
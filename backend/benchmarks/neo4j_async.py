@@ -0,0 +1,141 @@
+"""
+Concurrency benchmark for the sync and async Neo4j read paths.
+
+Runs the same Cypher read through execution.run_read_query (sync driver, both
+directly on the event loop and through the threadpool) and
+execution.run_read_query_async (async driver) against stub drivers that answer
+after a fixed round trip latency. The sync driver on the event loop serializes
+every request, the threadpool caps concurrency at its worker count, and the
+async driver overlaps all in-flight reads.
+
+Run from the backend directory:
+    python -m benchmarks.neo4j_async --latency 0.02 --concurrency 1 50 200
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from routers import execution
+
+QUERY = "MATCH (a:Area {Areas: 'Ella'})-[:HAS_PLACE]->(p:Place) RETURN p.Place_To_Visit AS place LIMIT 10"
+ROWS = [{"place": f"Place {i}"} for i in range(10)]
+
+
+class StubResult:
+    def __init__(self):
+        self._rows = iter(ROWS)
+
+    def __iter__(self):
+        return self._rows
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class StubSession:
+    """Session whose transactions take one network round trip"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def execute_read(self, work, *args):
+        time.sleep(self.latency)
+        return work(SyncTx(), *args)
+
+
+class AsyncStubSession(StubSession):
+    async def execute_read(self, work, *args):
+        await asyncio.sleep(self.latency)
+        return await work(AsyncTx(), *args)
+
+
+class SyncTx:
+    def run(self, text, params):
+        return StubResult()
+
+
+class AsyncTx:
+    async def run(self, text, params):
+        return StubResult()
+
+
+class StubDriver:
+    def __init__(self, latency: float, session_class=StubSession):
+        self.latency = latency
+        self.session_class = session_class
+
+    def session(self, **config):
+        return self.session_class(self.latency)
+
+
+async def sync_on_loop(driver):
+    return execution.run_read_query(driver, QUERY, dict)
+
+
+async def sync_in_threadpool(driver):
+    return await run_in_threadpool(execution.run_read_query, driver, QUERY, dict)
+
+
+async def async_driver(driver):
+    return await execution.run_read_query_async(driver, QUERY, dict)
+
+
+async def measure(mode, driver, concurrency: int, requests: int) -> float:
+    """Return reads per second with `concurrency` reads in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            rows, _ = await mode(driver)
+            assert len(rows) == len(ROWS)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub round trip per query in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 50, 200])
+    parser.add_argument("--requests", type=int, default=400, help="Reads per run")
+    args = parser.parse_args()
+
+    modes = [
+        ("sync driver on the event loop", sync_on_loop, StubDriver(args.latency)),
+        ("sync driver in the threadpool", sync_in_threadpool, StubDriver(args.latency)),
+        ("async driver", async_driver, StubDriver(args.latency, AsyncStubSession))
+    ]
+    print(f"Stub round trip {args.latency * 1000:.0f} ms, {args.requests} reads per run, reads/s:")
+    print(f"{'':32}" + "".join(f"{c:>10}" for c in args.concurrency))
+    for name, mode, driver in modes:
+        rates = []
+        for concurrency in args.concurrency:
+            # Serialized runs take requests * latency, so keep them short
+            requests = args.requests if mode is not sync_on_loop else min(args.requests, 50)
+            rates.append(await measure(mode, driver, concurrency, requests))
+        print(f"{name:32}" + "".join(f"{rate:>10.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
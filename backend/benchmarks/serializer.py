@@ -0,0 +1,128 @@
+"""
+Micro-benchmark for serializing Cypher results.
+
+Compares the old per-cell serialize_value (kept here as the baseline, followed
+by the json.loads(json.dumps(...)) round trip chat() used to do) with the
+column-typed RowSerializer, on records shaped like the chat queries' results.
+Both are timed up to the JSON bytes of the response.
+
+Run from the backend directory:
+    python -m benchmarks.serializer --rows 10000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+import neo4j
+import neo4j.time
+import numpy as np
+import pandas as pd
+
+from routers.serialization import RowSerializer
+
+AREAS = ["Nuwara-Eliya", "Ella", "Kandy", "Galle", "Anuradhapura", "Trincomalee"]
+
+
+def legacy_serialize_neo4j_value(val):
+    if isinstance(val, (neo4j.time.DateTime, neo4j.time.Date)):
+        return val.iso_format()
+    elif isinstance(val, neo4j.time.Time):
+        return str(val)
+    elif isinstance(val, (int, float, str, bool)):
+        return val
+    elif val is None:
+        return None
+    return str(val)
+
+
+def legacy_serialize_value(val):
+    """serialize_value as it was before the column-typed serializer"""
+    if pd.isna(val):
+        return None
+    elif isinstance(val, pd.Period):
+        return val.asfreq('D').strftime('%Y-%m-%d')
+    elif isinstance(val, (pd.Timestamp, datetime)):
+        iso_date = val.isoformat()
+        if '.' in iso_date:
+            iso_date = iso_date.split('.')[0] + 'Z'
+        return iso_date
+    elif isinstance(val, str):
+        try:
+            if 'T' in val or '-' in val:
+                parsed_date = pd.to_datetime(val)
+                return parsed_date.strftime('%Y-%m-%dT%H:%M:%SZ')
+        except:
+            return val
+    elif isinstance(val, np.integer):
+        return int(val)
+    elif isinstance(val, np.floating):
+        return float(val)
+    elif isinstance(val, np.bool_):
+        return bool(val)
+    elif isinstance(val, (np.ndarray, list)):
+        return [legacy_serialize_value(v) for v in val]
+    elif isinstance(val, dict):
+        return {k: legacy_serialize_value(v) for k, v in val.items()}
+    return legacy_serialize_neo4j_value(val)
+
+
+def legacy(records) -> bytes:
+    rows = [{key: legacy_serialize_value(value) for key, value in dict(record).items()} for record in records]
+    rows = json.loads(json.dumps(rows, default=str))
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def column_typed(records) -> bytes:
+    serializer = RowSerializer()
+    rows = [serializer(record) for record in records]
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def make_records(count: int):
+    keys = ["area", "place", "rating", "visitors", "last_updated", "opening_hours"]
+    records = []
+    for i in range(count):
+        records.append(neo4j.Record(zip(keys, [
+            AREAS[i % len(AREAS)],
+            f"Place {i}",
+            round(3 + (i % 20) / 10, 1),
+            i * 7,
+            neo4j.time.DateTime(2025, 1 + i % 12, 1 + i % 28, 8, 30),
+            None if i % 3 else "08:00-17:00"
+        ])))
+    return records
+
+
+def best_of(fn, records, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(records)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+    legacy_ms = best_of(legacy, records, args.repeats)
+    typed_ms = best_of(column_typed, records, args.repeats)
+
+    print(f"{args.rows} rows x {len(records[0])} columns, best of {args.repeats}:")
+    print(f"  per-cell serialize_value + JSON round trip: {legacy_ms:8.1f} ms")
+    print(f"  column-typed RowSerializer:                 {typed_ms:8.1f} ms  ({legacy_ms / typed_ms:.0f}x faster)")
+
+    # The old serializer rewrote any string pandas could parse as a date
+    first_legacy = json.loads(legacy(records[:1]))[0]
+    first_typed = json.loads(column_typed(records[:1]))[0]
+    print(f"  opening_hours of the first row: {first_legacy['opening_hours']!r} before, "
+          f"{first_typed['opening_hours']!r} now")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+In-process stand-in for the Neo4j drivers, answering from a fixture graph.
+
+Every session round trip waits a fixed latency (time.sleep on the sync driver,
+asyncio.sleep on the async one), so pool, threadpool and event loop behaviour
+stay realistic without a database. The fixture has the twelve Weather nodes
+the /weather endpoints read; generated Cypher gets fixture rows for the
+aliases of its RETURN clause, filled with the place names in its parameters.
+Schema and gazetteer introspection get no rows, so the static schema prompt
+and the bundled names stay in use.
+
+Used by benchmarks.e2e_load; install it on the registry before the first request:
+    from benchmarks import stub_neo4j
+    stub_neo4j.install(neo4j_registry, latency=0.005)
+"""
+import asyncio
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import neo4j
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+          "November", "December"]
+
+# Southwest monsoon from May to September, northeast monsoon from December to February
+SEASONS = {month: "Southwest Monsoon" if 4 <= index <= 8 else "Northeast Monsoon" if index in (0, 1, 11)
+           else "Inter-monsoon" for index, month in enumerate(MONTHS)}
+
+WEATHER = [{
+    "month": month,
+    "description": f"{SEASONS[month]} weather across the island",
+    "season": SEASONS[month],
+    "avg_temp": round(26.5 + 1.5 * (index in (2, 3, 4)), 1),
+    "avg_precip": round(4.0 + 6.0 * (SEASONS[month] != "Inter-monsoon"), 1),
+    "precip_prob": 0.6 if SEASONS[month] != "Inter-monsoon" else 0.35
+} for index, month in enumerate(MONTHS)]
+
+# Catalog, schema and gazetteer probes: no rows, so the app keeps its bundled defaults
+INTROSPECTION = re.compile(r"^\s*(CALL|SHOW)\b|MATCH \(n:`", re.IGNORECASE)
+RETURN_CLAUSE = re.compile(r"\bRETURN\b(?!.*\bRETURN\b)(.*)", re.IGNORECASE | re.DOTALL)
+ALIAS = re.compile(r"\bAS\s+`?(\w+)`?", re.IGNORECASE)
+NUMERIC_ALIAS = re.compile(r"rating|price|temp|precip|distance|count|prob|km|score", re.IGNORECASE)
+URL_ALIAS = re.compile(r"url|link|website|site", re.IGNORECASE)
+
+
+def fixture_rows(text: str, params: Dict[str, Any], rows: int) -> List[neo4j.Record]:
+    """Records a query would return from the fixture graph"""
+    if INTROSPECTION.search(text):
+        return []
+    if ":Weather" in text:
+        month = params.get("month")
+        return [neo4j.Record(weather) for weather in WEATHER if month in (None, weather["month"])]
+
+    clause = RETURN_CLAUSE.search(text)
+    aliases = ALIAS.findall(clause.group(1)) if clause else []
+    if not aliases:
+        return []
+    place = next((value for value in params.values() if isinstance(value, str)), "Sri Lanka")
+    records = []
+    for row in range(rows):
+        values = []
+        for alias in aliases:
+            if NUMERIC_ALIAS.search(alias):
+                values.append(round(6 + (row % 40) / 10, 1))
+            elif URL_ALIAS.search(alias):
+                values.append(f"https://example.lk/{place.lower().replace(' ', '-')}/{row + 1}")
+            else:
+                values.append(f"{place} {alias.replace('_', ' ')} {row + 1}")
+        records.append(neo4j.Record(zip(aliases, values)))
+    return records
+
+
+class StubResult:
+    """Result iterable both ways, like the sync and async driver results"""
+
+    def __init__(self, records: List[neo4j.Record]):
+        self._records = records
+        self._iterator = iter(records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __aiter__(self):
+        self._iterator = iter(self._records)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    def single(self) -> Optional[neo4j.Record]:
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        # An EXPLAIN of a read query: no plan operators to judge
+        return SimpleNamespace(plan=None, query_type="r")
+
+
+class StubTransaction:
+    def __init__(self, driver: "StubDriver"):
+        self.driver = driver
+
+    def run(self, text: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> StubResult:
+        return self.driver.answer(text, {**(params or {}), **kwargs})
+
+
+class AsyncStubTransaction(StubTransaction):
+    async def run(self, text: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> StubResult:
+        return self.driver.answer(text, {**(params or {}), **kwargs})
+
+
+class StubSession:
+    """Session whose every query or transaction takes one round trip"""
+
+    def __init__(self, driver: "StubDriver"):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, text: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> StubResult:
+        time.sleep(self.driver.latency)
+        return self.driver.answer(text, {**(params or {}), **kwargs})
+
+    def execute_read(self, work, *args, **kwargs):
+        time.sleep(self.driver.latency)
+        return work(StubTransaction(self.driver), *args, **kwargs)
+
+    execute_write = execute_read
+
+
+class AsyncStubSession(StubSession):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, text: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> StubResult:
+        await asyncio.sleep(self.driver.latency)
+        return self.driver.answer(text, {**(params or {}), **kwargs})
+
+    async def execute_read(self, work, *args, **kwargs):
+        await asyncio.sleep(self.driver.latency)
+        return await work(AsyncStubTransaction(self.driver), *args, **kwargs)
+
+    execute_write = execute_read
+
+
+class StubDriver:
+    """Sync driver stand-in; counts the queries it answered"""
+
+    session_class = StubSession
+
+    def __init__(self, latency: float = 0.005, rows: int = 10):
+        self.latency = latency
+        self.rows = rows
+        self.queries = 0
+
+    def answer(self, text: str, params: Dict[str, Any]) -> StubResult:
+        self.queries += 1
+        return StubResult(fixture_rows(text, params, self.rows))
+
+    def session(self, **config):
+        return self.session_class(self)
+
+    def close(self):
+        pass
+
+
+class AsyncStubDriver(StubDriver):
+    session_class = AsyncStubSession
+
+    async def close(self):
+        pass
+
+
+def install(registry, latency: float = 0.005, rows: int = 10):
+    """Replace the registry's drivers with stubs; returns (sync driver, async driver)"""
+    registry.driver = StubDriver(latency, rows)
+    registry.async_driver = AsyncStubDriver(latency, rows)
+    return registry.driver, registry.async_driver
@@ -1,10 +1,16 @@
 from typing import Optional, List
 from enum import Enum
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, BackgroundTasks, Query, Path
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from routers import chatbot
+from routers import artifacts
+from routers import metrics
 import logging
+from routers.database import neo4j_registry
 from routers.scheduler import weather_scheduler, run_weather_batch_update
 
 # Setup logging
@@ -18,11 +24,59 @@ logging.basicConfig(
 )
 logger = logging.getLogger("main")
 
-app = FastAPI(title="GoLK - AI Tour Guide")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared Neo4j driver on startup and close it on shutdown."""
+    logger.info("Starting application")
+
+    # One pooled driver serves every request, the scheduler and the weather endpoints
+    await run_in_threadpool(neo4j_registry.connect)
+    await neo4j_registry.connect_async()
+    logger.info(f"Neo4j driver ready: {neo4j_registry.stats()}")
+
+    # Start the weather scheduler in the background
+    weather_scheduler.start()
+    logger.info("Weather scheduler started")
+
+    # Build the compact schema prompt from the live database before the first chat
+    from routers.schema import schema_prompt
+    await run_in_threadpool(schema_prompt.refresh, neo4j_registry)
+    logger.info(f"Schema prompt ready: {schema_prompt.stats()}")
+
+    # Compile the static query prompt prefix once so the first request does not pay for it
+    from routers.prompts import build_query_static_prompt
+    build_query_static_prompt(schema_prompt.get(neo4j_registry))
+
+    from routers.retrieval import few_shot_index
+    logger.info(f"Few-shot index ready: {few_shot_index.stats()}")
+
+    # Load area, place, hotel and restaurant names for entity extraction
+    from routers.gazetteer import gazetteer
+    await run_in_threadpool(gazetteer.refresh, neo4j_registry)
+    logger.info(f"Gazetteer ready: {gazetteer.stats()}")
+
+    # Drop table files that expired while the server was down
+    await run_in_threadpool(artifacts.artifact_store.evict)
+
+    yield
+
+    # The scheduler thread is a daemon; close the pool so connections are released cleanly
+    logger.info("Stopping application")
+    neo4j_registry.close()
+    await neo4j_registry.close_async()
+
+
+app = FastAPI(title="GoLK - AI Tour Guide", lifespan=lifespan)
 
 # Include chatbot routes
 app.include_router(chatbot.router, prefix="/api", tags=["Chatbot"])
 
+# Serve the HTML tables linked from chat answers
+app.include_router(artifacts.router, tags=["Artifacts"])
+
+# Prometheus metrics: stage latencies, OpenAI tokens and Neo4j pool gauges
+app.include_router(metrics.router, tags=["Metrics"])
+
 
 @app.get("/favicon.ico")
 async def favicon():
@@ -34,14 +88,10 @@ def home():
     return {"message": "Welcome to GoLK - Your AI-Powered Sri Lanka Tour Guide!"}
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup."""
-    logger.info("Starting application")
-
-    # Start the weather scheduler in the background
-    weather_scheduler.start()
-    logger.info("Weather scheduler started")
+@app.get("/neo4j/stats", tags=["Health"])
+def get_neo4j_stats():
+    """Connection pool usage of the shared Neo4j driver."""
+    return neo4j_registry.stats()
 
 
 class Month(str, Enum):
@@ -70,22 +120,14 @@ async def get_weather_by_month(
 
     Returns weather information for Sri Lanka based on the specified month.
     """
-    from routers.scheduler import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
-    from neo4j import GraphDatabase
-
     logger.info(f"Weather data requested for month: {month}")
 
     try:
-        # Connect to Neo4j
-        driver = GraphDatabase.driver(
-            NEO4J_URI,
-            auth=(NEO4J_USER, NEO4J_PASSWORD)
-        )
-
-        with driver.session() as session:
+        # The async driver waits on Neo4j without blocking the event loop
+        async with neo4j_registry.async_session() as session:
             if month == Month.All:
                 # Get weather data for all months
-                result = session.run("""
+                result = await session.run("""
                     MATCH (w:Weather)
                     RETURN w.Month as month, 
                            w.Description as description,
@@ -110,7 +152,7 @@ async def get_weather_by_month(
                 """)
             else:
                 # Get weather data for specific month
-                result = session.run("""
+                result = await session.run("""
                     MATCH (w:Weather {Month: $month})
                     RETURN w.Month as month, 
                            w.Description as description,
@@ -122,7 +164,7 @@ async def get_weather_by_month(
 
             # Process results
             weather_data = []
-            for record in result:
+            async for record in result:
                 weather_data.append({
                     "month": record["month"],
                     "description": record["description"],
@@ -140,9 +182,6 @@ async def get_weather_by_month(
     except Exception as e:
         logger.error(f"Error retrieving weather data: {str(e)}")
         return {"error": "Failed to retrieve weather data", "details": str(e)}
-    finally:
-        if 'driver' in locals():
-            driver.close()
 
 
 @app.post("/weather/update/month/{month}", tags=["Weather"])
@@ -161,7 +200,6 @@ async def update_specific_month(
     def run_month_update():
         from routers.scheduler import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
         from routers.weatherapi import WeatherUpdater
-        from neo4j import GraphDatabase
         import pandas as pd
 
         try:
@@ -182,13 +220,8 @@ async def update_specific_month(
             if areas:
                 coords_df = coords_df[coords_df['Area'].isin(areas)]
 
-            # Connect to Neo4j to ensure Weather node for month exists
-            driver = GraphDatabase.driver(
-                NEO4J_URI,
-                auth=(NEO4J_USER, NEO4J_PASSWORD)
-            )
-
-            with driver.session() as session:
+            # Ensure Weather node for month exists
+            with neo4j_registry.session() as session:
                 # Create or ensure Weather node for this month exists
                 session.run("""
                     MERGE (w:Weather {Month: $month})
@@ -201,7 +234,7 @@ async def update_specific_month(
                 lat = float(row['Latitude'])
                 lon = float(row['Longitude'])
 
-                with driver.session() as session:
+                with neo4j_registry.session() as session:
                     # Create relationship between area and this month's weather
                     session.run("""
                         MATCH (a:Area {Areas: $area})
@@ -212,13 +245,14 @@ async def update_specific_month(
                 # Now trigger actual weather data update for this location
                 updater._update_monthly_weather_data(area, lat, lon)
 
+            # Cached answers about weather are stale once new weather data is written
+            from routers.cache import invalidate_weather
+            invalidate_weather()
+
             logger.info(f"Completed update for month {month}")
 
         except Exception as e:
             logger.error(f"Error updating month {month}: {str(e)}")
-        finally:
-            if 'driver' in locals():
-                driver.close()
 
     background_tasks.add_task(run_month_update)
 
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response
+
+logger = logging.getLogger("artifacts")
+
+# Configuration
+ARTIFACT_DIR = Path(os.getenv("ARTIFACT_DIR", str(Path(__file__).resolve().parent.parent / "static" / "temp")))
+ARTIFACT_TTL_SECONDS = float(os.getenv("ARTIFACT_TTL_SECONDS", str(24 * 3600)))  # Unused tables are deleted after this
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(200 * 1024 * 1024)))  # Disk quota, oldest tables go first
+ARTIFACT_EVICT_SECONDS = float(os.getenv("ARTIFACT_EVICT_SECONDS", "300"))  # Minimum gap between eviction sweeps
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+ARTIFACT_ROUTE = "/static/temp"
+
+# Names the store hands out: a prefix and the SHA-256 of the content
+ARTIFACT_NAME = re.compile(r"^[a-z]+_([0-9a-f]{64})\.html$")
+
+router = APIRouter()
+
+
+class ArtifactStore:
+    """Content-addressed files: identical content is written once and unused files expire"""
+
+    def __init__(self, directory: Path = ARTIFACT_DIR, ttl: float = ARTIFACT_TTL_SECONDS,
+                 max_bytes: int = ARTIFACT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.writes = 0
+        self.duplicates = 0
+        self.evictions = 0
+        self._swept_at = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def put(self, content: Union[str, bytes], prefix: str = "table") -> str:
+        """Store content and return its file name"""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        name = f"{prefix}_{hashlib.sha256(data).hexdigest()}.html"
+        path = self.directory / name
+        try:
+            # Already stored: only mark it as used so the TTL starts over
+            os.utime(path)
+            self.duplicates += 1
+        except FileNotFoundError:
+            # Write next to the target and rename, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp_")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self.writes += 1
+        self.maybe_evict()
+        return name
+
+    def path(self, name: str) -> Optional[Path]:
+        """Path of a stored file, or None for unknown or malformed names"""
+        if not ARTIFACT_NAME.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def touch(self, name: str) -> Optional[Path]:
+        """Path of a stored file, marked as used so it does not expire while it is still being read"""
+        path = self.path(name)
+        if path is None:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def url(self, name: str) -> str:
+        return f"{API_BASE_URL}{ARTIFACT_ROUTE}/{name}"
+
+    def maybe_evict(self):
+        if time.time() - self._swept_at >= ARTIFACT_EVICT_SECONDS:
+            self.evict()
+
+    def evict(self) -> int:
+        """Delete expired files, then the least recently used ones until the store fits its quota"""
+        with self._lock:
+            self._swept_at = now = time.time()
+            files = []
+            removed = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                is_artifact = ARTIFACT_NAME.match(entry.name) is not None
+                age = now - stat.st_mtime
+                # Leftovers of interrupted writes are removed once they are clearly abandoned
+                if (is_artifact and age > self.ttl) or (entry.name.startswith(".tmp_") and age > 3600):
+                    removed += self._remove(entry.path)
+                elif is_artifact:
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                removed += self._remove(path)
+                total -= size
+
+            self.evictions += removed
+            if removed:
+                logger.info(f"Evicted {removed} table files, {total} bytes remain")
+            return removed
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.unlink(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        files = [entry.stat().st_size for entry in os.scandir(self.directory)
+                 if entry.is_file() and ARTIFACT_NAME.match(entry.name)]
+        return {
+            "files": len(files),
+            "bytes": sum(files),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "writes": self.writes,
+            "duplicates": self.duplicates,
+            "evictions": self.evictions
+        }
+
+
+# Global instance to be imported by other modules
+artifact_store = ArtifactStore()
+
+
+@router.get(ARTIFACT_ROUTE + "/{name}")
+async def get_artifact(name: str, request: Request):
+    """Serve a stored table; the name is its content hash, so it never changes"""
+    path = await run_in_threadpool(artifact_store.touch, name)
+    if path is None:
+        return JSONResponse(content={"error": "Table not found"}, status_code=404)
+
+    etag = f'"{ARTIFACT_NAME.match(name).group(1)}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={int(artifact_store.ttl)}, immutable"
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="text/html; charset=utf-8", headers=headers)
@@ -0,0 +1,391 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger("cache")
+
+# Configuration
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # "memory" or "sqlite"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".response_cache.sqlite")  # Shared file for the sqlite backend
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # Seconds an entry stays valid
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # Total size cap
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))  # Entry count cap
+CYPHER_CACHE_TTL = float(os.getenv("CYPHER_CACHE_TTL", str(6 * 3600)))  # Static tourism data changes rarely
+CYPHER_CACHE_WEATHER_TTL = float(os.getenv("CYPHER_CACHE_WEATHER_TTL", "1800"))  # Also dropped when weather is written
+CYPHER_CACHE_MAX_BYTES = int(os.getenv("CYPHER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CYPHER_CACHE_MAX_ENTRIES = int(os.getenv("CYPHER_CACHE_MAX_ENTRIES", "5000"))
+NEO4J_QUERY_CACHE_SIZE = int(os.getenv("NEO4J_QUERY_CACHE_SIZE", "1000"))  # server.db.query_cache_size of the server
+
+
+class CacheBackend:
+    """Interface for the cache backends: LRU eviction, TTL expiry, a byte budget and tag invalidation"""
+
+    def __init__(self, name: str, default_ttl: float, max_bytes: int, max_entries: int):
+        self.name = name
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Remove every entry stored with the tag and return how many were removed"""
+        raise NotImplementedError
+
+    # Used from request handlers; backends that do I/O override these to keep it off the event loop
+    async def get_async(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def set_async(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        self.set(key, value, ttl, tags)
+
+    async def delete_async(self, key: str):
+        self.delete(key)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def size(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counters together with the current size"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            **self.size()
+        }
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache, safe to share between the event loop and the scheduler thread"""
+
+    def __init__(self, name: str, default_ttl: float, max_bytes: int, max_entries: int):
+        super().__init__(name, default_ttl, max_bytes, max_entries)
+        self._entries = OrderedDict()  # key -> (value, expires_at, size, tags), oldest first
+        self._tags: Dict[str, set] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        size = len(json.dumps(value, default=str).encode("utf-8")) + len(key)
+        if size > self.max_bytes:
+            return
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.time() + (self.default_ttl if ttl is None else ttl), size, tags)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            # Evict least recently used entries until both budgets are respected
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def size(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key: str):
+        """Drop an entry; the caller holds the lock"""
+        value, expires_at, size, tags = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache stored in a SQLite file so several uvicorn workers share the same entries"""
+
+    def __init__(self, name: str, default_ttl: float, max_bytes: int, max_entries: int, path: str):
+        super().__init__(name, default_ttl, max_bytes, max_entries)
+        self.path = path
+        self.table = f"cache_{name}"
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    tags TEXT NOT NULL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_lru ON {self.table} (last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        return await run_in_threadpool(self.get, key)
+
+    async def set_async(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        await run_in_threadpool(self.set, key, value, ttl, tags)
+
+    async def delete_async(self, key: str):
+        await run_in_threadpool(self.delete, key)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[1] <= now:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        payload = json.dumps(value, default=str)
+        size = len(payload.encode("utf-8")) + len(key)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        # Tags are stored comma delimited on both ends so a LIKE match never hits a partial name
+        tag_text = "," + ",".join(sorted(set(tags))) + ","
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access, size, tags) "
+                f"VALUES (?, ?, ?, ?, ?, ?)",
+                (key, payload, now + (self.default_ttl if ttl is None else ttl), now, size, tag_text)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float):
+        """Drop expired rows, then least recently used rows until both budgets are respected"""
+        self.expirations += conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+        entries, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access").fetchall():
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            entries -= 1
+            total -= size
+            self.evictions += 1
+
+    def delete(self, key: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def invalidate_tag(self, tag: str) -> int:
+        with closing(self._connect()) as conn, conn:
+            removed = conn.execute(f"DELETE FROM {self.table} WHERE tags LIKE ?", (f"%,{tag},%",)).rowcount
+        self.invalidations += removed
+        return removed
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def size(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn:
+            entries, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        return {"entries": entries, "bytes": total}
+
+
+class PlanCacheTracker:
+    """Estimate Neo4j's plan cache hit rate by replaying the query texts sent through an LRU of the same size"""
+
+    def __init__(self, size: int = NEO4J_QUERY_CACHE_SIZE):
+        self.size = size
+        self._texts = {"raw": OrderedDict(), "parameterized": OrderedDict()}
+        self._counts = {name: {"hits": 0, "misses": 0} for name in self._texts}
+        self._lock = threading.Lock()
+
+    def record(self, raw_text: str, parameterized_text: str):
+        """Count a query both as generated and as parameterized, so the two hit rates can be compared"""
+        with self._lock:
+            for name, text in (("raw", raw_text), ("parameterized", parameterized_text)):
+                texts = self._texts[name]
+                if text in texts:
+                    texts.move_to_end(text)
+                    self._counts[name]["hits"] += 1
+                else:
+                    texts[text] = None
+                    self._counts[name]["misses"] += 1
+                    if len(texts) > self.size:
+                        texts.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {"size": self.size}
+            for name, counts in self._counts.items():
+                lookups = counts["hits"] + counts["misses"]
+                stats[name] = {
+                    **counts,
+                    "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+                    "distinct_texts": len(self._texts[name])
+                }
+            return stats
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key, until its result is cached"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() for the first caller of a key; callers arriving while it runs wait for the same result"""
+        task, _ = self.start(key, fn)
+        return await asyncio.shield(task)
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Task, bool]:
+        """Start fn() unless a call of the key is in flight; returns (its task, whether this caller started it)"""
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task, False
+        # A task, so a caller that disconnects does not cancel the call for the others
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task, True
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception even when every caller has gone away, so it is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "coalesce_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0
+        }
+
+
+def create_cache(name: str, backend: str = RESPONSE_CACHE_BACKEND, default_ttl: float = RESPONSE_CACHE_TTL,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 path: str = RESPONSE_CACHE_PATH) -> CacheBackend:
+    """Create a cache with the configured backend, falling back to memory if SQLite is unavailable"""
+    if backend == "sqlite":
+        try:
+            return SQLiteCacheBackend(name, default_ttl, max_bytes, max_entries, path)
+        except sqlite3.Error as e:
+            logger.error(f"Could not open SQLite cache at {path}, using memory instead: {str(e)}")
+    return MemoryCacheBackend(name, default_ttl, max_bytes, max_entries)
+
+
+# Tag for entries that depend on weather data, invalidated whenever the scheduler writes it
+WEATHER_TAG = "weather"
+
+# Labels and relationship types whose data is rewritten by the weather scheduler
+CYPHER_LABEL_TTLS = {
+    "Weather": CYPHER_CACHE_WEATHER_TTL,
+    "HAS_WEATHER": CYPHER_CACHE_WEATHER_TTL
+}
+
+# Cache of generated query responses, keyed on the question and settings
+response_cache = create_cache("response")
+
+# Cache of Cypher results, keyed on the normalized query fingerprint
+cypher_cache = create_cache("cypher", default_ttl=CYPHER_CACHE_TTL, max_bytes=CYPHER_CACHE_MAX_BYTES,
+                            max_entries=CYPHER_CACHE_MAX_ENTRIES)
+
+
+def cypher_cache_policy(query_labels) -> Tuple[float, List[str]]:
+    """Return the TTL and tags for a query result: the shortest TTL of any label it touches"""
+    ttl = min([CYPHER_LABEL_TTLS.get(label, CYPHER_CACHE_TTL) for label in query_labels] or [CYPHER_CACHE_TTL])
+    tags = [WEATHER_TAG] if any(label in CYPHER_LABEL_TTLS for label in query_labels) else []
+    return ttl, tags
+
+
+def invalidate_weather() -> int:
+    """Drop every cached response and query result that depends on weather data"""
+    return response_cache.invalidate_tag(WEATHER_TAG) + cypher_cache.invalidate_tag(WEATHER_TAG)
+
+
+# Estimated Neo4j plan cache hits, before and after literals are lifted into parameters
+plan_cache_tracker = PlanCacheTracker()
+
+# Identical requests that arrive while the first one is still running wait for its result
+query_flight = SingleFlight("query_generation")
+cypher_flight = SingleFlight("cypher")
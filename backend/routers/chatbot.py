@@ -1,38 +1,41 @@
-import neo4j
-from neo4j import GraphDatabase, time
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
-import numpy as np
 from dotenv import load_dotenv
 import os
 import json
-from datetime import datetime
 from pydantic import BaseModel
-import uvicorn
-from fastapi import FastAPI, HTTPException, status, Depends, responses, security, BackgroundTasks, Form
-from fastapi.responses import FileResponse
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.responses import JSONResponse
-from fastapi.middleware.cors import CORSMiddleware
-import uuid
-from typing import Dict, List
-from datetime import datetime
-import random
-import ast
-from fastapi import APIRouter, HTTPException
-from pathlib import Path
-from openai import OpenAI
-from routers import prompts
-from routers.prompts import db_structure, settings_prompt
-import pandas as pd
-from urllib.parse import urlparse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi import APIRouter, Query, Request
+from routers import cypher
+from routers.schema import schema_prompt
+from routers.retrieval import few_shot_index
+from routers.fast_path import fast_path
+from routers.gazetteer import gazetteer
+from routers import preflight
+from routers import execution
+from routers import metrics
+from routers.serialization import RowSerializer
+from routers.html_table import render_html_table
+from routers.artifacts import artifact_store
+from routers.sessions import session_store
+from routers.query_output import query_output_parser, response_format, refusal_output
+from routers.database import neo4j_registry, get_async_driver
+from routers.cache import response_cache, cypher_cache, cypher_cache_policy, plan_cache_tracker, WEATHER_TAG
+from routers.cache import query_flight, cypher_flight, create_cache
+from routers.prompts import settings_prompt
+from routers.prompts import build_query_static_prompt, build_query_settings_prompt, build_query_dynamic_prompt
+from routers.prompts import REJECTION_OPENINGS, REJECTION_FORMALITIES, REJECTION_FOLLOW_UPS
+from routers.prompts import FAST_PATH_EXPLANATIONS
 from functools import lru_cache
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 import hashlib
+import asyncio
+import logging
+import re
+import time
+from openai import AsyncOpenAI
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger("chatbot")
 
-# In-memory storage for chat histories
-chat_histories: Dict[str, Dict[str, List[str]]] = {}
 
 # Create FastAPI instance
 router = APIRouter()
@@ -63,43 +66,37 @@ username = os.getenv("NEO4J_USERNAME")
 password = os.getenv("NEO4J_PASSWORD")
 openai_api_key = os.getenv("OPENAI_API_KEY")
 deployment = os.getenv("DEPLOYMENT_NAME", "gpt-4.1-2025-04-14")
-db_structure_prompt = db_structure
 settings_prompt = settings_prompt
-client = OpenAI(api_key=openai_api_key)
-
-# Function to connect to Neo4j
-def connect_to_neo4j():
-    try:
-        driver = GraphDatabase.driver(uri, auth=(username, password)) # Connect to the Neo4j database
-        driver.verify_connectivity() # Verify the connection
-        print("Connection to Neo4j established successfully!")
-        return driver
-    except Exception as e:
-        print(f"Failed to connect to Neo4j: {str(e)}") # Print the error message
-        return None
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))  # Max in-flight completions per worker
+PROMPT_HISTORY_TURNS = int(os.getenv("PROMPT_HISTORY_TURNS", "3"))  # Previous turns included in the query prompt
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))  # Turns per /chat_history page by default
+HISTORY_MAX_PAGE_SIZE = 200
+REJECTION_CACHE_MAX_ENTRIES = int(os.getenv("REJECTION_CACHE_MAX_ENTRIES", "256"))  # Generated messages kept
+# The fast path's canned explanation is written in the frontend's default tone and length
+FAST_PATH_POLITENESS = "friendly"
+FAST_PATH_RESPONSE_LENGTH = "medium"
+client = AsyncOpenAI(api_key=openai_api_key)
+_openai_semaphore = None
 
-# Connect to Neo4j
-driver = connect_to_neo4j()
 
-# Get the current file's directory and set up static path
-CURRENT_DIR = Path(__file__).resolve().parent
-STATIC_DIR = CURRENT_DIR.parent / "static" / "temp"
-os.makedirs(STATIC_DIR, exist_ok=True)
+def get_openai_semaphore():
+    """Create the completion semaphore lazily so it binds to the running event loop"""
+    global _openai_semaphore
+    if _openai_semaphore is None:
+        _openai_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    return _openai_semaphore
 
-# Load JSON data
-with open('routers/sample.json', 'r') as file:
-    data = json.load(file)
-    # Extract questions and their corresponding cypher queries
-    db_questions = [item['question'] for item in data['data']]
-    cypher_queries = [item['cypher_query'] for item in data['data']]
 
+async def create_completion(**kwargs):
+    """Run a chat completion without blocking the event loop, bounded by OPENAI_MAX_CONCURRENCY"""
+    async with get_openai_semaphore():
+        completion = await client.chat.completions.create(**kwargs)
+    metrics.record_usage(kwargs.get("model"), getattr(completion, "usage", None))
+    return completion
 
-vectorizer = TfidfVectorizer()
-# Pre-compute TF-IDF matrix for existing questions
-tfidf_matrix = vectorizer.fit_transform(db_questions)
 
-# Cache for storing previously generated responses
-question_cache: Dict[str, dict] = {}
+# Words that make a response depend on the weather data refreshed by the scheduler
+WEATHER_KEYWORDS = re.compile(r"weather|rain|temperature|climate|season|monsoon|precip|wind|sunny", re.IGNORECASE)
 
 
 @lru_cache(maxsize=1000)
@@ -109,47 +106,80 @@ def find_similar_questions_cached(user_query: str, top_n: int = 5) -> Tuple[tupl
     return tuple(results)
 
 
-def generate_query_optimized(user_question: str, session_id: str, question: Question) -> str:
-    # Create a cache key based on the question and settings2
-    cache_key = hashlib.md5(
-        f"{user_question}_{question.settings.json()}".encode()
+def get_query_cache_key(user_question: str, question: Question) -> str:
+    """Create a cache key based on the question, settings and the history turns in the prompt"""
+    # Different spellings of the same place ("nuwara-eliya", "Nuwara Eliya") share one entry
+    canonical_question = " ".join(gazetteer.canonicalize(user_question).split())
+    # A follow-up such as "what about hotels there?" means something else in every session
+    recent_history = session_store.recent(question.session_id, PROMPT_HISTORY_TURNS)
+    history = [(turn.question, turn.answer) for turn in recent_history]
+    return hashlib.md5(
+        f"{canonical_question}_{question.settings.json()}_{json.dumps(history)}".encode()
     ).hexdigest()
 
-    # Check cache first
-    if cache_key in question_cache:
-        return question_cache[cache_key]
 
-    # If not in cache, generate response
-    response = generate_query(user_question, session_id, question)
+async def cache_query_response(cache_key: str, user_question: str, response: str):
+    """Store a generated response, tagged so weather updates can invalidate it"""
+    # Errors and outputs that do not parse would otherwise be served again until they expire
+    if not query_output_parser.is_valid(response):
+        return
+    tags = [WEATHER_TAG] if WEATHER_KEYWORDS.search(user_question) or WEATHER_KEYWORDS.search(response) else []
+    await response_cache.set_async(cache_key, response, tags=tags)
 
-    # Store in cache
-    question_cache[cache_key] = response
 
-    return response
+def fast_path_response(user_question: str, session_id: str, question: Question) -> Optional[str]:
+    """Build the query response from a sample template when the question is a near-duplicate of one"""
+    # Pick up places and hotels added to Neo4j since the last refresh
+    gazetteer.maybe_refresh(neo4j_registry)
 
+    # Templates and the canned explanation are English
+    if question.settings.language.lower() != "english":
+        return None
+    # Other tones and lengths need the model to write the explanation
+    explanation = FAST_PATH_EXPLANATIONS.get(question.settings.formality.strip().lower())
+    if question.settings.politeness_level.lower() != FAST_PATH_POLITENESS or \
+            question.settings.response_length.lower() != FAST_PATH_RESPONSE_LENGTH or explanation is None:
+        return None
+    # A follow-up that names no place ("what about cheaper ones?") depends on the previous turns
+    if not gazetteer.extract(user_question) and session_store.recent(session_id, 1):
+        return None
+    matched = fast_path.match(user_question)
+    if matched is None:
+        return None
+    return json.dumps({
+        "text_explanation": explanation,
+        "query_generation_status": "Yes",
+        "query": matched[0]
+    })
 
-def find_similar_questions(user_query, top_n=5):
-    """Find similar questions using pre-computed TF-IDF matrix"""
-    global tfidf_matrix, vectorizer, db_questions, cypher_queries
 
-    try:
-        # Transform only the user query using the pre-computed vectorizer
-        query_vector = vectorizer.transform([user_query])
+async def generate_query_optimized(user_question: str, session_id: str, question: Question) -> str:
+    cache_key = get_query_cache_key(user_question, question)
 
-        # Compute similarity with pre-computed matrix
-        similarities = cosine_similarity(query_vector, tfidf_matrix).flatten()
+    # Check cache first
+    cached = await response_cache.get_async(cache_key)
+    if cached is not None:
+        return cached
+
+    # Near-duplicates of a sample question reuse its Cypher without a completion
+    response = fast_path_response(user_question, session_id, question)
+    if response is not None:
+        return response
 
-        # Get top N similar indices
-        similar_indices = similarities.argsort()[-top_n:][::-1]
+    # If not in cache, generate response; the same question asked meanwhile waits for this completion
+    async def generate_and_cache():
+        response = await generate_query(user_question, session_id, question)
+        await cache_query_response(cache_key, user_question, response)
+        return response
 
-        # Return results
-        similar_questions = [
-            (db_questions[i], cypher_queries[i], similarities[i])
-            for i in similar_indices
-        ]
+    return await query_flight.do(cache_key, generate_and_cache)
 
-        print(similar_questions)
 
+def find_similar_questions(user_query, top_n=5):
+    """Find similar questions in the few-shot retrieval index"""
+    try:
+        similar_questions = few_shot_index.search(user_query, top_n)
+        logger.debug(f"Similar questions: {similar_questions}")
         return similar_questions
 
     except Exception as e:
@@ -157,244 +187,90 @@ def find_similar_questions(user_query, top_n=5):
         return []
 
 
-def generate_query(user_question: str, session_id: str, question: Question) -> str:
-    recent_history = []  # Initialize an empty list to store recent conversation history
-    if session_id in chat_histories:  # Check if the session ID exists in the chat histories
-        questions = chat_histories[session_id]["questions"]  # Get the questions from the chat histories
-        answers = chat_histories[session_id]["answers"]  # Get the answers from the chat histories
-        # Get the last 3 items, excluding the current question
-        for i in range(max(len(questions) - 4, 0), len(questions) - 1):
-            print(answers[i])
-            recent_history.append({
-                "question": questions[i],
-                "answer":  answers[i]
-            })
-
-    print(recent_history)
+def build_query_messages(user_question: str, session_id: str, question: Question) -> List[dict]:
+    """Assemble the chat messages for the query generation completion"""
+    # Get the last answered turns; the current question is still open
+    recent_history = session_store.recent(session_id, PROMPT_HISTORY_TURNS)
 
     # Format the conversation history
     history_text = "No previous conversation." if not recent_history else "\n".join([
-        f"Previous Question {item + 1}: {recent_history[item]['question']}\n"
-        f"Previous Answer {item + 1}: {recent_history[item]['answer']}\n"
-        for item in range(0, len(recent_history))
+        f"Previous Question {item + 1}: {turn.question}\n"
+        f"Previous Answer {item + 1}: {turn.answer}\n"
+        + (f"Previous Query {item + 1}: {turn.query}\n" if turn.query else "")
+        for item, turn in enumerate(recent_history)
     ])
 
-    print("Recent History :\n\n", history_text)
-
-    # Define template as a constant
-    TEMPLATE_CYPHER = {
-        "text_explanation": "",
-        "query_generation_status": "Yes/No",
-        "query": "OPTIONAL MATCH query here"
-    }
-
-    # Find the top 5 similar questions
-    settings_prompt = f"""
-       Response Settings:
-       - Language: {question.settings.language}
-       - Politeness Level: {question.settings.politeness_level}
-       - Formality: {question.settings.formality}
-       - Response Length: {question.settings.response_length}
-       - Current date: {question.date}
-       - Current time: {question.time}
-
-       Please adjust your response according to these settings:
-       1. Use the specified {question.settings.language} language
-       2. Maintain {question.settings.politeness_level} politeness level
-       3. Keep {question.settings.formality} tone
-       5. Provide {question.settings.response_length} response length
-       """
-
-    # Move the prompt template outside the function
-    QUERY_CHAT_PROMPT = """Role and Context:
-                        You are TourMate, an AI assistant that helps users with travel-related queries about Sri Lanka or hotels, accomadations, places, emergency, hotel related details.
-            
-                        
-                        You can provide answers only to the sri lankan context, do not provide answers for other contexts please say that you can provide answers only on the sri lankan context if user ask a question in other domains.
-                        
-                        
-                         Database Context:
-                        ---------------
-                        Current Graph Database Structure: {graph_db_structure}
-                        
-                        Reference Examples (Not Part of Current Conversation or history):
-                        -------------------------
-                        Reference Examples : {similar_chunks}
-                        
-                          
-                       ⚠️ Note: These examples are ONLY for cypher query generation reference. Do not use Reference Examples as conversation history or general content.
-                       Very Very Important: ⚠️⚠️ Do Not ever use the same reference examples to generate your answer, because it is not the answer user is expecting. 
-                       it is given to get an idea of the cypher query structure.
-                        Query Requirements:
-                        -----------------
-                        1. All queries must start with OPTIONAL MATCH
-                        2. Only use nodes, elements, and relationships defined in the provided graph structure
-                        3. Support cross-table filtering when necessary
-                        
-                        Today Date:
-                        ---------------
-                        {date}
-                        
-                        Today Time:
-                        ______________
-                        {time}
-                        
-                        Input Question:
-                        --------------
-                        {question}
-                        
-                        Response Format:
-                        --------------
-                        IMPORTANT: Return ONLY the following structure in valid JSON format:
-                        - Use double quotes (") instead of single quotes (')
-                        - No newlines within values
-                        - No trailing commas
-                        - Exactly match this structure:
-                        
-                        {template_cypher}
-                        
-                        ⚠️ DO NOT include any text before or after the JSON structure
-                        ⚠️ DO NOT use single quotes in the JSON response
-                        ⚠️ DO NOT include newlines within the values
-                        ⚠️ Ensure the response is valid JSON format
-                        ⚠️ If user asked a question about place and all when you generate the cypher query refer key words in lower case and use them in the cypher query.
-                        
-                        Response Guidelines:
-                        ------------------
-                        1. text_explanation:
-                           - Provide natural language explanations
-                           - Can include emojis for better readability
-                           - Must NOT contain code or queries
-                           - For general questions, provide complete, knowledgeable answers here
-                           - For data-related questions, focus on insights and business impact
-                           - Never mention querying or accessing a database
-                           - Maintain a conversational, helpful tone
-                           - Provide natural language explanations ONLY about Sri Lanka
-                           - Must be strictly related to Sri Lanka operations and services
-                           - Must NOT contain any political, controversial, or Sri Lanka content
-                           - For general questions, ONLY provide answers related to Sri Lanka
-                           - Maintain a professional, business-focused tone
-                           - ** Must contain emojis for better readability
-                           - ⚠️⚠️ Do not explain the query that you are generating, explain the answer to the user question.
-                        
-                        2. query_generation_status:
-                           - 'Yes': If a Cypher query can be generated based on the question and graph structure
-                           - 'No': If question cannot be answered with a query if keywords are not present in the question
-                           - If 'No', query field should be empty
-                           
-                        3. query structure details:
-                           - ⚠️ Do not ever provide multiple relations in one line (Always use multiple OPTIONAL MATCH with WITH clause)
-                           - ⚠️⚠️ Do not ever return nodes, always return properties of nodes (This is very important)
-                           
-                        # Stay Focused and Contextual
-                        - Provide responses that are strictly relevant to the questions asked about Sri Lanka
-                        - Do not include any information beyond the scope of the specific query or subject matter being discussed
-                        - Avoid providing out-of-context or irrelevant information in any responses
-                        - Maintain focus on the exact question asked and its direct implications for Sri Lanka
-                        - If question is unclear, ask for clarification rather than making assumptions
-                        - Never add extraneous information not directly related to the query
-                        - Relevant emojis is Must in the text explanation and never mention that you refer to database by querying. 
-                        -  Work as TravelGuru when providing responses.
-                        
-                        the below conditions are important:
-                        
-                        If user ask about the details about Sri Lanka only, then provide only the description about the country without generating the cypher query for it. in other scenerios you can generate cypher query as well. (Provide the key insights summary as well).
-                        
-                        If user ask for budget places in a specif area, provide the whole list of places by saying most of the places that they have are budget places. (provide all accommodations in that area)  - it is applicable for all restaurants, hotels, and places to visit.
-                        
-                        please consider them as well when user ask about weather.when providing weather details please mention the location name.
-        
-                        when user ask about the emergency details please provide all details in the Country node, but if they ask about specific area related details provide that areas police station and hospital details.
-                        
-                        consider all the places visting, accomadation, restaurants are affordable and budget friendly.
-                        
-                        when providing whether try to provide weather in current month always and take all the weather details that you have in specific area.
-                        
-                        if travelling distance is asked used this to get the distance between two areas. 
-                        
-                          MATCH (source: 'Area' {{ put area name is simple}})
-                          MATCH (target: 'Area' {{put area name is simple}})
-                          MERGE (source)-[r: HAS_DISTANCE]->(target)
-                          SET r.Distance_in_km = toFloat(trim(row.Distance_in_km))
-                          
-                          - put required values to this query and use it to get the distance between two areas.
-                          - when you generate the query check the name os the Area in both upper and lower case .
-                        
-                        # Strictly follow this setting prompts as well
-                        {settings_prompt}  
-                        
-                         Recent Conversation History: (This contains the recent questions user asked)
-                        -------------------------
-                         chat history: {history_text}
-                         
-                         user question: {question}
-                         
-                        Please consider if the users question is relevant to the chat history, if it is relevant, 
-                        please provide the answer based on the chat history.If it is not relevant, please ignore the chat history.
-                        Example: If user has asked a particular location and ask a question without mentioning a new location please provide the answer based on the previous questions location.
-                        
-                        *** Very very important: Please consider the chat history as well ***
-                        
-                        When looking at the history, please consider the highest question number as the last question, for example question 3 should have priority more than question 2.
-                        """
-
-    retry_count = 0  # Initialize retry count
-    max_retries = 2  # Set maximum number of retries
+    logger.debug(f"Recent history for session {session_id}:\n{history_text}")
 
     try:
-        similar_results = find_similar_questions(user_question)
+        with metrics.stage("retrieval"):
+            similar_results = find_similar_questions(user_question)
         similar_text = "\n".join([
             f"Reference Q: {q}\nReference Query: {c}\nSimilarity: {s:.2f}"
             for q, c, s in similar_results
         ])
-    except Exception as e:
+    except Exception:
         similar_text = "No similar examples found."
 
-        # Format the prompt with all required values
-    formatted_prompt = QUERY_CHAT_PROMPT.format(
+    # Static prefix first (role, schema, rules, settings) so it is byte-identical across requests,
+    # then everything that changes per request
+    system_prompt = build_query_static_prompt(schema_prompt.get(neo4j_registry)) + build_query_settings_prompt(
+        question.settings.language,
+        question.settings.politeness_level,
+        question.settings.formality,
+        question.settings.response_length
+    )
+    request_prompt = build_query_dynamic_prompt(
+        similar_chunks=similar_text,
         date=question.date,
         time=question.time,
         history_text=history_text,
-        graph_db_structure=db_structure_prompt,
-        similar_chunks=similar_text,
-        question=user_question,
-        template_cypher=TEMPLATE_CYPHER,
-        settings_prompt=settings_prompt
+        question=user_question
     )
 
-    print("Formatted Prompt :\n\n", formatted_prompt)
+    logger.debug(f"Query prompt for session {session_id}:\n{request_prompt}")
+
+    # Construct chat messages
+    return [
+        {
+            "role": "system",  # System role for the AI assistant
+            "content": [  # Content of the message
+                {
+                    "type": "text",
+                    "text": system_prompt  # Add the static prompt prefix to the content
+                }
+            ]
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": request_prompt  # Add the examples, history and user question to the content
+                }
+            ]
+        }
+    ]
+
+
+def query_format_kwargs() -> dict:
+    """Schema-constrained output for the query completions, so the response parses in one pass"""
+    output_format = response_format()
+    return {"response_format": output_format} if output_format else {}
 
 
+async def generate_query(user_question: str, session_id: str, question: Question,
+                         feedback: Optional[List[dict]] = None) -> str:
+    chat_messages = build_query_messages(user_question, session_id, question) + (feedback or [])
 
+    retry_count = 0  # Initialize retry count
+    max_retries = 2  # Set maximum number of retries
 
     # Retry loop for API call
     while retry_count < max_retries:
         try:
-            print("Tried")
-            # Construct chat messages
-            chat_messages = [
-                {
-                    "role": "system",  # System role for the AI assistant
-                    "content": [  # Content of the message
-                        {
-                            "type": "text",
-                            "text": formatted_prompt  # Add the formatted prompt to the content
-                        }
-                    ]
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": user_question  # Add the user question to the content
-                        }
-                    ]
-                }
-            ]
-
             # Make API call
-            completion = client.chat.completions.create(
+            completion = await create_completion(
                 model=deployment,
                 messages=chat_messages,
                 max_tokens=4096,
@@ -403,11 +279,16 @@ def generate_query(user_question: str, session_id: str, question: Question) -> s
                 frequency_penalty=0,
                 presence_penalty=0,
                 stop=None,
-                stream=False
+                stream=False,
+                **query_format_kwargs()
             )
 
-            # Check if the response contains the query generation status
-            return completion.choices[0].message.content
+            # A refusal comes without content; answer with it like any other non-query response
+            message = completion.choices[0].message
+            refusal = getattr(message, "refusal", None)
+            content = refusal_output(refusal) if message.content is None and refusal else message.content
+            query_output_parser.record(content or "", refused=bool(refusal))
+            return content
 
         # Retry on API errors
         except Exception as e:
@@ -419,192 +300,166 @@ def generate_query(user_question: str, session_id: str, question: Question) -> s
     return "Maximum retries exceeded"
 
 
+async def stream_query(user_question: str, session_id: str, question: Question,
+                       refusals: Optional[List[str]] = None):
+    """Stream the query generation completion, yielding content deltas as they arrive"""
+    chat_messages = build_query_messages(user_question, session_id, question)
+
+    # Hold the concurrency slot for the whole stream, not just the request
+    async with get_openai_semaphore():
+        stream = await client.chat.completions.create(
+            model=deployment,
+            messages=chat_messages,
+            max_tokens=4096,
+            temperature=question.settings.creativity,
+            top_p=0.95,
+            frequency_penalty=0,
+            presence_penalty=0,
+            stop=None,
+            stream=True,
+            stream_options={"include_usage": True},
+            **query_format_kwargs()
+        )
+        refusal = []
+        async for chunk in stream:
+            # Usage comes in a last chunk without choices
+            if getattr(chunk, "usage", None) is not None:
+                metrics.record_usage(deployment, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            elif chunk.choices and getattr(chunk.choices[0].delta, "refusal", None):
+                refusal.append(chunk.choices[0].delta.refusal)
+        # A refusal is streamed separately from the content; hand it on in the response format
+        if refusal:
+            if refusals is not None:
+                refusals.append("".join(refusal))
+            yield refusal_output("".join(refusal))
+
+
 # Define the FastAPI router
 @router.post("/start_session")
 async def start_session():
-    session_id = str(uuid.uuid4())  # Generate a unique session ID
-    chat_histories[session_id] = {
-        "questions": [],
-        "answers": []
-    }
+    session_id = session_store.create()  # Generate a unique session ID
     return JSONResponse(content={"session_id": session_id})  # Return the session ID as JSON
 
 
-# Define the FastAPI router
-def serialize_neo4j_value(val):
-    """Serialize Neo4j specific data types"""
-    if isinstance(val, (neo4j.time.DateTime, neo4j.time.Date)): # Check for DateTime or Date objects
-        return val.iso_format()
-    elif isinstance(val, neo4j.time.Time): # Check for Time objects
-        return str(val)
-    elif isinstance(val, (int, float, str, bool)): # Check for basic data types
-        return val
-    elif val is None:
-        return None
-    return str(val)
-
-# Define the FastAPI router
-def serialize_value(val):
-    """Main serialization function for all types"""
-    if pd.isna(val):
-        return None
-    # Handle pandas Period objects
-    elif isinstance(val, pd.Period):
-        return val.asfreq('D').strftime('%Y-%m-%d')
-    # Handle both datetime and Timestamp objects
-    elif isinstance(val, (pd.Timestamp, datetime)):
-        # Convert to ISO format and truncate microseconds if present
-        iso_date = val.isoformat()
-        if '.' in iso_date:
-            iso_date = iso_date.split('.')[0] + 'Z'
-        return iso_date
-    elif isinstance(val, str):
-        # Try to parse string as datetime if it looks like a date
-        try:
-            if 'T' in val or '-' in val:
-                parsed_date = pd.to_datetime(val)
-                return parsed_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        except:
-            return val
-    elif isinstance(val, np.integer): # Handle numpy integer types
-        return int(val)
-    elif isinstance(val, np.floating): # Handle numpy float types
-        return float(val)
-    elif isinstance(val, np.bool_): # Handle numpy boolean types
-        return bool(val)
-    elif isinstance(val, (np.ndarray, list)): # Handle numpy arrays and lists
-        return [serialize_value(v) for v in val]
-    elif isinstance(val, dict): # Handle dictionaries
-        return {k: serialize_value(v) for k, v in val.items()}
-    elif isinstance(val, pd.Index): # Handle pandas Index objects
-        return serialize_value(val.tolist())
-    elif isinstance(val, pd.Series): # Handle pandas Series objects
-        return serialize_value(val.tolist())
-    elif isinstance(val, pd.DataFrame): # Handle pandas DataFrame objects
-        return serialize_value(val.to_dict('records'))
-    elif isinstance(val, pd.DateOffset): # Handle pandas DateOffset objects
-        return str(val)
-    elif isinstance(val, pd.Interval): # Handle pandas Interval objects
-        return str(val)
-    return serialize_neo4j_value(val) # Fallback to Neo4j serialization
+def remember_answer(session_id: str, seq: int, query_response: str, text: Optional[str] = None,
+                    insights: Optional[str] = None):
+    """Store the answer the user saw in the question's turn instead of the raw model output"""
+    try:
+        response_dict = parse_query_response(query_response)
+        session_store.add_answer(session_id, seq, text or response_dict["text_explanation"], response_dict["query"],
+                                 insights)
+    except Exception:
+        session_store.add_answer(session_id, seq, text or query_response, insights=insights)
 
 
 # Define the FastAPI router
-def execute_cypher_query(driver, query):
-    """Execute a Cypher query and return serialized results"""
+async def execute_cypher_query(driver, query) -> Tuple[Optional[List[dict]], bool]:
+    """Execute a Cypher query and return (serialized rows, truncated), served from the result cache when possible"""
+    # Writes are never cached, reads are keyed on the normalized query text
+    if cypher.is_write_query(query):
+        return await run_cypher_query(driver, query)
+
+    cache_key = cypher.fingerprint(query)
+    cached = await cypher_cache.get_async(cache_key)
+    if cached is not None:
+        return cached["rows"], cached["truncated"]
+
+    async def run_and_cache():
+        records, truncated = await run_cypher_query(driver, query)
+        if records is not None:
+            ttl, tags = cypher_cache_policy(cypher.labels(query))
+            await cypher_cache.set_async(cache_key, {"rows": records, "truncated": truncated}, ttl=ttl, tags=tags)
+        return records, truncated
+
+    # Concurrent requests for the same query share one execution
+    return await cypher_flight.do(cache_key, run_and_cache)
+
+
+async def run_cypher_query(driver, query) -> Tuple[Optional[List[dict]], bool]:
+    """Run a Cypher query in a read transaction on the async driver and return (serialized rows, truncated)"""
+    # Rows are serialized while they are read, so the serializer's own time is summed per call
+    serializer = metrics.TimedCalls(RowSerializer(), "serialization")
     try:
-        with driver.session() as session:
-            result = session.run(query)
-            # Convert Neo4j records to dictionaries and serialize the values
-            records = []
-            for record in result:
-                # Convert each record to a dict and serialize all values
-                record_dict = {}
-                for key, value in dict(record).items(): # Convert to dict to access items
-                    record_dict[key] = serialize_value(value)
-                records.append(record_dict) # Append the serialized record to the list
-            return records
+        return await execution.run_read_query_async(driver, query, serializer)
     except Exception as e: # Handle any exceptions
         print(f"Error executing query: {str(e)}")
+        return None, False
+    finally:
+        serializer.observe()
+
+
+async def preflight_generated_query(query: str, query_response: str, user_question: str, session_id: str,
+                                    question: Question) -> Tuple[Optional[str], str]:
+    """EXPLAIN a generated query and ask for a new one once if rejected; returns (query to run or None, response)"""
+    verdict = await run_in_threadpool(preflight.check, neo4j_registry, query)
+    if verdict["status"] != "rejected":
+        return verdict["query"], query_response
+
+    # Send the query back with the reason so the model can fix it
+    feedback = [
+        {"role": "assistant", "content": query_response},
+        {"role": "user", "content": f"The query was rejected before execution ({verdict['reason']}). Write a "
+                                    f"read-only query without CREATE, MERGE, SET or DELETE that labels every "
+                                    f"node and avoids disconnected patterns. Answer in the same JSON format."}
+    ]
+    cache_key = get_query_cache_key(user_question, question)
+    await response_cache.delete_async(cache_key)
+    query_response = await generate_query(user_question, session_id, question, feedback)
+    try:
+        response_dict = parse_query_response(query_response)
+    except ValueError as e:
+        logger.warning(f"Regenerated query response did not parse: {str(e)}")
+        return None, query_response
+    if response_dict["query_generation_status"].lower() != "yes" or not response_dict["query"]:
+        return None, query_response
+
+    verdict = await run_in_threadpool(preflight.check, neo4j_registry, response_dict["query"])
+    if verdict["status"] == "rejected":
+        return None, query_response
+    await cache_query_response(cache_key, user_question, query_response)
+    return verdict["query"], query_response
+
+
+def regenerated_response(original: str, query_response: str) -> Optional[dict]:
+    """Parse the response preflight asked for in place of a rejected query, or None if nothing was regenerated"""
+    if query_response == original:
         return None
-
-def make_url_link(value):
-    """Convert URL to a clickable link."""
-    if pd.isna(value):
-        return ""
-
-    value_str = str(value).strip()
-
-    # Basic URL validation
     try:
-        result = urlparse(value_str)
-        is_valid = all([result.scheme, result.netloc])
-    except:
-        is_valid = False
-
-    if not is_valid:
-        return value_str
+        return parse_query_response(query_response)
+    except ValueError as e:
+        logger.warning(f"Regenerated query response did not parse: {str(e)}")
+        return None
 
-    return f'<a href="{value_str}" style="color: #0066cc; text-decoration: none;" target="_blank">{value_str}</a>'
 
 def convert_to_html_table(data):
     """Convert data to HTML table with clickable links."""
-    if not data:
-        return ""
-
-    # Convert data to pandas DataFrame
-    df = pd.DataFrame(data)
-
-    # Identify URL columns
-    url_columns = [col for col in df.columns if any(term in col.lower()
-                                                    for term in ['url', 'link', 'website', 'site'])]
-
-    # Apply URL link conversion
-    for col in url_columns:
-        df[col] = df[col].apply(make_url_link)
-
-    # Generate HTML table
-    html_table = df.to_html(
-        classes=['table', 'table-striped', 'table-hover', 'table-bordered'],
-        index=False,
-        escape=False,
-        table_id='result-table'
-    )
-
-    # Add CSS styling
-    html_table = html_table.replace(
-        '<table',
-        '<table style="border-collapse: collapse; border: 1px solid black; width: 100%;"'
-    )
-    html_table = html_table.replace(
-        '<th',
-        '<th style="border: 1px solid black; text-align: center; padding: 8px; background-color: #f5f5f5;"'
-    )
-    html_table = html_table.replace(
-        '<td',
-        '<td style="border: 1px solid black; text-align: left; padding: 8px; vertical-align: top;"'
-    )
-
-    return html_table
+    return render_html_table(data)
 
 
-# Function to generate a Cypher query based on the user question
-def generate_table_analysis(data: str):
-    try:
-        # Prepare prompt for LLM
-        analysis_prompt = f"""
-                You are a tourism analytics expert specializing in Sri Lankan travel. 
-                If this data contains not only None values return 'yes'.
-                If the data only contains null values say you cannot generate an answer with data table at the moment in a creative way with emojis bit longer explanation.
-                Don't ever say, since data contains mostly null values or zeros you can't provide an answer.
-                
-                If user ask anything about sri lanka even it is not there in the graph db, you have to answer the questions
+def is_empty_value(val) -> bool:
+    """Check if a serialized cell carries no information"""
+    if val is None:
+        return True
+    if isinstance(val, float) and val != val:  # NaN
+        return True
+    if isinstance(val, str):
+        return not val.strip() or val.strip().lower() in ("none", "null", "nan")
+    if isinstance(val, (list, tuple)):
+        return all(is_empty_value(v) for v in val)
+    if isinstance(val, dict):
+        return all(is_empty_value(v) for v in val.values())
+    return False
 
-                example data: 
-                    [{{'a1.Areas': None, 'a2.Areas': None, 'a1.Distance_in_km': None}}]
-                # If it is like this also say you cannot generate an answer at this moment bit longer ways.
-
-                data : {data}
-                """
-
-        # Make API call
-        completion = client.chat.completions.create(
-            model=deployment,
-            messages=[
-                {"role": "system", "content": analysis_prompt},
-                {"role": "user", "content": "Please return 'yes' or explanation based on data."}
-            ],
-            max_tokens=1000,  # Set maximum tokens for response
-            temperature=0.7  # Set the creativity level
-        )
 
-        return completion.choices[0].message.content  # Return the generated analysis
-    except Exception as e:
-        return f"Unable to provide table insights at this moment. Error: {str(e)}"
+def is_empty_result(data) -> bool:
+    """Deterministic table gate: True when there are no rows or every cell is null/empty"""
+    return not data or all(is_empty_value(row) for row in data)
 
 
 # Function to generate a Cypher query based on the user question
-def generate_html_table_analysis(data, user_question, deployment, question):
+async def generate_html_table_analysis(data, user_question, deployment, question):
     try:
         # Prepare settings prompt for the user
         settings = f"""
@@ -642,7 +497,7 @@ def generate_html_table_analysis(data, user_question, deployment, question):
                         """
 
         # Make API call
-        completion = client.chat.completions.create(
+        completion = await create_completion(
             model=deployment,
             messages=[
                 {"role": "system", "content": analysis_prompt},
@@ -658,65 +513,125 @@ def generate_html_table_analysis(data, user_question, deployment, question):
         return f"Unable to provide analytical insights at the moment. Error: {str(e)}"
 
 
-# Function to generate a Cypher query based on the user question
-def generate_answer_rejection(user_question, question):
+# Function to generate a rejection message for one settings combination
+async def generate_rejection_message(settings: Settings):
     try:
         # Prepare settings prompt for the user
-        settings = f"""
+        settings_text = f"""
                 {settings_prompt}
                 Response Settings:
-               - Language: {question.settings.language}
-               - Politeness Level: {question.settings.politeness_level}
-               - Formality: {question.settings.formality}
-               - Response Length: {question.settings.response_length}
-               - Current time: {question.time}
-               - Current date: {question.date}
+               - Language: {settings.language}
+               - Politeness Level: {settings.politeness_level}
+               - Formality: {settings.formality}
+               - Response Length: {settings.response_length}
 
                Please adjust your response according to these settings:
-               1. Use the specified {question.settings.language} language
-               2. Maintain {question.settings.politeness_level} politeness level
-               3. Keep {question.settings.formality} tone
-               5. Provide {question.settings.response_length} response length
+               1. Use the specified {settings.language} language
+               2. Maintain {settings.politeness_level} politeness level
+               3. Keep {settings.formality} tone
+               5. Provide {settings.response_length} response length
                6. Use emojis based on above selected settings
                """
 
         # Prepare prompt for LLM
         analysis_prompt = f"""You are a tourism analytics expert specializing in Sri Lankan travel. 
                         Say that you cannot generate an answer right now.
-
-                        Original Question: {user_question}
+                        Do not refer to any specific question, the message is reused for every question.
 
                         Please strictly follow this settings:
 
-                            {settings}
+                            {settings_text}
                         """
 
         # Make API call
-        completion = client.chat.completions.create(
+        completion = await create_completion(
             model=deployment,
             messages=[
                 {"role": "system", "content": analysis_prompt},
-                {"role": "user", "content": "Please provide the analysis."}
+                {"role": "user", "content": "Please provide the message."}
             ],
-            max_tokens=1000,  # Set maximum tokens for response
-            temperature=question.settings.creativity  # Set the creativity level based on user settings
+            max_tokens=300,  # Set maximum tokens for response
+            temperature=settings.creativity  # Set the creativity level based on user settings
         )
 
-        return completion.choices[0].message.content  # Return the generated analysis
+        return completion.choices[0].message.content  # Return the generated message
 
     except Exception as e:  # Handle any exceptions
-        return f"Unable to provide analytical insights at the moment. Error: {str(e)}"
+        print(f"Error generating rejection message: {str(e)}")
+        return None
 
 
-# Define the FastAPI router
-@router.post("/start_session")
-async def start_session():
-    session_id = str(uuid.uuid4()) # Generate a unique session ID
-    chat_histories[session_id] = {
-        "questions": [],
-        "answers": []
-    }
-    return JSONResponse(content={"session_id": session_id}) # Return the session ID as JSON
+def get_rejection_key(settings: Settings) -> Tuple[str, str, str, str]:
+    """Rejection messages depend only on these settings, not on the question"""
+    return (
+        settings.language.strip().lower(),
+        settings.politeness_level.strip().lower(),
+        settings.formality.strip().lower(),
+        settings.response_length.strip().lower()
+    )
+
+
+def build_rejection_library() -> Dict[Tuple[str, str, str, str], str]:
+    """Precompute the English rejection messages for every known settings combination"""
+    library = {}
+    for politeness, opening in REJECTION_OPENINGS.items():
+        for formality in REJECTION_FORMALITIES:
+            for length, follow_ups in REJECTION_FOLLOW_UPS.items():
+                library[("english", politeness, formality, length)] = " ".join([opening] + follow_ups)
+    return library
+
+
+# Library of rejection messages keyed by (language, politeness, formality, response length)
+rejection_messages = build_rejection_library()
+
+# Messages generated for other languages and custom settings; the settings come from clients, so the cache is bounded
+rejection_cache = create_cache("rejection", max_entries=REJECTION_CACHE_MAX_ENTRIES)
+
+
+async def generate_answer_rejection(user_question, question):
+    """Return the "cannot answer right now" message for the question's settings"""
+    key = get_rejection_key(question.settings)
+    if key in rejection_messages:
+        return rejection_messages[key]
+    cache_key = "|".join(key)
+    cached = await rejection_cache.get_async(cache_key)
+    if cached is not None:
+        return cached
+
+    # Other languages and custom settings are generated once, then served from the cache until evicted
+    message = await generate_rejection_message(question.settings)
+    if message is None:
+        return rejection_messages[("english", "friendly", "informal", "medium")]
+    await rejection_cache.set_async(cache_key, message)
+    return message
+
+
+async def analyze_table(data, user_question, question):
+    """Return (table_accept_status, table_insights) for the first rows of a data answer"""
+    # All-null rows are rejected locally, so only real data costs an insights completion
+    with metrics.stage("table_gate"):
+        rejected = is_empty_result(data)
+    if rejected:
+        return await generate_answer_rejection(user_question, question), None
+    with metrics.stage("insights"):
+        return "yes", await generate_html_table_analysis(data, user_question, deployment, question)
+
+
+def parse_query_response(query_response: str) -> dict:
+    """Parse the query generation output into a dict with the required fields"""
+    return query_output_parser.parse(query_response).model_dump()
+
+
+def save_html_table(html_table_data: str):
+    """Store the HTML table and return its public URL"""
+    try:
+        # Named by content, so the same table asked for again is not written twice
+        table_filename = artifact_store.put(html_table_data)
+        return artifact_store.url(table_filename)
+
+    except Exception as e:  # Handle any exceptions
+        print(f"Error saving table file: {str(e)}")
+        return None
 
 
 @router.post("/chat")
@@ -725,53 +640,24 @@ async def chat(question: Question):
         # Extract the required information from the question object
         session_id = question.session_id # Extract the session ID
         user_question = question.question # Extract the user question
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") # Extract the current timestamp
 
-        # Check if the session ID is valid
-        if session_id not in chat_histories:
+        # Add the user question to the chat history, if the session ID is valid
+        seq = session_store.add_question(session_id, user_question)
+        if seq is None:
             return JSONResponse(
                 content={"error": "Invalid session ID"},
                 status_code=400
             )
-
-        # Add the user question to the chat history
-        chat_histories[session_id]["questions"].append(user_question)
         
 
         # Get the query generation response
-        query_response = generate_query_optimized(user_question, session_id, question)
+        started = time.perf_counter()
+        timings = metrics.request_timings()
+        with metrics.stage("query_generation"):
+            query_response = await generate_query_optimized(user_question, session_id, question)
 
         try:
-            try:
-                response_dict = json.loads(query_response)
-            except json.JSONDecodeError:
-                try:
-                    # Clean up the response string before parsing
-                    cleaned_response = (
-                        query_response
-                        .replace("'", '"')  # Replace single quotes with double quotes
-                        .replace('\n', '')  # Remove newlines
-                    )
-                    # Try parsing again
-                    response_dict = json.loads(cleaned_response)
-                except json.JSONDecodeError:
-                    try:
-                        # As a last resort, try literal eval
-                        response_dict = ast.literal_eval(query_response)
-                    except (ValueError, SyntaxError):
-                        raise ValueError("Could not parse response as JSON or Python dict")
-
-            # Validate response format
-            required_fields = [
-                "text_explanation",
-                "query_generation_status",
-                "query"
-            ]
-
-            # Check if the response dictionary contains all required fields
-            if not isinstance(response_dict, dict) or not all(
-                    key in response_dict for key in required_fields):
-                raise ValueError("Invalid response format")
+            response_dict = parse_query_response(query_response)
 
             # Initialize the result
             result = {
@@ -784,48 +670,62 @@ async def chat(question: Question):
 
             # Execute the query if status is "Yes"
             if response_dict["query_generation_status"].lower() == "yes" and response_dict["query"]:
-                query_result = execute_cypher_query(driver, response_dict["query"])
+                with metrics.stage("preflight"):
+                    checked_query, regenerated = await preflight_generated_query(
+                        response_dict["query"], query_response, user_question, session_id, question)
+
+                # The explanation of a rejected query does not describe the replacement that runs instead
+                replacement = regenerated_response(query_response, regenerated)
+                query_response = regenerated
+                if replacement is not None:
+                    result["text_explanation"] = replacement["text_explanation"]
+                    result["query_generation_status"] = replacement["query_generation_status"]
+                    result["query"] = replacement["query"]
+
+                query_result, truncated = None, False
+                if checked_query is not None:
+                    result["query"] = checked_query
+                    with metrics.stage("cypher_execution"):
+                        query_result, truncated = await execute_cypher_query(await get_async_driver(), checked_query)
 
                 if not query_result:
-                    result["text_explanation"] = generate_answer_rejection(user_question, question)
+                    with metrics.stage("rejection"):
+                        result["text_explanation"] = await generate_answer_rejection(user_question, question)
 
                 else:
-                    # Ensure the entire result is JSON serializable
-                    result["data"] = json.loads(json.dumps(query_result, default=str))
+                    # Rows are already plain JSON types, serialized per column as they were read
+                    result["data"] = query_result
+                    result["truncated"] = truncated
 
                     # Generate HTML table from the data
-                    result["html_table_data"] = convert_to_html_table(query_result)
-
-                    # Save HTML table if it exists
-                    if result["html_table_data"]:
-                        try:
-                            table_filename = f'table_{session_id}_{timestamp}.html'  # Generate a unique filename
-                            file_path = STATIC_DIR / table_filename  # Set the file path
-
-                            # Write the file
-                            with open(file_path, 'w', encoding='utf-8') as f:  # Open the file in write mode
-                                f.write(result["html_table_data"])  # Write the HTML table data to the file
+                    with metrics.stage("html_table"):
+                        result["html_table_data"] = convert_to_html_table(query_result)
 
-                            # Set the correct URL using the base URL from environment
-                            base_url = os.getenv('API_BASE_URL', 'http://localhost:8000')
-                            result["table_file_url"] = f"{base_url}/static/temp/{table_filename}"
+                        # Save HTML table if it exists
+                        if result["html_table_data"]:
+                            table_file_url = await run_in_threadpool(save_html_table, result["html_table_data"])
+                            if table_file_url:
+                                result["table_file_url"] = table_file_url
 
-                        except Exception as e:  # Handle any exceptions
-                            print(f"Error saving table file: {str(e)}")
+                    # Table gate and insights, timed as separate stages
+                    table_accept_status, table_insights = await analyze_table(result["data"][:20], user_question, question)
+                    result["table_accept_status"] = table_accept_status
+                    if result["html_table_data"] and table_insights is not None:
+                        result["table_insights"] = table_insights
 
-                    if result["query_generation_status"] == "Yes":  # Check if the HTML table data exists
-                        result["table_accept_status"] = generate_table_analysis(result["data"][:20])
+            result["timings"] = timings
+            logger.info(f"Chat stage timings for session {session_id}: {timings}")
 
-                    if result["html_table_data"] and result["table_accept_status"].lower() == "yes":
-                        result["table_insights"] = generate_html_table_analysis(result["data"][:20], user_question, deployment, question)
+            remember_answer(session_id, seq, query_response, result["text_explanation"], result.get("table_insights"))
 
-            chat_histories[session_id]["answers"].append(query_response)
+            total = time.perf_counter() - started
+            metrics.REQUEST_SECONDS.labels("chat").observe(total)
 
-            # Return the response as a JSON object
+            # Return the response as a JSON object, with the stage timings for the browser's network panel
             return JSONResponse(content={
                 "session_id": session_id,
                 "result": result
-            })
+            }, headers={"Server-Timing": metrics.server_timing({**timings, "total": round(total * 1000, 1)})})
         # Handle any exceptions
         except Exception as e:
             return JSONResponse(
@@ -847,19 +747,261 @@ async def chat(question: Question):
             status_code=500
         )
 
-# Cache cleanup function
-def cleanup_old_cache(max_age: int = 3600):
-    """Remove cache entries older than max_age seconds"""
-    current_time = time.time()
-    for key in list(question_cache.keys()):
-        if current_time - question_cache[key].get('timestamp', 0) > max_age:
-            del question_cache[key]
+
+class JsonStringFieldStreamer:
+    """Incrementally extract the value of one string field from a JSON document being streamed"""
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        self.key_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self.buffer = ""
+        self.position = None  # Index of the next unread value character, None until the key is seen
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of the document and return the newly decoded part of the field value"""
+        self.buffer += chunk
+        if self.done:
+            return ""
+
+        if self.position is None:
+            match = self.key_pattern.search(self.buffer)
+            if not match:
+                return ""
+            self.position = match.end()
+
+        decoded = []
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if char == '"':
+                self.done = True
+                break
+            if char != '\\':
+                decoded.append(char)
+                self.position += 1
+                continue
+
+            # Wait for the rest of an escape sequence that is split across chunks
+            if self.position + 1 >= len(self.buffer):
+                break
+            escape = self.buffer[self.position + 1]
+            if escape == 'u':
+                if self.position + 6 > len(self.buffer):
+                    break
+                code = int(self.buffer[self.position + 2:self.position + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # High surrogate, decode together with the low surrogate that follows
+                    if self.position + 12 > len(self.buffer):
+                        break
+                    low = int(self.buffer[self.position + 8:self.position + 12], 16)
+                    decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    self.position += 12
+                else:
+                    decoded.append(chr(code))
+                    self.position += 6
+            else:
+                decoded.append(self._ESCAPES.get(escape, escape))
+                self.position += 2
+
+        return "".join(decoded)
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_and_cache(user_question: str, session_id: str, question: Question, cache_key: str,
+                           deltas: asyncio.Queue) -> str:
+    """Stream the query generation into the queue, ended by None, then cache and return the whole response"""
+    parts = []
+    refusals = []
+    try:
+        async for delta in stream_query(user_question, session_id, question, refusals):
+            parts.append(delta)
+            deltas.put_nowait(delta)
+    finally:
+        deltas.put_nowait(None)
+
+    query_response = "".join(parts)
+    query_output_parser.record(query_response, refused=bool(refusals))
+    await cache_query_response(cache_key, user_question, query_response)
+    return query_response
+
+
+async def stream_chat_events(question: Question, seq: int):
+    """Run the chat pipeline and yield typed SSE events as each stage completes"""
+    session_id = question.session_id
+    user_question = question.question
+    started = time.perf_counter()
+    ttft_ms = None
+    timings = metrics.request_timings()
+
+    try:
+        cache_key = get_query_cache_key(user_question, question)
+        query_response = await response_cache.get_async(cache_key)
+
+        if query_response is None:
+            query_response = fast_path_response(user_question, session_id, question)
+
+        deltas = None
+        if query_response is None:
+            # The completion runs as a flight of its own, so /chat and other streams of the same question wait
+            # for it; only the caller that started it streams the deltas
+            deltas = asyncio.Queue()
+            flight, leader = query_flight.start(
+                cache_key, lambda: stream_and_cache(user_question, session_id, question, cache_key, deltas))
+            if not leader:
+                deltas = None
+                query_response = await asyncio.shield(flight)
+
+        if deltas is None:
+            response_dict = parse_query_response(query_response)
+            ttft_ms = (time.perf_counter() - started) * 1000
+            metrics.STREAM_TTFT_SECONDS.observe(ttft_ms / 1000)
+            yield sse_event("token", {"text": response_dict["text_explanation"]})
+        else:
+            # Stream text_explanation tokens while the model is still writing the JSON
+            streamer = JsonStringFieldStreamer("text_explanation")
+            while True:
+                delta = await deltas.get()
+                if delta is None:
+                    break
+                text = streamer.feed(delta)
+                if text:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                        metrics.STREAM_TTFT_SECONDS.observe(ttft_ms / 1000)
+                    yield sse_event("token", {"text": text})
+
+            query_response = await asyncio.shield(flight)
+            response_dict = parse_query_response(query_response)
+        metrics.observe_stage("query_generation", time.perf_counter() - started)
+
+        checked_query = None
+        answer_text, answer_insights = None, None
+        if response_dict["query_generation_status"].lower() == "yes" and response_dict["query"]:
+            with metrics.stage("preflight"):
+                checked_query, regenerated = await preflight_generated_query(
+                    response_dict["query"], query_response, user_question, session_id, question)
+
+            # The streamed explanation was written for the rejected query; replace it with the new one
+            replacement = regenerated_response(query_response, regenerated)
+            query_response = regenerated
+            if replacement is not None:
+                response_dict = replacement
+                answer_text = replacement["text_explanation"]
+                yield sse_event("rejection", {"text": answer_text})
+
+        yield sse_event("query", {
+            "query_generation_status": response_dict["query_generation_status"],
+            "query": checked_query or response_dict["query"]
+        })
+
+        if response_dict["query_generation_status"].lower() == "yes" and response_dict["query"]:
+            query_result, truncated = None, False
+            if checked_query is not None:
+                with metrics.stage("cypher_execution"):
+                    query_result, truncated = await execute_cypher_query(await get_async_driver(), checked_query)
+
+            if not query_result:
+                # The streamed explanation is superseded by the rejection message
+                with metrics.stage("rejection"):
+                    answer_text = await generate_answer_rejection(user_question, question)
+                yield sse_event("rejection", {"text": answer_text})
+            else:
+                data = query_result
+                table_event = {"rows": data, "truncated": truncated}
+                with metrics.stage("html_table"):
+                    html_table_data = convert_to_html_table(query_result)
+                    if html_table_data:
+                        table_file_url = await run_in_threadpool(save_html_table, html_table_data)
+                        if table_file_url:
+                            table_event["table_file_url"] = table_file_url
+                yield sse_event("table", table_event)
+
+                table_accept_status, table_insights = await analyze_table(data[:20], user_question, question)
+                if html_table_data and table_insights is not None:
+                    answer_insights = table_insights
+                    yield sse_event("insights", {"table_insights": table_insights})
+                else:
+                    yield sse_event("insights", {"table_accept_status": table_accept_status})
+
+        remember_answer(session_id, seq, query_response, answer_text, answer_insights)
+
+        total = time.perf_counter() - started
+        metrics.REQUEST_SECONDS.labels("chat_stream").observe(total)
+        total_ms = round(total * 1000, 1)
+        ttft_ms = round(ttft_ms, 1) if ttft_ms is not None else None
+        logger.info(f"Streamed answer for session {session_id}: ttft={ttft_ms}ms total={total_ms}ms stages={timings}")
+        yield sse_event("done", {"session_id": session_id, "ttft_ms": ttft_ms, "total_ms": total_ms, "timings": timings})
+
+    except Exception as e:
+        print(f"Error in chat stream: {str(e)}")
+        yield sse_event("error", {"error": f"Error processing response: {str(e)}"})
+
+
+@router.post("/chat/stream")
+async def chat_stream(question: Question):
+    """Stream the answer as Server-Sent Events: token*, query, table, insights, done"""
+    seq = session_store.add_question(question.session_id, question.question)
+    if seq is None:
+        return JSONResponse(
+            content={"error": "Invalid session ID"},
+            status_code=400
+        )
+
+    return StreamingResponse(
+        stream_chat_events(question, seq),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Return cache counters, the plan cache hit rate, the fast path bypass rate and the parse failure rate"""
+    return JSONResponse(content={
+        "response_cache": response_cache.stats(),
+        "cypher_cache": cypher_cache.stats(),
+        "preflight_cache": preflight.verdict_cache.stats(),
+        "rejection_cache": rejection_cache.stats(),
+        "plan_cache": plan_cache_tracker.stats(),
+        "fast_path": fast_path.stats(),
+        "table_files": artifact_store.stats(),
+        "sessions": session_store.stats(),
+        "query_output": query_output_parser.stats(),
+        "single_flight": {"query_generation": query_flight.stats(), "cypher": cypher_flight.stats()}
+    })
+
+@router.get("/cypher/stats")
+async def cypher_stats():
+    """Return duration and row count metrics of executed Cypher queries"""
+    return JSONResponse(content=execution.query_stats.stats())
+
+@router.get("/schema")
+async def schema_summary():
+    """Return the compact schema used in the query prompt and its token savings"""
+    return JSONResponse(content={**schema_prompt.stats(), "summary": schema_prompt.summary})
+
+@router.get("/entities")
+async def extract_entities(text: str):
+    """Return the areas, places, hotels and restaurants the gazetteer recognizes in the text"""
+    return JSONResponse(content={
+        "entities": [
+            {"text": match.text, "start": match.start, "end": match.end, "id": match.entity.id,
+             "label": match.entity.label, "name": match.entity.name,
+             "candidates": [entity.id for entity in match.entities]}
+            for match in gazetteer.extract(text)
+        ],
+        "gazetteer": gazetteer.stats()
+    })
 
 # Add new route definitions after the existing start_session route
 @router.get("/check_session/{session_id}")
 async def check_session(session_id: str):
     """Check if a session exists and return its validity status"""
-    if session_id in chat_histories:
+    if session_store.exists(session_id):
         return JSONResponse(
             content={
                 "valid": True,
@@ -872,57 +1014,41 @@ async def check_session(session_id: str):
     )
 
 @router.get("/chat_history/{session_id}")
-async def get_chat_history(session_id: str):
-    """Get chat history for a specific session"""
-    if session_id not in chat_histories:
+async def get_chat_history(session_id: str, request: Request,
+                           before: Optional[int] = Query(None, description="Return turns older than this cursor"),
+                           limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE)):
+    """Get chat history for a specific session, newest turns first page, older pages through the cursor"""
+    version = session_store.version(session_id)
+    if version is None:
         return JSONResponse(
             content={"error": "Session not found"},
             status_code=404
         )
-    
-    # Format chat history into message format
-    history = []
-    questions = chat_histories[session_id]["questions"]
-    answers = chat_histories[session_id]["answers"]
-    
-    for i in range(len(questions)):
-        # Add user message
-        history.append({
-            "sender": "user",
-            "text": questions[i],
-            "time": datetime.now().strftime("%I:%M %p")  # You might want to store actual timestamps in your chat_histories
-        })
-        
-        # Add bot message if available
-        if i < len(answers):
-            try:
-                # Parse the answer from JSON string if needed
-                answer_data = answers[i]
-                if isinstance(answer_data, str):
-                    answer_data = json.loads(answer_data)
-                
-                history.append({
-                    "sender": "bot",
-                    "text": answer_data.get("text_explanation", "No response"),
-                    "time": datetime.now().strftime("%I:%M %p"),
-                    "tableData": answer_data.get("data"),
-                    "tableInsights": answer_data.get("table_insights")
-                })
-            except Exception as e:
-                print(f"Error parsing answer: {str(e)}")
-                history.append({
-                    "sender": "bot",
-                    "text": "Error retrieving response",
-                    "time": datetime.now().strftime("%I:%M %p")
-                })
-
-    return JSONResponse(content={"history": history})
+
+    # The history only changes with the session version, so an unchanged page needs no work at all
+    etag = f'"{version}-{before if before is not None else "latest"}-{limit}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    page = session_store.page(session_id, before, limit)
+    if page is None:
+        # Expired or ended between the version check and the read
+        return JSONResponse(
+            content={"error": "Session not found"},
+            status_code=404
+        )
+    turns, has_more = page
+    next_before = turns[0].seq if has_more and turns else None
+    # Each turn's messages were serialized when it was stored; only the envelope is built here
+    body = (f'{{"history":[{",".join(turn.fragment for turn in turns)}],'
+            f'"next_before":{json.dumps(next_before)},"has_more":{json.dumps(has_more)}}}')
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.delete("/end_session/{session_id}")
 async def end_session(session_id: str):
     """End a session and clean up its resources"""
-    if session_id in chat_histories:
-        del chat_histories[session_id]
+    if session_store.delete(session_id):
         return JSONResponse(content={"message": "Session terminated successfully"})
     return JSONResponse(
         content={"error": "Session not found"},
@@ -0,0 +1,236 @@
+import hashlib
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+# Token patterns, tried in order
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<number>\d+\.\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?|\d+(?:[eE][+-]?\d+)?)
+  | (?P<param>\$\w+)
+  | (?P<ident>`[^`]*`|[A-Za-z_]\w*)
+  | (?P<space>\s+)
+  | (?P<punct><>|<=|>=|=~|->|<-|\.\.|[^\s\w])
+""", re.VERBOSE | re.DOTALL)
+
+KEYWORDS = {
+    "ALL", "AND", "ANY", "AS", "ASC", "ASCENDING", "BY", "CALL", "CASE", "CONTAINS", "COUNT", "CREATE",
+    "DELETE", "DESC", "DESCENDING", "DETACH", "DISTINCT", "ELSE", "END", "ENDS", "EXISTS", "FALSE",
+    "FOREACH", "IN", "IS", "LIMIT", "LOAD", "MATCH", "MERGE", "NONE", "NOT", "NULL", "ON", "OPTIONAL",
+    "OR", "ORDER", "REMOVE", "RETURN", "SET", "SINGLE", "SKIP", "STARTS", "THEN", "TRUE", "UNION",
+    "UNWIND", "USE", "WHEN", "WHERE", "WITH", "XOR", "YIELD"
+}
+
+# Clauses and procedures that change the graph
+WRITE_KEYWORDS = {"CREATE", "MERGE", "SET", "DELETE", "DETACH", "REMOVE", "FOREACH", "LOAD", "DROP"}
+
+
+def tokenize(query: str) -> List[Tuple[str, str]]:
+    """Split a Cypher query into (kind, text) tokens, dropping whitespace and comments"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(query):
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        tokens.append((kind, match.group()))
+    return tokens
+
+
+def _variable_names(tokens: List[Tuple[str, str]]) -> Set[str]:
+    """Spellings used as variables or aliases: after AS, before a property access or bound in a pattern"""
+    names = set()
+    for position, (kind, text) in enumerate(tokens):
+        if kind != "ident":
+            continue
+        previous = tokens[position - 1][1] if position else ""
+        following = tokens[position + 1][1] if position + 1 < len(tokens) else ""
+        if previous.upper() == "AS" or following == "." or (previous in ("(", "[") and following in (":", ")", "]", "{")):
+            names.add(text)
+    return names
+
+
+def _canonical_tokens(tokens: List[Tuple[str, str]]) -> List[str]:
+    """Upper case keywords and use one quoting style for strings"""
+    output = []
+    # Variables and aliases are case sensitive, even when they are spelled like a keyword (end, count)
+    variables = _variable_names(tokens)
+    for position, (kind, text) in enumerate(tokens):
+        previous = tokens[position - 1][1] if position else ""
+        following = tokens[position + 1][1] if position + 1 < len(tokens) else ""
+        # Property names and map keys that happen to be keywords keep their case
+        if (kind == "ident" and text.upper() in KEYWORDS and text not in variables
+                and previous not in (".", ":") and following != ":"):
+            text = text.upper()
+        elif kind == "string" and text[0] == "'":
+            # 'Ella' and "Ella" are the same literal
+            inner = re.sub(r'(?<!\\)"', '\\"', text[1:-1].replace("\\'", "'"))
+            text = '"' + inner + '"'
+        output.append(text)
+    return output
+
+
+def _split_top_level(tokens: List[str], separator: str = ",") -> List[List[str]]:
+    """Split a token list on separators that are not nested in brackets"""
+    parts, current, depth = [], [], 0
+    for token in tokens:
+        if token in ("(", "[", "{"):
+            depth += 1
+        elif token in (")", "]", "}"):
+            depth -= 1
+        if token == separator and depth == 0:
+            parts.append(current)
+            current = []
+        else:
+            current.append(token)
+    parts.append(current)
+    return parts
+
+
+def _is_literal(part: List[str]) -> bool:
+    return len(part) == 1 and (part[0][0] == '"' or part[0][0].isdigit()) or part in (["TRUE"], ["FALSE"], ["NULL"])
+
+
+def _canonicalize_literals(tokens: List[str]) -> List[str]:
+    """Sort property map keys and IN list literals, where order does not change the result"""
+    output = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token not in ("{", "["):
+            output.append(token)
+            index += 1
+            continue
+
+        # Find the matching closing bracket
+        closing = "}" if token == "{" else "]"
+        depth, end = 0, index
+        while end < len(tokens):
+            if tokens[end] in ("(", "[", "{"):
+                depth += 1
+            elif tokens[end] in (")", "]", "}"):
+                depth -= 1
+                if depth == 0:
+                    break
+            end += 1
+        inner = _canonicalize_literals(tokens[index + 1:end])
+        parts = _split_top_level(inner)
+
+        if token == "{" and all(len(part) > 2 and part[1] == ":" for part in parts):
+            parts.sort(key=lambda part: part[0])
+        elif token == "[" and output and output[-1] == "IN" and all(_is_literal(part) for part in parts):
+            parts.sort()
+
+        output.append(token)
+        for position, part in enumerate(parts):
+            if position:
+                output.append(",")
+            output.extend(part)
+        output.append(closing)
+        index = end + 1
+    return output
+
+
+def normalize(query: str) -> str:
+    """Canonical text of a query: no comments or extra whitespace, upper case keywords, sorted literals"""
+    tokens = _canonical_tokens(tokenize(query))
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(_canonicalize_literals(tokens))
+
+
+def fingerprint(query: str) -> str:
+    """Stable key for queries that only differ in formatting"""
+    return hashlib.sha1(normalize(query).encode("utf-8")).hexdigest()
+
+
+def labels(query: str) -> Set[str]:
+    """Node labels and relationship types referenced by the query"""
+    found = set()
+    tokens = tokenize(query)
+    brace_depth = 0
+    for position, (kind, text) in enumerate(tokens):
+        if text == "{":
+            brace_depth += 1
+        elif text == "}":
+            brace_depth -= 1
+        elif (text in (":", "|") and brace_depth == 0 and position + 1 < len(tokens)
+              and tokens[position + 1][0] == "ident"):
+            found.add(tokens[position + 1][1].strip("`"))
+    return found
+
+
+def is_write_query(query: str) -> bool:
+    """True if the query contains a clause that changes the graph"""
+    tokens = tokenize(query)
+    for position, (kind, text) in enumerate(tokens):
+        previous = tokens[position - 1][1] if position else ""
+        if kind == "ident" and text.upper() in WRITE_KEYWORDS and previous not in (".", ":"):
+            return True
+    return False
+
+
+STRING_ESCAPES = {"\\": "\\", "'": "'", '"': '"', "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+def _decode_string(text: str) -> str:
+    """Value of a quoted Cypher string literal"""
+    inner = text[1:-1]
+    output = []
+    index = 0
+    while index < len(inner):
+        char = inner[index]
+        if char == "\\" and index + 1 < len(inner):
+            escape = inner[index + 1]
+            if escape in ("u", "U") and index + 6 <= len(inner):
+                output.append(chr(int(inner[index + 2:index + 6], 16)))
+                index += 6
+                continue
+            output.append(STRING_ESCAPES.get(escape, "\\" + escape))
+            index += 2
+            continue
+        output.append(char)
+        index += 1
+    return "".join(output)
+
+
+def parameterize(query: str) -> Tuple[str, Dict[str, Any]]:
+    """Lift string and number literals into $parameters so queries that only differ in values share a plan"""
+    # Comments are dropped and whitespace collapsed; every other token is kept exactly as written, since
+    # variables and aliases spelled like keywords (end, Count) must not change. Equal values share one parameter.
+    matches = [match for match in TOKEN_PATTERN.finditer(query) if match.lastgroup != "comment"]
+    params: Dict[str, Any] = {}
+    names: Dict[Tuple[type, Any], str] = {}
+    output = []
+    previous_end = 0
+    significant = [match for match in matches if match.lastgroup != "space"]
+
+    for position, match in enumerate(significant):
+        kind, text = match.lastgroup, match.group()
+        previous = significant[position - 1].group() if position else ""
+        following = significant[position + 1].group() if position + 1 < len(significant) else ""
+
+        if kind == "string":
+            value = _decode_string(text)
+        elif kind == "number" and not (previous in ("*", "..") or following == ".." or text.endswith(".")
+                                       or text.startswith(".") or previous.endswith(".")):
+            # Variable length bounds such as *1..3 cannot be parameters
+            value = float(text) if any(char in text for char in ".eE") else int(text)
+        else:
+            value = None
+
+        if value is not None:
+            key = (type(value), value)
+            if key not in names:
+                names[key] = f"p{len(names)}"
+                params[names[key]] = value
+            text = "$" + names[key]
+
+        # Keep tokens that were adjacent adjacent, and turn any gap into a single space
+        if output and match.start() > previous_end:
+            output.append(" ")
+        output.append(text)
+        previous_end = match.end()
+
+    while output and output[-1] in (";", " "):
+        output.pop()
+    return "".join(output), params
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from neo4j import AsyncGraphDatabase, GraphDatabase
+
+load_dotenv()
+
+logger = logging.getLogger("database")
+
+# Configuration
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))  # Connections per server
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))  # Seconds to wait for a free connection
+NEO4J_LIVENESS_CHECK_SECONDS = float(os.getenv("NEO4J_LIVENESS_CHECK_SECONDS", "30"))  # Ping connections idle this long
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+NEO4J_RECONNECT_SECONDS = float(os.getenv("NEO4J_RECONNECT_SECONDS", "15"))  # Minimum gap between reconnect attempts
+
+
+def driver_config() -> Dict[str, Any]:
+    """Pool settings shared by the sync and async drivers"""
+    return {
+        "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+        "liveness_check_timeout": NEO4J_LIVENESS_CHECK_SECONDS,
+        "max_connection_lifetime": NEO4J_MAX_CONNECTION_LIFETIME
+    }
+
+
+class DriverRegistry:
+    """The pooled Neo4j drivers of the process, reconnecting on demand when the database was unavailable"""
+
+    def __init__(self, uri: Optional[str] = NEO4J_URI, user: Optional[str] = NEO4J_USERNAME,
+                 password: Optional[str] = NEO4J_PASSWORD):
+        self.uri = uri
+        self.user = user
+        self.password = password
+        self.driver = None
+        self.async_driver = None  # Used from the event loop by the chat and weather read paths
+        self.connects = 0
+        self.connect_failures = 0
+        self.sessions = 0  # Sessions opened through session()
+        self.active_sessions = 0
+        self.waits = 0  # Sessions opened while every pooled connection was busy
+        self._attempted_at = 0.0
+        self._async_attempted_at = 0.0
+        self._lock = threading.Lock()
+        self._async_lock = None
+
+    def connect(self):
+        """Create the driver and verify it can reach the database; returns None on failure"""
+        with self._lock:
+            if self.driver is not None:
+                return self.driver
+            self._attempted_at = time.time()
+            driver = None
+            try:
+                driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password), **driver_config())
+                driver.verify_connectivity()
+            except Exception as e:
+                self.connect_failures += 1
+                logger.error(f"Failed to connect to Neo4j: {str(e)}")
+                # Release the pool of the driver that could not connect, or every retry leaks one
+                if driver is not None:
+                    driver.close()
+                return None
+            self.driver = driver
+            self.connects += 1
+            logger.info("Connection to Neo4j established successfully!")
+            return driver
+
+    def get(self):
+        """Return the shared driver, trying to reconnect at most once every NEO4J_RECONNECT_SECONDS"""
+        driver = self.driver
+        if driver is None and time.time() - self._attempted_at >= NEO4J_RECONNECT_SECONDS:
+            driver = self.connect()
+        return driver
+
+    def require(self):
+        """Return the shared driver or raise if the database cannot be reached"""
+        driver = self.get()
+        if driver is None:
+            raise ConnectionError("Neo4j is not available")
+        return driver
+
+    @contextmanager
+    def session(self, driver=None, **config):
+        """Open a session on the shared (or given) driver, counting sessions that had to wait for a connection"""
+        driver = driver or self.require()
+        with self._lock:
+            self.sessions += 1
+            self.active_sessions += 1
+            if self._count_connections(getattr(driver, "_pool", None))[0] >= NEO4J_MAX_POOL_SIZE:
+                self.waits += 1
+        try:
+            with driver.session(**config) as session:
+                yield session
+        finally:
+            with self._lock:
+                self.active_sessions -= 1
+
+    async def connect_async(self):
+        """Create the async driver and verify it can reach the database; returns None on failure"""
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if self.async_driver is not None:
+                return self.async_driver
+            self._async_attempted_at = time.time()
+            driver = None
+            try:
+                driver = AsyncGraphDatabase.driver(self.uri, auth=(self.user, self.password), **driver_config())
+                await driver.verify_connectivity()
+            except Exception as e:
+                self.connect_failures += 1
+                logger.error(f"Failed to connect the async Neo4j driver: {str(e)}")
+                if driver is not None:
+                    await driver.close()
+                return None
+            self.async_driver = driver
+            self.connects += 1
+            return driver
+
+    async def get_async(self):
+        """Return the shared async driver, trying to reconnect at most once every NEO4J_RECONNECT_SECONDS"""
+        driver = self.async_driver
+        if driver is None and time.time() - self._async_attempted_at >= NEO4J_RECONNECT_SECONDS:
+            driver = await self.connect_async()
+        return driver
+
+    @asynccontextmanager
+    async def async_session(self, driver=None, **config):
+        """Async counterpart of session(); waits for a connection without holding a thread"""
+        driver = driver or await self.get_async()
+        if driver is None:
+            raise ConnectionError("Neo4j is not available")
+        with self._lock:
+            self.sessions += 1
+            self.active_sessions += 1
+            if self._count_connections(getattr(driver, "_pool", None))[0] >= NEO4J_MAX_POOL_SIZE:
+                self.waits += 1
+        try:
+            async with driver.session(**config) as session:
+                yield session
+        finally:
+            with self._lock:
+                self.active_sessions -= 1
+
+    def close(self):
+        with self._lock:
+            if self.driver is not None:
+                self.driver.close()
+                self.driver = None
+                logger.info("Neo4j driver closed")
+
+    async def close_async(self):
+        if self.async_driver is not None:
+            driver, self.async_driver = self.async_driver, None
+            await driver.close()
+            logger.info("Async Neo4j driver closed")
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Connections in use and idle, read from the drivers' pools"""
+        in_use = idle = 0
+        for driver in (self.driver, self.async_driver):
+            pool_in_use, pool_idle = self._count_connections(getattr(driver, "_pool", None))
+            in_use += pool_in_use
+            idle += pool_idle
+        return {"in_use": in_use, "idle": idle}
+
+    @staticmethod
+    def _count_connections(pool) -> Tuple[int, int]:
+        in_use = idle = 0
+        # The driver has no public pool metrics; its pool keeps a deque of connections per server
+        for connections in list(getattr(pool, "connections", {}).values()):
+            for connection in list(connections):
+                if connection.in_use:
+                    in_use += 1
+                else:
+                    idle += 1
+        return in_use, idle
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.driver is not None,
+            "async_connected": self.async_driver is not None,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "max_pool_size": NEO4J_MAX_POOL_SIZE,
+            "acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+            **self.pool_stats(),
+            "sessions": self.sessions,
+            "active_sessions": self.active_sessions,
+            "waits": self.waits
+        }
+
+
+# Global instance to be imported by other modules
+neo4j_registry = DriverRegistry()
+
+
+def get_driver():
+    """Shared Neo4j driver, or None while the database is unreachable"""
+    return neo4j_registry.get()
+
+
+async def get_async_driver():
+    """Shared async Neo4j driver, or None while the database is unreachable"""
+    return await neo4j_registry.get_async()
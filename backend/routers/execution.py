@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+
+import neo4j
+from neo4j.exceptions import CypherSyntaxError
+
+from routers import cypher
+from routers.cache import plan_cache_tracker
+from routers.database import neo4j_registry
+
+logger = logging.getLogger("execution")
+
+# Configuration
+CYPHER_TIMEOUT_SECONDS = float(os.getenv("CYPHER_TIMEOUT_SECONDS", "10"))  # Server side transaction timeout
+CYPHER_FETCH_SIZE = int(os.getenv("CYPHER_FETCH_SIZE", "200"))  # Records pulled from the server per batch
+CYPHER_MAX_ROWS = int(os.getenv("CYPHER_MAX_ROWS", "500"))  # Rows kept per query; the rest is never fetched
+
+
+class QueryStats:
+    """Duration and row count counters for executed Cypher queries"""
+
+    def __init__(self, window: int = 1000):
+        self.queries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.truncated = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._recent = deque(maxlen=window)  # Durations of the latest queries, for percentiles
+        self._lock = threading.Lock()
+
+    def record(self, duration_ms: float, rows: int, truncated: bool):
+        with self._lock:
+            self.queries += 1
+            self.rows += rows
+            self.max_rows = max(self.max_rows, rows)
+            self.truncated += truncated
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+            self._recent.append(duration_ms)
+
+    def record_failure(self, duration_ms: float, timed_out: bool):
+        with self._lock:
+            self.failures += 1
+            self.timeouts += timed_out
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+            self._recent.append(duration_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+            executed = self.queries + self.failures
+
+            def percentile(share: float) -> float:
+                return round(recent[min(int(len(recent) * share), len(recent) - 1)], 1) if recent else 0.0
+
+            return {
+                "queries": self.queries,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "truncated": self.truncated,
+                "rows": self.rows,
+                "avg_rows": round(self.rows / self.queries, 1) if self.queries else 0.0,
+                "max_rows": self.max_rows,
+                "avg_ms": round(self.total_ms / executed, 1) if executed else 0.0,
+                "p50_ms": percentile(0.5),
+                "p95_ms": percentile(0.95),
+                "max_ms": round(self.max_ms, 1),
+                "timeout_seconds": CYPHER_TIMEOUT_SECONDS,
+                "fetch_size": CYPHER_FETCH_SIZE,
+                "row_cap": CYPHER_MAX_ROWS
+            }
+
+
+# Global instance to be imported by other modules
+query_stats = QueryStats()
+
+
+@neo4j.unit_of_work(timeout=CYPHER_TIMEOUT_SECONDS)
+def collect_rows(tx, text: str, params: Dict[str, Any], row_mapper: Callable) -> Tuple[List[Any], bool]:
+    """Read at most CYPHER_MAX_ROWS rows; returning early leaves the remaining records unfetched"""
+    result = tx.run(text, params)
+    rows = []
+    for record in result:
+        if len(rows) >= CYPHER_MAX_ROWS:
+            return rows, True
+        rows.append(row_mapper(record))
+    return rows, False
+
+
+@neo4j.unit_of_work(timeout=CYPHER_TIMEOUT_SECONDS)
+async def collect_rows_async(tx, text: str, params: Dict[str, Any], row_mapper: Callable) -> Tuple[List[Any], bool]:
+    """Async counterpart of collect_rows"""
+    result = await tx.run(text, params)
+    rows = []
+    async for record in result:
+        if len(rows) >= CYPHER_MAX_ROWS:
+            return rows, True
+        rows.append(row_mapper(record))
+    return rows, False
+
+
+def is_timeout(error: Exception) -> bool:
+    code = getattr(error, "code", None) or ""
+    return "TransactionTimedOut" in code or "timed out" in str(error).lower()
+
+
+def run_read_query(driver, query: str, row_mapper: Callable) -> Tuple[List[Any], bool]:
+    """Run a query in a READ managed transaction and return (rows, truncated)"""
+    # Literals become parameters so Neo4j reuses one plan for every area and spelling
+    text, params = cypher.parameterize(query)
+    plan_cache_tracker.record(query, text)
+    started = time.perf_counter()
+    try:
+        # READ access lets a neo4j:// routing driver send the query to a reader
+        with neo4j_registry.session(driver, default_access_mode=neo4j.READ_ACCESS, fetch_size=CYPHER_FETCH_SIZE) as session:
+            try:
+                rows, truncated = session.execute_read(collect_rows, text, params, row_mapper)
+            except CypherSyntaxError as e:
+                # Some clauses do not accept parameters; run the query as generated instead
+                logger.warning(f"Parameterized query rejected, running it as generated: {str(e)}")
+                rows, truncated = session.execute_read(collect_rows, query, {}, row_mapper)
+    except Exception as e:
+        record_failure(query, started, e)
+        raise
+    return record_success(query, started, rows, truncated)
+
+
+async def run_read_query_async(driver, query: str, row_mapper: Callable) -> Tuple[List[Any], bool]:
+    """Run a query in a READ managed transaction on the async driver and return (rows, truncated)"""
+    text, params = cypher.parameterize(query)
+    plan_cache_tracker.record(query, text)
+    started = time.perf_counter()
+    try:
+        async with neo4j_registry.async_session(driver, default_access_mode=neo4j.READ_ACCESS,
+                                                fetch_size=CYPHER_FETCH_SIZE) as session:
+            try:
+                rows, truncated = await session.execute_read(collect_rows_async, text, params, row_mapper)
+            except CypherSyntaxError as e:
+                logger.warning(f"Parameterized query rejected, running it as generated: {str(e)}")
+                rows, truncated = await session.execute_read(collect_rows_async, query, {}, row_mapper)
+    except Exception as e:
+        record_failure(query, started, e)
+        raise
+    return record_success(query, started, rows, truncated)
+
+
+def record_failure(query: str, started: float, error: Exception):
+    duration_ms = (time.perf_counter() - started) * 1000
+    timed_out = is_timeout(error)
+    query_stats.record_failure(duration_ms, timed_out)
+    if timed_out:
+        logger.warning(f"Query timed out after {duration_ms:.0f} ms: {query}")
+
+
+def record_success(query: str, started: float, rows: List[Any], truncated: bool) -> Tuple[List[Any], bool]:
+    duration_ms = (time.perf_counter() - started) * 1000
+    query_stats.record(duration_ms, len(rows), truncated)
+    if truncated:
+        logger.info(f"Query result truncated to {CYPHER_MAX_ROWS} rows: {query}")
+    return rows, truncated
@@ -0,0 +1,209 @@
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from routers import cypher
+from routers.gazetteer import Gazetteer, gazetteer, normalize_words
+from routers.retrieval import FewShotIndex, few_shot_index
+
+logger = logging.getLogger("fast_path")
+
+# Configuration
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"  # Skip the LLM for near-duplicates
+FAST_PATH_THRESHOLD = float(os.getenv("FAST_PATH_THRESHOLD", "0.5"))  # Minimum retrieval similarity to try a template
+FAST_PATH_CANDIDATES = int(os.getenv("FAST_PATH_CANDIDATES", "3"))  # Closest examples tried as templates
+
+# A slot value is a short name or a number; anything longer is left to the LLM
+STRING_SLOT = r"[^\s?.!,;:\"\\]+(?:\s+[^\s?.!,;:\"\\]+){0,3}"
+NUMBER_SLOT = r"\d+(?:\.\d+)?"
+TRAILING_PUNCTUATION = "?.! \t\n"
+
+
+class QueryTemplate:
+    """A sample question turned into a pattern whose entity and number slots map onto literals of its Cypher"""
+
+    __slots__ = ("pattern", "slots", "query", "example", "complete")
+
+    def __init__(self, pattern, slots: Dict[str, Tuple[str, str, Optional[str]]], query: str, example: str):
+        self.pattern = pattern
+        self.slots = slots  # group name -> (kind, value as written in the sample, property it is compared with)
+        self.query = query
+        self.example = example
+        # Every string literal of the query comes from the question, so none is tied to the sample's own places
+        slot_values = {value.lower() for kind, value, _ in slots.values() if kind == "string"}
+        self.complete = all(value.lower() in slot_values for kind, value, _ in literals(query) if kind == "string")
+
+    def fill(self, question: str, entities: Optional[Dict[Tuple[str, str], str]] = None) -> Optional[str]:
+        """Return the sample query with the entities of the question substituted, or None if it does not fit"""
+        match = self.pattern.match(question.strip().rstrip(TRAILING_PUNCTUATION))
+        if not match:
+            return None
+
+        replacements = {}
+        for group, (kind, original, prop) in self.slots.items():
+            value = " ".join(match.group(group).split())
+            if kind == "string" and entities is not None:
+                # Only accept names known for the same property, spelled the way the database stores them
+                value = entities.get((prop, " ".join(normalize_words(value))))
+                if value is None:
+                    return None
+            replacements[(kind, original.lower())] = value
+
+        output, position = [], 0
+        for token in cypher.TOKEN_PATTERN.finditer(self.query):
+            kind, text = token.lastgroup, token.group()
+            if kind == "string":
+                value = replacements.get(("string", text[1:-1].lower()))
+                if value is not None:
+                    if text[0] in value or "\\" in value:
+                        return None
+                    text = text[0] + value + text[0]
+            elif kind == "number":
+                value = replacements.get(("number", text.lower()))
+                if value is not None:
+                    text = value
+            output.append(self.query[position:token.start()])
+            output.append(text)
+            position = token.end()
+        output.append(self.query[position:])
+        return "".join(output)
+
+
+def literals(query: str) -> List[Tuple[str, str, Optional[str]]]:
+    """Return (kind, value, property) for each literal, where property is the key it is compared with"""
+    tokens = cypher.tokenize(query)
+    found = []
+    for position, (kind, text) in enumerate(tokens):
+        if kind not in ("string", "number"):
+            continue
+        previous = [token for _, token in tokens[max(position - 3, 0):position]]
+        prop = None
+        if len(previous) >= 2 and previous[-1] == ":":
+            prop = previous[-2]
+        elif len(previous) == 3 and previous[0] == "." and previous[-1] in ("=", "<>", "CONTAINS", "contains"):
+            prop = previous[1]
+        value = text[1:-1] if kind == "string" else text
+        if value.strip():
+            found.append((kind, value, prop))
+    return found
+
+
+def find_slots(question: str, query: str) -> List[Tuple[str, str, Optional[str], int, int]]:
+    """Find the string and number literals of the query that are written out in the question"""
+    candidates = {}
+    for kind, value, prop in literals(query):
+        candidates.setdefault(value.lower(), (kind, value, prop))
+
+    slots = []
+    taken = []
+    # Longest values first so "Nuwara Eliya" wins over a shorter literal inside it
+    for kind, value, prop in sorted(candidates.values(), key=lambda item: -len(item[1])):
+        found = re.search(r"(?<![\w.])" + re.escape(value) + r"(?![\w]|\.\d)", question, re.IGNORECASE)
+        if not found or any(found.start() < end and start < found.end() for start, end in taken):
+            continue
+        taken.append((found.start(), found.end()))
+        slots.append((kind, value, prop, found.start(), found.end()))
+    return sorted(slots, key=lambda slot: slot[3])
+
+
+@lru_cache(maxsize=4096)
+def compile_template(example: str, query: str) -> QueryTemplate:
+    """Build the template for one sample question and its Cypher query"""
+    example = example.strip().rstrip(TRAILING_PUNCTUATION)
+    parts, slots, position = [], {}, 0
+    for index, (kind, value, prop, start, end) in enumerate(find_slots(example, query)):
+        group = f"slot{index}"
+        parts.append(r"\s+".join(re.escape(word) for word in example[position:start].split(" ")))
+        parts.append(f"(?P<{group}>{STRING_SLOT if kind == 'string' else NUMBER_SLOT})")
+        slots[group] = (kind, value, prop)
+        position = end
+    parts.append(r"\s+".join(re.escape(word) for word in example[position:].split(" ")))
+    pattern = re.compile("".join(parts) + r"$", re.IGNORECASE)
+    return QueryTemplate(pattern, slots, query, example)
+
+
+def known_entities(queries: Sequence[str]) -> Dict[Tuple[str, str], str]:
+    """Names written as string literals in the sample queries, keyed by (property, normalized name)"""
+    entities = {}
+    for query in queries:
+        for kind, value, prop in literals(query):
+            if kind == "string" and prop is not None:
+                entities.setdefault((prop, " ".join(normalize_words(value))), value)
+    return entities
+
+
+def match_template(question: str, candidates: Sequence[Tuple[str, str, float]],
+                   threshold: float = FAST_PATH_THRESHOLD,
+                   entities: Optional[Dict[Tuple[str, str], str]] = None) -> Optional[Tuple[str, str, float]]:
+    """Return (query, sample question, similarity) for the first candidate whose template fits the question"""
+    for example, query, similarity in candidates:
+        if similarity < threshold:
+            break
+        if cypher.is_write_query(query):
+            continue
+        template = compile_template(example, query)
+        if not template.complete:
+            continue
+        filled = template.fill(question, entities)
+        if filled is not None:
+            return filled, example, similarity
+    return None
+
+
+class FastPath:
+    """Answers near-duplicates of sample questions from their stored Cypher instead of asking the LLM"""
+
+    def __init__(self, index: FewShotIndex, names: Optional[Gazetteer] = None, threshold: float = FAST_PATH_THRESHOLD,
+                 candidates: int = FAST_PATH_CANDIDATES, enabled: bool = FAST_PATH_ENABLED):
+        self.index = index
+        self.names = names
+        self.threshold = threshold
+        self.candidates = candidates
+        self.enabled = enabled
+        self.attempts = 0
+        self.bypassed = 0
+        self._entities: Dict[Tuple[str, str], str] = {}
+        self._entities_source = None
+        self._lock = threading.Lock()
+
+    def entities(self) -> Dict[Tuple[str, str], str]:
+        """Known entity names, rebuilt when the retrieval index is reloaded or the gazetteer grows"""
+        snapshot = self.index.snapshot
+        source = (snapshot.source_hash if snapshot else None, self.names.version if self.names else None)
+        if source != self._entities_source:
+            entities = known_entities(snapshot.queries) if snapshot else {}
+            if self.names is not None:
+                entities.update(self.names.name_index())
+            self._entities = entities
+            self._entities_source = source
+        return self._entities
+
+    def match(self, question: str) -> Optional[Tuple[str, str, float]]:
+        """Return (query, sample question, similarity) when the question fits a sample template"""
+        if not self.enabled:
+            return None
+        matched = match_template(question, self.index.search(question, self.candidates), self.threshold,
+                                 self.entities())
+        with self._lock:
+            self.attempts += 1
+            if matched is not None:
+                self.bypassed += 1
+        if matched is not None:
+            logger.info(f"Fast path for '{question}' from sample '{matched[1]}' ({matched[2]:.2f})")
+        return matched
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "attempts": self.attempts,
+            "bypassed": self.bypassed,
+            "bypass_rate": round(self.bypassed / self.attempts, 4) if self.attempts else 0.0
+        }
+
+
+# Global instance to be imported by other modules
+fast_path = FastPath(few_shot_index, gazetteer)
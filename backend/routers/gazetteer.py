@@ -0,0 +1,250 @@
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger("gazetteer")
+
+# Configuration
+GAZETTEER_REFRESH_SECONDS = float(os.getenv("GAZETTEER_REFRESH_SECONDS", "900"))  # How often Neo4j names are re-read
+COORDINATES_PATH = str(Path(__file__).resolve().parent / "Coordinates.csv")
+
+# Node label -> property holding its name, in the order a name shared by several labels is resolved
+ENTITY_SOURCES = {
+    "Area": "Areas",
+    "Place": "Place_To_Visit",
+    "Accomadation": "Accommodation_Place_Name",
+    "Restaurant": "Restaurant"
+}
+
+WORD_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+class Entity(NamedTuple):
+    label: str
+    prop: str
+    name: str
+
+    @property
+    def id(self) -> str:
+        """Canonical entity ID, e.g. Area:Nuwara Eliya"""
+        return f"{self.label}:{self.name}"
+
+
+class EntityMatch(NamedTuple):
+    start: int
+    end: int
+    text: str
+    entities: Tuple[Entity, ...]  # Every entity with this name, Area first
+
+    @property
+    def entity(self) -> Entity:
+        return self.entities[0]
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lower cased words of a name, ignoring punctuation and spacing"""
+    return WORD_PATTERN.findall(text.lower())
+
+
+class Automaton:
+    """Word level Aho-Corasick automaton: every name is found in one pass over the words of a question"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.terminal: List[List[int]] = [[]]  # Pattern ids ending exactly at each state
+        self.output: List[List[int]] = [[]]  # Pattern ids ending at each state, including via failure links
+        self.lengths: List[int] = []  # Word count of each pattern
+        self._dirty = False
+
+    def add(self, words: List[str]) -> int:
+        """Insert a pattern and return its id; failure links are rebuilt lazily on the next search"""
+        state = 0
+        for word in words:
+            next_state = self.goto[state].get(word)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append([])
+                self.output.append([])
+                self.goto[state][word] = next_state
+            state = next_state
+        pattern_id = len(self.lengths)
+        self.lengths.append(len(words))
+        self.terminal[state].append(pattern_id)
+        self._dirty = True
+        return pattern_id
+
+    def _build(self):
+        """Breadth-first pass computing failure links and merged outputs"""
+        queue = deque()
+        for next_state in self.goto[0].values():
+            self.fail[next_state] = 0
+            self.output[next_state] = list(self.terminal[next_state])
+            queue.append(next_state)
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(word, 0)
+                self.output[next_state] = self.terminal[next_state] + self.output[self.fail[next_state]]
+        self._dirty = False
+
+    def search(self, words: List[str]) -> List[Tuple[int, int, int]]:
+        """Return (first word, last word, pattern id) for every pattern occurring in the words"""
+        if self._dirty:
+            self._build()
+        found = []
+        state = 0
+        for position, word in enumerate(words):
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            for pattern in self.output[state]:
+                found.append((position - self.lengths[pattern] + 1, position, pattern))
+        return found
+
+
+class Gazetteer:
+    """In-process dictionary of Sri Lankan areas, places, hotels and restaurants for entity extraction"""
+
+    def __init__(self, coordinates_path: str = COORDINATES_PATH, refresh_seconds: float = GAZETTEER_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.automaton = Automaton()
+        self.patterns: List[Tuple[Entity, ...]] = []  # pattern id -> entities with that name
+        self.pattern_ids: Dict[Tuple[str, ...], int] = {}
+        self.names: Dict[Tuple[str, str], Entity] = {}  # (property, lower cased name) -> entity
+        self.entities: Set[Entity] = set()
+        self.version = 0
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self.add_entities(self.read_coordinates(coordinates_path))
+
+    @staticmethod
+    def read_coordinates(path: str) -> List[Entity]:
+        """Areas listed in Coordinates.csv, available before Neo4j is reachable"""
+        try:
+            with open(path, newline="", encoding="utf-8") as file:
+                return [Entity("Area", "Areas", row["Area"].strip()) for row in csv.DictReader(file)
+                        if row.get("Area") and row["Area"].strip()]
+        except Exception as e:
+            logger.error(f"Could not read areas from {path}: {str(e)}")
+            return []
+
+    def add_entities(self, entities: Iterable[Entity]) -> int:
+        """Insert entities that are not known yet and return how many were added"""
+        priority = list(ENTITY_SOURCES)
+        added = 0
+        with self._lock:
+            for entity in entities:
+                words = tuple(normalize_words(entity.name))
+                if not words or entity in self.entities:
+                    continue
+                self.entities.add(entity)
+                self.names.setdefault((entity.prop, " ".join(words)), entity)
+                pattern_id = self.pattern_ids.get(words)
+                if pattern_id is None:
+                    pattern_id = self.automaton.add(list(words))
+                    self.pattern_ids[words] = pattern_id
+                    self.patterns.append(())
+                self.patterns[pattern_id] = tuple(sorted(self.patterns[pattern_id] + (entity,),
+                                                         key=lambda item: priority.index(item.label)))
+                added += 1
+            if added:
+                self.version += 1
+        return added
+
+    def refresh(self, registry) -> int:
+        """Add names created in Neo4j since the last refresh and return how many were added"""
+        self.checked_at = time.time()
+        # Resolving the driver may reconnect, so it happens here, off the event loop
+        driver = registry.get()
+        if driver is None:
+            return 0
+        entities = []
+        try:
+            with registry.session(driver) as session:
+                for label, prop in ENTITY_SOURCES.items():
+                    for record in session.run(f"MATCH (n:`{label}`) WHERE n.`{prop}` IS NOT NULL "
+                                              f"RETURN DISTINCT n.`{prop}` AS name"):
+                        if isinstance(record["name"], str) and record["name"].strip():
+                            entities.append(Entity(label, prop, record["name"].strip()))
+        except Exception as e:
+            logger.error(f"Gazetteer refresh failed: {str(e)}")
+            return 0
+
+        added = self.add_entities(entities)
+        if added:
+            logger.info(f"Gazetteer refreshed with {added} new names: {self.stats()}")
+        return added
+
+    def maybe_refresh(self, registry):
+        """Refresh in the background once the names are older than refresh_seconds"""
+        if time.time() - self.checked_at > self.refresh_seconds and self._refreshing.acquire(blocking=False):
+            self.checked_at = time.time()
+
+            def run():
+                try:
+                    self.refresh(registry)
+                finally:
+                    self._refreshing.release()
+
+            threading.Thread(target=run, daemon=True).start()
+
+    def extract(self, text: str) -> List[EntityMatch]:
+        """Find the names mentioned in the text, longest match first where names overlap"""
+        spans = [(match.start(), match.end()) for match in WORD_PATTERN.finditer(text)]
+        words = [text[start:end].lower() for start, end in spans]
+        with self._lock:
+            found = self.automaton.search(words)
+            patterns = self.patterns
+
+        matches = []
+        last_word = -1
+        for first, last, pattern in sorted(found, key=lambda item: (item[0], item[0] - item[1])):
+            if first <= last_word:
+                continue
+            start, end = spans[first][0], spans[last][1]
+            matches.append(EntityMatch(start, end, text[start:end], patterns[pattern]))
+            last_word = last
+        return matches
+
+    def canonicalize(self, text: str) -> str:
+        """Rewrite every mention in the text with the canonical name, so spellings of a name compare equal"""
+        parts, position = [], 0
+        for match in self.extract(text):
+            parts.append(text[position:match.start])
+            parts.append(match.entity.name)
+            position = match.end
+        parts.append(text[position:])
+        return "".join(parts)
+
+    def lookup(self, prop: str, name: str) -> Optional[Entity]:
+        """Return the entity whose name property matches the name, ignoring case and punctuation"""
+        return self.names.get((prop, " ".join(normalize_words(name))))
+
+    def name_index(self) -> Dict[Tuple[str, str], str]:
+        """Copy of the (property, normalized name) -> canonical name mapping"""
+        with self._lock:
+            return {key: entity.name for key, entity in self.names.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {label: 0 for label in ENTITY_SOURCES}
+        for entity in self.entities:
+            counts[entity.label] = counts.get(entity.label, 0) + 1
+        return {"version": self.version, "entities": len(self.entities), "patterns": len(self.patterns), **counts}
+
+
+# Global instance to be imported by other modules
+gazetteer = Gazetteer()
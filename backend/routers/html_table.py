@@ -0,0 +1,103 @@
+import os
+from html import escape
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+# Configuration
+HTML_TABLE_MAX_ROWS = int(os.getenv("HTML_TABLE_MAX_ROWS", "1000"))  # Rows rendered per table
+HTML_TABLE_CHUNK_ROWS = int(os.getenv("HTML_TABLE_CHUNK_ROWS", "100"))  # Rows per yielded chunk when streaming
+
+# Columns whose values are rendered as links
+URL_TERMS = ("url", "link", "website", "site")
+
+TABLE_OPEN = (
+    '<table style="border-collapse: collapse; border: 1px solid black; width: 100%;" border="1" '
+    'class="dataframe table table-striped table-hover table-bordered" id="result-table">\n'
+)
+TH_OPEN = '<th style="border: 1px solid black; text-align: center; padding: 8px; background-color: #f5f5f5;">'
+TD_OPEN = '<td style="border: 1px solid black; text-align: left; padding: 8px; vertical-align: top;">'
+LINK_STYLE = "color: #0066cc; text-decoration: none;"
+
+
+def is_url_column(column: str) -> bool:
+    return any(term in column.lower() for term in URL_TERMS)
+
+
+def format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value != value:  # NaN
+        return ""
+    if isinstance(value, (list, tuple)):
+        return escape(", ".join(str(item) for item in value))
+    return escape(str(value))
+
+
+def format_link(value: Any) -> str:
+    """Render a web URL as a link and anything else as text"""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    try:
+        parsed = urlparse(text)
+        is_valid = parsed.scheme in ("http", "https") and bool(parsed.netloc)
+    except ValueError:
+        is_valid = False
+    if not is_valid:
+        return escape(text)
+    text = escape(text)
+    return f'<a href="{text}" style="{LINK_STYLE}" target="_blank">{text}</a>'
+
+
+class TableRenderer:
+    """Render rows of one result as an HTML table, resolving the columns and their formatters once"""
+
+    __slots__ = ("columns", "formatters", "max_rows")
+
+    def __init__(self, columns: List[str], max_rows: int = HTML_TABLE_MAX_ROWS):
+        self.columns = columns
+        self.formatters = [format_link if is_url_column(column) else format_cell for column in columns]
+        self.max_rows = max_rows
+
+    def head(self) -> str:
+        cells = "".join(f"{TH_OPEN}{escape(str(column))}</th>" for column in self.columns)
+        return f"{TABLE_OPEN}<thead>\n<tr>{cells}</tr>\n</thead>\n<tbody>\n"
+
+    def row(self, row: Dict[str, Any]) -> str:
+        cells = "".join(
+            f"{TD_OPEN}{formatter(row.get(column))}</td>" for column, formatter in zip(self.columns, self.formatters)
+        )
+        return f"<tr>{cells}</tr>\n"
+
+    def tail(self, truncated: bool = False) -> str:
+        footer = ""
+        if truncated:
+            footer = (f'<tfoot>\n<tr><td colspan="{len(self.columns)}">'
+                      f'Showing the first {self.max_rows} rows</td></tr>\n</tfoot>\n')
+        return f"</tbody>\n{footer}</table>"
+
+    def stream(self, rows: Iterable[Dict[str, Any]], chunk_rows: int = HTML_TABLE_CHUNK_ROWS) -> Iterator[str]:
+        """Yield the table in chunks of rows; usable as a StreamingResponse body"""
+        rows = iter(rows)
+        yield self.head()
+        remaining = self.max_rows
+        while remaining > 0:
+            chunk = list(islice(rows, min(chunk_rows, remaining)))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield "".join([self.row(row) for row in chunk])
+        # Rows beyond the limit are only peeked at, never rendered
+        yield self.tail(truncated=remaining <= 0 and next(rows, None) is not None)
+
+    def render(self, rows: Iterable[Dict[str, Any]]) -> str:
+        return "".join(self.stream(rows))
+
+
+def render_html_table(rows: List[Dict[str, Any]], max_rows: Optional[int] = None) -> str:
+    """Render query result rows as a styled HTML table with clickable links"""
+    if not rows:
+        return ""
+    # Every row of a Cypher result has the same keys
+    return TableRenderer(list(rows[0]), max_rows or HTML_TABLE_MAX_ROWS).render(rows)
@@ -0,0 +1,140 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from routers.cache import query_flight, cypher_flight
+from routers.database import neo4j_registry
+from routers.query_output import query_output_parser
+
+# Stages range from sub-millisecond (serialization) to tens of seconds (completions)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40)
+
+STAGE_SECONDS = Histogram(
+    "golk_stage_duration_seconds", "Time spent in one stage of the chat pipeline", ["stage"], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "golk_chat_request_duration_seconds", "Time to answer a chat request", ["endpoint"], buckets=STAGE_BUCKETS
+)
+STREAM_TTFT_SECONDS = Histogram(
+    "golk_stream_ttft_seconds", "Time until a streamed chat answer sends its first token", buckets=STAGE_BUCKETS
+)
+OPENAI_TOKENS = Counter(
+    "golk_openai_tokens_total", "OpenAI tokens reported in completion usage", ["model", "kind"]
+)
+OPENAI_COMPLETIONS = Counter(
+    "golk_openai_completions_total", "OpenAI completions made", ["model"]
+)
+
+# Timings of the request being handled, shared with the stages it calls without passing a dict around
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+router = APIRouter()
+
+
+def request_timings() -> Dict[str, float]:
+    """Start collecting stage timings (in milliseconds) for the current request and return them"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 1)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into its histogram and the current request's timings"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+class TimedCalls:
+    """Wrap a function whose calls are spread over a stage, such as a row mapper interleaved with network reads"""
+
+    __slots__ = ("fn", "stage", "seconds")
+
+    def __init__(self, fn: Callable, stage: str):
+        self.fn = fn
+        self.stage = stage
+        self.seconds = 0.0
+
+    def __call__(self, *args):
+        started = time.perf_counter()
+        try:
+            return self.fn(*args)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def observe(self):
+        observe_stage(self.stage, self.seconds)
+
+
+def record_usage(model: str, usage: Any):
+    """Count the tokens of a completion from its usage block"""
+    OPENAI_COMPLETIONS.labels(model).inc()
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    OPENAI_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+    # Prompt tokens served from OpenAI's prefix cache
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached:
+        OPENAI_TOKENS.labels(model, "cached_prompt").inc(cached)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format stage timings as a Server-Timing header value"""
+    return ", ".join(f"{name};dur={duration}" for name, duration in timings.items())
+
+
+class StatsCollector:
+    """Export the counters the app already keeps for its /stats endpoints, read at scrape time"""
+
+    def collect(self):
+        neo4j = neo4j_registry.stats()
+        connections = GaugeMetricFamily("golk_neo4j_pool_connections", "Neo4j pool connections", labels=["state"])
+        connections.add_metric(["in_use"], neo4j["in_use"])
+        connections.add_metric(["idle"], neo4j["idle"])
+        yield connections
+        yield GaugeMetricFamily("golk_neo4j_pool_max_size", "Neo4j pool size limit", value=neo4j["max_pool_size"])
+        yield GaugeMetricFamily("golk_neo4j_active_sessions", "Neo4j sessions open", value=neo4j["active_sessions"])
+        yield GaugeMetricFamily("golk_neo4j_connected", "Whether the Neo4j driver is connected",
+                                value=int(neo4j["connected"]))
+        yield CounterMetricFamily("golk_neo4j_sessions", "Neo4j sessions opened", value=neo4j["sessions"])
+        yield CounterMetricFamily("golk_neo4j_session_waits", "Neo4j sessions that waited for a free connection",
+                                  value=neo4j["waits"])
+
+        output = query_output_parser.stats()
+        yield CounterMetricFamily("golk_query_output_completions", "Query generation completions validated",
+                                  value=output["completions"])
+        yield CounterMetricFamily("golk_query_output_parse_failures", "Query generation outputs that did not parse",
+                                  value=output["parse_failures"])
+
+        coalesced = CounterMetricFamily("golk_single_flight_coalesced", "Calls that waited for an identical call",
+                                        labels=["flight"])
+        for flight in (query_flight, cypher_flight):
+            coalesced.add_metric([flight.name], flight.coalesced)
+        yield coalesced
+
+
+REGISTRY.register(StatsCollector())
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,149 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from neo4j.exceptions import CypherSyntaxError
+
+from routers import cypher
+from routers.cache import create_cache
+from routers.database import neo4j_registry
+
+logger = logging.getLogger("preflight")
+
+# Configuration
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "true").lower() == "true"  # EXPLAIN generated queries before running
+PREFLIGHT_MAX_ESTIMATED_ROWS = float(os.getenv("PREFLIGHT_MAX_ESTIMATED_ROWS", "100000"))  # Rows any operator may produce
+PREFLIGHT_MAX_CARTESIAN_ROWS = float(os.getenv("PREFLIGHT_MAX_CARTESIAN_ROWS", "10000"))  # Rows a CartesianProduct may produce
+PREFLIGHT_LIMIT = int(os.getenv("PREFLIGHT_LIMIT", "1000"))  # LIMIT added to over budget queries that have none
+PREFLIGHT_VERDICT_TTL = float(os.getenv("PREFLIGHT_VERDICT_TTL", str(24 * 3600)))  # Plans only change with the schema
+
+# Plan operators that change the graph
+WRITE_OPERATORS = {
+    "Create", "Merge", "Delete", "DetachDelete", "SetProperty", "SetProperties", "SetNodeProperty",
+    "SetNodeProperties", "SetNodePropertiesFromMap", "SetRelationshipProperty", "SetRelationshipProperties",
+    "SetRelationshipPropertiesFromMap", "SetPropertiesFromMap", "SetLabels", "RemoveLabels", "Foreach",
+    "LoadCSV", "EmptyResult", "TransactionForeach", "TransactionApply"
+}
+
+# Reasons a trailing LIMIT cannot fix: the write or the full scan happens before any row is cut off
+HARD_REJECTIONS = ("write", "AllNodesScan")
+
+# Verdicts, keyed on the query fingerprint
+verdict_cache = create_cache("preflight", default_ttl=PREFLIGHT_VERDICT_TTL)
+
+
+def walk_plan(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a plan tree into its operators: [{"operator": name, "estimated_rows": rows}]"""
+    operators = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        arguments = node.get("args") or node.get("arguments") or {}
+        operators.append({
+            # Neo4j 5 reports operators as "CartesianProduct@neo4j"
+            "operator": str(node.get("operatorType", "")).split("@")[0],
+            "estimated_rows": float(arguments.get("EstimatedRows", 0) or 0)
+        })
+        stack.extend(node.get("children") or [])
+    return operators
+
+
+def judge_plan(query_type: Optional[str], operators: List[Dict[str, Any]]) -> Optional[str]:
+    """Return why a plan is not acceptable as is, or None when it is within budget"""
+    names = {item["operator"] for item in operators}
+    if query_type not in (None, "r") or names & WRITE_OPERATORS:
+        return "write"
+    if "AllNodesScan" in names:
+        return "AllNodesScan: a pattern has no label"
+    for item in operators:
+        if item["operator"] == "CartesianProduct" and item["estimated_rows"] > PREFLIGHT_MAX_CARTESIAN_ROWS:
+            return f"CartesianProduct estimated at {item['estimated_rows']:.0f} rows"
+    estimated_rows = max([item["estimated_rows"] for item in operators] or [0])
+    if estimated_rows > PREFLIGHT_MAX_ESTIMATED_ROWS:
+        return f"estimated {estimated_rows:.0f} rows"
+    return None
+
+
+def add_limit(query: str, limit: int = PREFLIGHT_LIMIT) -> Optional[str]:
+    """Append a LIMIT to a query that ends in a single RETURN without one, or return None if that is not safe"""
+    tokens = cypher.tokenize(query)
+    # A LIMIT after a UNION only caps its last branch
+    if any(kind == "ident" and text.upper() == "UNION" for kind, text in tokens):
+        return None
+    depth = 0
+    last_clause = None
+    for kind, text in tokens:
+        if text in ("(", "[", "{"):
+            depth += 1
+        elif text in (")", "]", "}"):
+            depth -= 1
+        elif depth == 0 and kind == "ident" and text.upper() in ("RETURN", "WITH", "UNION", "LIMIT", "CALL"):
+            last_clause = text.upper()
+    if last_clause != "RETURN":
+        return None
+    return query.rstrip().rstrip(";").rstrip() + f"\nLIMIT {limit};"
+
+
+def make_verdict(status: str, query: str, reason: Optional[str] = None,
+                 operators: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    return {
+        "status": status,  # "ok", "limited", "rejected" or "unchecked"
+        "query": query,  # The query to run, with a LIMIT added when status is "limited"
+        "reason": reason,
+        "estimated_rows": max([item["estimated_rows"] for item in operators or []] or [0]),
+        "operators": sorted({item["operator"] for item in operators or []})
+    }
+
+
+def explain(driver, query: str):
+    """Plan the query without running it and return the result summary"""
+    # Planned in the same parameterized form it runs in, so execution reuses the cached plan
+    text, params = cypher.parameterize(query)
+    with neo4j_registry.session(driver, default_access_mode="READ") as session:
+        try:
+            return session.run("EXPLAIN " + text, params).consume()
+        except CypherSyntaxError:
+            # Some clauses do not accept parameters; plan the query as generated instead
+            return session.run("EXPLAIN " + query).consume()
+
+
+def check(registry, query: str) -> Dict[str, Any]:
+    """Pre-flight a generated query: reject writes and send over budget plans back or cap them with a LIMIT"""
+    if cypher.is_write_query(query):
+        # No round trip needed to refuse CREATE/MERGE/SET
+        return make_verdict("rejected", query, "write")
+    # Called in a worker thread, where resolving the driver may reconnect without blocking the event loop
+    driver = registry.get()
+    if not PREFLIGHT_ENABLED or driver is None:
+        return make_verdict("unchecked", query)
+
+    cache_key = cypher.fingerprint(query)
+    cached = verdict_cache.get(cache_key)
+    if cached is not None:
+        # Cached under the fingerprint, so apply the LIMIT to this spelling of the query again
+        if cached["status"] == "limited":
+            return {**cached, "query": add_limit(query) or query}
+        return {**cached, "query": query}
+
+    try:
+        summary = explain(driver, query)
+    except Exception as e:
+        name = type(e).__name__
+        if "ServiceUnavailable" in name or "SessionExpired" in name:
+            return make_verdict("unchecked", query)
+        # Syntax and semantic errors would fail at execution too, so ask for a new query
+        return make_verdict("rejected", query, f"invalid query: {str(e)[:300]}")
+
+    operators = walk_plan(summary.plan or {})
+    reason = judge_plan(summary.query_type, operators)
+    if reason is None:
+        verdict = make_verdict("ok", query, operators=operators)
+    elif not reason.startswith(HARD_REJECTIONS) and add_limit(query):
+        verdict = make_verdict("limited", add_limit(query), reason, operators)
+    else:
+        verdict = make_verdict("rejected", query, reason, operators)
+
+    if verdict["status"] != "ok":
+        logger.warning(f"Pre-flight {verdict['status']} query ({reason}): {query}")
+    verdict_cache.set(cache_key, verdict)
+    return verdict
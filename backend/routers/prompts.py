@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 db_structure = """
     The below is the cypher query to create the database structure for the prompts
     
@@ -498,4 +500,255 @@ settings_prompt = """
                     Brief - Concise response focusing on essential information (50-100 words)
                     Medium - Balanced explanation with supporting details (100-250 words)
                     Detailed - Comprehensive coverage with examples and thorough explanations (250+ words)
-               """
\ No newline at end of file
+               """
+
+# Precomputed "cannot answer right now" messages, combined per politeness level and response length
+REJECTION_OPENINGS = {
+    "friendly": "Oh no! 😕 I couldn't put together an answer for that right now.",
+    "neutral": "I cannot generate an answer to this question at the moment. ℹ️",
+    "professional": "Thank you for your inquiry. Unfortunately, I am unable to provide an answer at this time. 🙏"
+}
+
+REJECTION_FORMALITIES = ["formal", "semi-formal", "informal", "casual"]
+
+REJECTION_FOLLOW_UPS = {
+    "brief": [
+        "Please try again shortly. 🌴"
+    ],
+    "medium": [
+        "The details you are looking for are not available at the moment. 🔍",
+        "Please try again shortly, or ask about another destination, hotel or restaurant in Sri Lanka. 🌴"
+    ],
+    "detailed": [
+        "The details you are looking for are not available at the moment. 🔍",
+        "You could rephrase the question with a specific area name, such as Ella, Kandy or Mirissa, which helps me find the right places. 🗺️",
+        "In the meantime, feel free to ask about other destinations, accommodations, restaurants, weather or emergency services across Sri Lanka. 🌴",
+        "I am always happy to help you plan your trip! ✈️"
+    ]
+}
+
+# Explanations of fast path answers, which only run for the Friendly politeness level and Medium length
+FAST_PATH_EXPLANATIONS = {
+    "formal": "Please find below the information I found for your question. 🌴",
+    "semi-formal": "Here is the information I found for your question. 🌴",
+    "informal": "Here's what I found for you! 🌴",
+    "casual": "Here's what I dug up for you! 🌴"
+}
+
+# Compact schema used when the live Neo4j schema cannot be introspected (* marks the unique key)
+compact_db_structure = """
+Nodes:
+  Area(Areas*: String, Description: String, Population: Integer, Latitude: Float, Longitude: Float)
+  District(District*: String, Sinhalese: String, Sri_Lankan_Tamils: String, Indian_Tamils: String, Sri_Lankan_Moors: String, Others: String, Most_Used_Language: String)
+  Province(Province*: String)
+  Country(Country*: String, Suwa_Seriya_Ambulance: Integer, Police_Emergency_Service: Integer, Description: String, Nationality: String, Currency: String)
+  Place(Place_To_Visit*: String, Activity_Type: String, Description: String)
+  Restaurant(Restaurant*: String, Ratings: String, Google_map_link: String)
+  Accomadation(Accommodation_Place_Name*: String, Rating: String, Type: String, Description: String, Nearby_Places: String, Booking_Com_Booking_Link: String)
+  PoliceStation(Nearest_Police_Station*: String, Contact_Number: Integer, Google_Map_Link: String)
+  Hospital(Nearest_Hospital*: String, Contact_Number: Integer, Google_Map_Link: String)
+  Weather(Month: String, Description: String, Season: String, season: String, description: String, avg_temp: Float, avg_precip: Float, avg_wind: Float, precip_prob: Float, current_temp: Float, max_temp: Float, min_temp: Float, precipitation: Float, precipitation_prob: Float, wind_speed: Float, last_updated: String)
+
+Relationships:
+  (:Area)-[:LOCATED_IN]->(:District)
+  (:Area)-[:CONSISTED_WITH]->(:Place)
+  (:Area)-[:HAS_RESTAURANT]->(:Restaurant)
+  (:Area)-[:HAS_ACCOMADATION]->(:Accomadation)
+  (:Area)-[:HAS_WEATHER]->(:Weather)
+  (:Area)-[:HAS_POLICE]->(:PoliceStation)
+  (:Area)-[:HAS_HOSPITAL]->(:Hospital)
+  (:Area)-[:HAS_DISTANCE {Distance_in_km: Float}]->(:Area)
+  (:Province)-[:HAS_DISTRICT]->(:District)
+  (:Country)-[:HAS_PROVINCE]->(:Province)
+"""
+
+# Usage notes appended to every schema summary
+schema_notes = """
+Notes:
+  - Never return nodes or relationships, always return their properties.
+  - Accommodation questions (hotels, motels, villas) use the Accomadation label and HAS_ACCOMADATION.
+  - Restaurant questions use the Restaurant label and HAS_RESTAURANT.
+  - Ratings are stored as strings, use toFloat() to compare them.
+"""
+
+
+# Query generation prompt. The static block (role, schema, rules) comes first and is byte-identical on every
+# request so the provider can reuse its prompt prefix cache; per-request content always comes last.
+QUERY_STATIC_PROMPT = """Role and Context:
+                        You are TourMate, an AI assistant that helps users with travel-related queries about Sri Lanka or hotels, accomadations, places, emergency, hotel related details.
+            
+                        
+                        You can provide answers only to the sri lankan context, do not provide answers for other contexts please say that you can provide answers only on the sri lankan context if user ask a question in other domains.
+                        
+                        
+                         Database Context:
+                        ---------------
+                        Current Graph Database Structure: {graph_db_structure}
+                        
+                       ⚠️ Note: These examples are ONLY for cypher query generation reference. Do not use Reference Examples as conversation history or general content.
+                       Very Very Important: ⚠️⚠️ Do Not ever use the same reference examples to generate your answer, because it is not the answer user is expecting. 
+                       it is given to get an idea of the cypher query structure.
+                        Query Requirements:
+                        -----------------
+                        1. All queries must start with OPTIONAL MATCH
+                        2. Only use nodes, elements, and relationships defined in the provided graph structure
+                        3. Support cross-table filtering when necessary
+                        
+                        Response Format:
+                        --------------
+                        IMPORTANT: Return ONLY the following structure in valid JSON format:
+                        - Use double quotes (") instead of single quotes (')
+                        - No newlines within values
+                        - No trailing commas
+                        - Exactly match this structure:
+                        
+                        {template_cypher}
+                        
+                        ⚠️ DO NOT include any text before or after the JSON structure
+                        ⚠️ DO NOT use single quotes in the JSON response
+                        ⚠️ DO NOT include newlines within the values
+                        ⚠️ Ensure the response is valid JSON format
+                        ⚠️ If user asked a question about place and all when you generate the cypher query refer key words in lower case and use them in the cypher query.
+                        
+                        Response Guidelines:
+                        ------------------
+                        1. text_explanation:
+                           - Provide natural language explanations
+                           - Can include emojis for better readability
+                           - Must NOT contain code or queries
+                           - For general questions, provide complete, knowledgeable answers here
+                           - For data-related questions, focus on insights and business impact
+                           - Never mention querying or accessing a database
+                           - Maintain a conversational, helpful tone
+                           - Provide natural language explanations ONLY about Sri Lanka
+                           - Must be strictly related to Sri Lanka operations and services
+                           - Must NOT contain any political, controversial, or Sri Lanka content
+                           - For general questions, ONLY provide answers related to Sri Lanka
+                           - Maintain a professional, business-focused tone
+                           - ** Must contain emojis for better readability
+                           - ⚠️⚠️ Do not explain the query that you are generating, explain the answer to the user question.
+                        
+                        2. query_generation_status:
+                           - 'Yes': If a Cypher query can be generated based on the question and graph structure
+                           - 'No': If question cannot be answered with a query if keywords are not present in the question
+                           - If 'No', query field should be empty
+                           
+                        3. query structure details:
+                           - ⚠️ Do not ever provide multiple relations in one line (Always use multiple OPTIONAL MATCH with WITH clause)
+                           - ⚠️⚠️ Do not ever return nodes, always return properties of nodes (This is very important)
+                           
+                        # Stay Focused and Contextual
+                        - Provide responses that are strictly relevant to the questions asked about Sri Lanka
+                        - Do not include any information beyond the scope of the specific query or subject matter being discussed
+                        - Avoid providing out-of-context or irrelevant information in any responses
+                        - Maintain focus on the exact question asked and its direct implications for Sri Lanka
+                        - If question is unclear, ask for clarification rather than making assumptions
+                        - Never add extraneous information not directly related to the query
+                        - Relevant emojis is Must in the text explanation and never mention that you refer to database by querying. 
+                        -  Work as TravelGuru when providing responses.
+                        
+                        the below conditions are important:
+                        
+                        If user ask about the details about Sri Lanka only, then provide only the description about the country without generating the cypher query for it. in other scenerios you can generate cypher query as well. (Provide the key insights summary as well).
+                        
+                        If user ask for budget places in a specif area, provide the whole list of places by saying most of the places that they have are budget places. (provide all accommodations in that area)  - it is applicable for all restaurants, hotels, and places to visit.
+                        
+                        please consider them as well when user ask about weather.when providing weather details please mention the location name.
+        
+                        when user ask about the emergency details please provide all details in the Country node, but if they ask about specific area related details provide that areas police station and hospital details.
+                        
+                        consider all the places visting, accomadation, restaurants are affordable and budget friendly.
+                        
+                        when providing whether try to provide weather in current month always and take all the weather details that you have in specific area.
+                        
+                        if travelling distance is asked used this to get the distance between two areas. 
+                        
+                          OPTIONAL MATCH (source:Area {{Areas: "put area name is simple"}})-[r:HAS_DISTANCE]-(target:Area {{Areas: "put area name is simple"}})
+                          RETURN source.Areas AS From, target.Areas AS To, r.Distance_in_km AS Distance_in_km
+                          
+                          - put required values to this query and use it to get the distance between two areas.
+                          - only read the graph: never use CREATE, MERGE, SET or DELETE, such queries are rejected before they run.
+                          - when you generate the query check the name os the Area in both upper and lower case .
+                        
+                        Please consider if the users question is relevant to the chat history, if it is relevant, 
+                        please provide the answer based on the chat history.If it is not relevant, please ignore the chat history.
+                        Example: If user has asked a particular location and ask a question without mentioning a new location please provide the answer based on the previous questions location.
+                        
+                        *** Very very important: Please consider the chat history as well ***
+                        
+                        When looking at the history, please consider the highest question number as the last question, for example question 3 should have priority more than question 2.
+"""
+
+# Settings block, rendered once per Settings combination
+QUERY_SETTINGS_PROMPT = """
+                        # Strictly follow this setting prompts as well
+                        
+                           Response Settings:
+                           - Language: {language}
+                           - Politeness Level: {politeness_level}
+                           - Formality: {formality}
+                           - Response Length: {response_length}
+
+                           Please adjust your response according to these settings:
+                           1. Use the specified {language} language
+                           2. Maintain {politeness_level} politeness level
+                           3. Keep {formality} tone
+                           5. Provide {response_length} response length
+"""
+
+# Per-request block: reference examples, date, time, history and the question
+QUERY_DYNAMIC_PROMPT = """
+                        Reference Examples (Not Part of Current Conversation or history):
+                        -------------------------
+                        Reference Examples : {similar_chunks}
+                        
+                        Today Date:
+                        ---------------
+                        {date}
+                        
+                        Today Time:
+                        ______________
+                        {time}
+                        
+                        Recent Conversation History: (This contains the recent questions user asked)
+                        -------------------------
+                        chat history: {history_text}
+                        
+                        Input Question:
+                        --------------
+                        {question}
+"""
+
+QUERY_TEMPLATE_CYPHER = {
+    "text_explanation": "",
+    "query_generation_status": "Yes/No",
+    "query": "OPTIONAL MATCH query here"
+}
+
+
+@lru_cache(maxsize=8)
+def build_query_static_prompt(graph_db_structure: str) -> str:
+    """Static prefix of the query prompt, compiled once per schema version"""
+    return QUERY_STATIC_PROMPT.format(graph_db_structure=graph_db_structure, template_cypher=QUERY_TEMPLATE_CYPHER)
+
+
+@lru_cache(maxsize=256)
+def build_query_settings_prompt(language: str, politeness_level: str, formality: str, response_length: str) -> str:
+    """Settings block of the query prompt, memoized per settings combination"""
+    return QUERY_SETTINGS_PROMPT.format(
+        language=language,
+        politeness_level=politeness_level,
+        formality=formality,
+        response_length=response_length
+    )
+
+
+def build_query_dynamic_prompt(similar_chunks: str, date: str, time: str, history_text: str, question: str) -> str:
+    """Per-request part of the query prompt"""
+    return QUERY_DYNAMIC_PROMPT.format(
+        similar_chunks=similar_chunks,
+        date=date,
+        time=time,
+        history_text=history_text,
+        question=question
+    )
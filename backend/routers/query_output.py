@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+logger = logging.getLogger("query_output")
+
+# Configuration
+QUERY_RESPONSE_FORMAT = os.getenv("QUERY_RESPONSE_FORMAT", "json_schema")  # json_schema, json_object or text
+
+
+class QueryOutput(BaseModel):
+    """Output of the query generation completion"""
+
+    # text_explanation comes first: the model writes fields in schema order and the stream reads it early
+    text_explanation: str
+    query_generation_status: Literal["Yes", "No"]
+    query: str
+
+    @field_validator("query_generation_status", mode="before")
+    @classmethod
+    def normalize_status(cls, value):
+        # Responses cached before structured output may say "yes" or "NO"
+        if isinstance(value, str) and value.strip().lower() in ("yes", "no"):
+            return value.strip().capitalize()
+        return value
+
+
+def response_format(mode: str = QUERY_RESPONSE_FORMAT) -> Optional[Dict[str, Any]]:
+    """The response_format argument for query generation completions, None to leave the output unconstrained"""
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "query_output",
+                "strict": True,
+                "schema": {**QueryOutput.model_json_schema(), "additionalProperties": False}
+            }
+        }
+    if mode == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+def refusal_output(refusal: str) -> str:
+    """A schema-valid response carrying the model's refusal instead of a query"""
+    return QueryOutput(text_explanation=refusal, query_generation_status="No", query="").model_dump_json()
+
+
+class QueryOutputParser:
+    """Validate query generation outputs in one pass and count the completions that do not match the schema"""
+
+    def __init__(self, mode: str = QUERY_RESPONSE_FORMAT):
+        self.mode = mode
+        self.completions = 0
+        self.failures = 0
+        self.refusals = 0
+        self._lock = threading.Lock()
+
+    def parse(self, text: str) -> QueryOutput:
+        """Parse a response; raises ValueError when it is not a valid query output"""
+        try:
+            return QueryOutput.model_validate_json(text)
+        except ValidationError as e:
+            raise ValueError(f"Invalid response format: {e.error_count()} errors") from e
+
+    def is_valid(self, text: str) -> bool:
+        try:
+            self.parse(text)
+            return True
+        except ValueError:
+            return False
+
+    def record(self, text: str, refused: bool = False) -> bool:
+        """Count a fresh completion, returning whether it parses; each failure is a wasted completion"""
+        valid = self.is_valid(text)
+        with self._lock:
+            self.completions += 1
+            self.refusals += refused
+            self.failures += not valid
+        if not valid:
+            logger.warning(f"Query generation output does not match the schema: {text[:200]!r}")
+        return valid
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "response_format": self.mode,
+            "completions": self.completions,
+            "parse_failures": self.failures,
+            "refusals": self.refusals,
+            "parse_failure_rate": round(self.failures / self.completions, 4) if self.completions else 0.0
+        }
+
+
+# Global instance to be imported by other modules
+query_output_parser = QueryOutputParser()
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+logger = logging.getLogger("retrieval")
+
+# Configuration
+FEW_SHOT_SAMPLES_PATH = os.getenv("FEW_SHOT_SAMPLES_PATH", str(Path(__file__).resolve().parent / "sample.json"))
+FEW_SHOT_INDEX_PATH = os.getenv("FEW_SHOT_INDEX_PATH",
+                                str(Path(__file__).resolve().parent / ".few_shot_index.pkl"))  # Saved between restarts
+FEW_SHOT_RELOAD_SECONDS = float(os.getenv("FEW_SHOT_RELOAD_SECONDS", "5"))  # How often sample.json is checked
+
+# Bump when the layout of the saved artifact changes so old files are refit instead of loaded
+INDEX_FORMAT_VERSION = 1
+
+
+class IndexSnapshot:
+    """An immutable fitted index; replaced as a whole on reload so readers never see a half-built one"""
+
+    __slots__ = ("vectorizer", "matrix", "matrix_t", "questions", "queries", "source_hash", "built_at")
+
+    def __init__(self, vectorizer, matrix, questions: List[str], queries: List[str], source_hash: str,
+                 built_at: float):
+        self.vectorizer = vectorizer
+        self.matrix = matrix.tocsr()  # Rows are L2 normalized by the vectorizer, so a dot product is the cosine
+        self.matrix_t = self.matrix.T.tocsr()
+        self.questions = questions
+        self.queries = queries
+        self.source_hash = source_hash
+        self.built_at = built_at
+
+
+def read_samples(path: str) -> Tuple[bytes, List[str], List[str]]:
+    """Read the example bank and return its raw bytes with the questions and Cypher queries"""
+    with open(path, "rb") as file:
+        raw = file.read()
+    data = json.loads(raw)
+    questions = [item["question"] for item in data["data"]]
+    queries = [item["cypher_query"] for item in data["data"]]
+    return raw, questions, queries
+
+
+def fit_index(questions: List[str], queries: List[str], source_hash: str) -> IndexSnapshot:
+    """Fit the TF-IDF vectors for the example questions"""
+    vectorizer = TfidfVectorizer(norm="l2", dtype=np.float32)
+    matrix = vectorizer.fit_transform(questions)
+    return IndexSnapshot(vectorizer, matrix, questions, queries, source_hash, time.time())
+
+
+def save_index(snapshot: IndexSnapshot, path: str):
+    """Write the index artifact atomically so a concurrent worker never reads a partial file"""
+    artifact = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "sklearn_version": sklearn.__version__,
+        "source_hash": snapshot.source_hash,
+        "built_at": snapshot.built_at,
+        "vectorizer": snapshot.vectorizer,
+        "matrix": snapshot.matrix,
+        "questions": snapshot.questions,
+        "queries": snapshot.queries
+    }
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        pickle.dump(artifact, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+def load_index(path: str, source_hash: str) -> Optional[IndexSnapshot]:
+    """Load a saved index if it was built from the same samples with the same format and sklearn version"""
+    try:
+        with open(path, "rb") as file:
+            artifact = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Could not read few-shot index at {path}, refitting: {str(e)}")
+        return None
+
+    if (artifact.get("format_version") != INDEX_FORMAT_VERSION
+            or artifact.get("sklearn_version") != sklearn.__version__
+            or artifact.get("source_hash") != source_hash):
+        return None
+    return IndexSnapshot(artifact["vectorizer"], artifact["matrix"], artifact["questions"], artifact["queries"],
+                         artifact["source_hash"], artifact["built_at"])
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting the whole array"""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class FewShotIndex:
+    """Retrieval index over sample.json used to pick reference examples for the query prompt"""
+
+    def __init__(self, samples_path: str = FEW_SHOT_SAMPLES_PATH, index_path: str = FEW_SHOT_INDEX_PATH,
+                 reload_seconds: float = FEW_SHOT_RELOAD_SECONDS):
+        self.samples_path = samples_path
+        self.index_path = index_path
+        self.reload_seconds = reload_seconds
+        self.snapshot: Optional[IndexSnapshot] = None
+        self.source = None  # "artifact" or "fit"
+        self.reloads = 0
+        self._samples_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        """Load or fit the index if sample.json changed since the last load; returns True when replaced"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.samples_path).st_mtime_ns
+                raw, questions, queries = read_samples(self.samples_path)
+            except Exception as e:
+                logger.error(f"Could not read few-shot samples at {self.samples_path}: {str(e)}")
+                return False
+
+            source_hash = hashlib.sha1(raw).hexdigest()
+            self._samples_mtime = mtime
+            if self.snapshot is not None and self.snapshot.source_hash == source_hash:
+                return False
+
+            snapshot = load_index(self.index_path, source_hash)
+            source = "artifact"
+            if snapshot is None:
+                snapshot = fit_index(questions, queries, source_hash)
+                source = "fit"
+                try:
+                    save_index(snapshot, self.index_path)
+                except OSError as e:
+                    logger.warning(f"Could not save few-shot index to {self.index_path}: {str(e)}")
+
+            if self.snapshot is not None:
+                self.reloads += 1
+            self.snapshot = snapshot
+            self.source = source
+            logger.info(f"Few-shot index ready: {len(questions)} examples ({source})")
+            return True
+
+    def _check_for_changes(self):
+        """Reload in the background when sample.json was modified, checking at most once every reload_seconds"""
+        now = time.time()
+        if now - self._checked_at < self.reload_seconds:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.samples_path).st_mtime_ns
+        except OSError:
+            return
+        # Searches keep using the current snapshot while the new one is fitted
+        if mtime != self._samples_mtime and self._reloading.acquire(blocking=False):
+            def run():
+                try:
+                    self.reload()
+                finally:
+                    self._reloading.release()
+
+            threading.Thread(target=run, daemon=True).start()
+
+    def search(self, question: str, top_n: int = 5) -> List[Tuple[str, str, float]]:
+        """Return (question, cypher_query, similarity) for the top_n closest examples"""
+        return self.search_batch([question], top_n)[0]
+
+    def search_batch(self, questions: Sequence[str], top_n: int = 5) -> List[List[Tuple[str, str, float]]]:
+        """Search many questions with a single sparse matrix product"""
+        self._check_for_changes()
+        snapshot = self.snapshot
+        if snapshot is None or not questions or not snapshot.questions:
+            return [[] for _ in questions]
+
+        query_matrix = snapshot.vectorizer.transform(questions)
+        scores = (query_matrix @ snapshot.matrix_t).toarray()
+        results = []
+        for row in scores:
+            results.append([
+                (snapshot.questions[i], snapshot.queries[i], float(row[i]))
+                for i in top_k(row, top_n)
+            ])
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {
+            "examples": len(snapshot.questions) if snapshot else 0,
+            "vocabulary": len(snapshot.vectorizer.vocabulary_) if snapshot else 0,
+            "source": self.source,
+            "source_hash": snapshot.source_hash if snapshot else None,
+            "built_at": snapshot.built_at if snapshot else None,
+            "reloads": self.reloads
+        }
+
+
+# Global instance to be imported by other modules
+few_shot_index = FewShotIndex()
@@ -7,7 +7,8 @@ from routers.weatherapi import WeatherUpdater
 import os
 from dotenv import load_dotenv
 from routers.chatbot import username, password, uri
-from neo4j import GraphDatabase
+from routers.cache import invalidate_weather
+from routers.database import neo4j_registry
 
 # Load environment variables
 load_dotenv()
@@ -41,28 +42,27 @@ def reset_location_update_timestamps():
     """
     logger.info("Resetting location update timestamps to trigger full refresh")
     try:
-        with GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD)) as driver:
-            with driver.session() as session:
-                # Set a very old timestamp for all Areas so they'll be updated
-                result = session.run("""
-                    MATCH (a:Area)
-                    SET a.last_weather_update = '2000-01-01T00:00:00'
-                    RETURN count(a) as reset_count
-                """)
-                record = result.single()
-                reset_count = record["reset_count"] if record else 0
-
-                # Also reset Weather nodes timestamps
-                result = session.run("""
-                    MATCH (w:Weather)
-                    SET w.last_updated = '2000-01-01T00:00:00'
-                    RETURN count(w) as weather_reset_count
-                """)
-                record = result.single()
-                weather_reset_count = record["weather_reset_count"] if record else 0
-
-                logger.info(f"Reset {reset_count} areas and {weather_reset_count} weather nodes")
-                return reset_count > 0
+        with neo4j_registry.session() as session:
+            # Set a very old timestamp for all Areas so they'll be updated
+            result = session.run("""
+                MATCH (a:Area)
+                SET a.last_weather_update = '2000-01-01T00:00:00'
+                RETURN count(a) as reset_count
+            """)
+            record = result.single()
+            reset_count = record["reset_count"] if record else 0
+
+            # Also reset Weather nodes timestamps
+            result = session.run("""
+                MATCH (w:Weather)
+                SET w.last_updated = '2000-01-01T00:00:00'
+                RETURN count(w) as weather_reset_count
+            """)
+            record = result.single()
+            weather_reset_count = record["weather_reset_count"] if record else 0
+
+            logger.info(f"Reset {reset_count} areas and {weather_reset_count} weather nodes")
+            return reset_count > 0
     except Exception as e:
         logger.error(f"Failed to reset timestamps: {str(e)}")
         return False
@@ -111,6 +111,11 @@ def run_weather_batch_update():
 
         logger.info(f"Updated {success_count}/{min(len(locations), BATCH_SIZE)} locations in batch")
 
+        # Cached answers about weather are stale once new weather data is written
+        if success_count > 0:
+            removed = invalidate_weather()
+            logger.info(f"Invalidated {removed} cached weather responses and query results")
+
         # Get and log statistics
         stats = updater.get_update_stats()
         if stats:
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from routers.prompts import db_structure, compact_db_structure, schema_notes
+
+logger = logging.getLogger("schema")
+
+# Configuration
+SCHEMA_REFRESH_SECONDS = float(os.getenv("SCHEMA_REFRESH_SECONDS", "600"))  # How often the live schema is checked
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")  # tiktoken encoding of the deployment
+
+# Neo4j reports these names for property types
+TYPE_NAMES = {"Long": "Integer", "Double": "Float", "StringArray": "List<String>", "LongArray": "List<Integer>",
+              "DoubleArray": "List<Float>"}
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken when it is available, otherwise estimate ~4 characters per token"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:  # Not installed, or the encoding file cannot be downloaded
+            logger.warning(f"tiktoken unavailable, estimating token counts: {str(e)}")
+            _encoding_failed = True
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def introspect_schema(registry, driver=None) -> Dict[str, Any]:
+    """Read labels, properties, unique keys and relationship patterns from the live database"""
+    nodes: Dict[str, Dict[str, str]] = {}
+    relationship_properties: Dict[str, Dict[str, str]] = {}
+    patterns = set()
+    unique_keys = set()
+
+    with registry.session(driver) as session:
+        for record in session.run("CALL db.schema.nodeTypeProperties()"):
+            for label in record["nodeLabels"]:
+                properties = nodes.setdefault(label, {})
+                if record["propertyName"]:
+                    types = record["propertyTypes"] or ["Any"]
+                    properties[record["propertyName"]] = TYPE_NAMES.get(types[0], types[0])
+
+        for record in session.run("CALL db.schema.relTypeProperties()"):
+            rel_type = record["relType"].strip(":`")
+            properties = relationship_properties.setdefault(rel_type, {})
+            if record["propertyName"]:
+                types = record["propertyTypes"] or ["Any"]
+                properties[record["propertyName"]] = TYPE_NAMES.get(types[0], types[0])
+
+        # Read from the schema statistics rather than scanning every relationship in the graph
+        for record in session.run("CALL db.schema.visualization()"):
+            for relationship in record["relationships"]:
+                source = next(iter(relationship.start_node.labels), None)
+                target = next(iter(relationship.end_node.labels), None)
+                if source and target:
+                    patterns.add((source, relationship.type, target))
+
+        for record in session.run("SHOW CONSTRAINTS YIELD type, labelsOrTypes, properties"):
+            if record["type"] in ("UNIQUENESS", "NODE_KEY") and record["labelsOrTypes"]:
+                for prop in record["properties"] or []:
+                    unique_keys.add((record["labelsOrTypes"][0], prop))
+
+    return {
+        "nodes": {label: dict(sorted(props.items())) for label, props in sorted(nodes.items())},
+        "relationship_properties": {rel: dict(sorted(props.items()))
+                                    for rel, props in sorted(relationship_properties.items())},
+        "patterns": sorted(patterns),
+        "unique_keys": sorted(unique_keys)
+    }
+
+
+def summarize_schema(schema: Dict[str, Any]) -> str:
+    """Render an introspected schema as the compact labels/properties/relationships block"""
+    unique_keys = {tuple(key) for key in schema["unique_keys"]}
+    lines = ["Nodes:"]
+    for label, properties in schema["nodes"].items():
+        # Unique keys first, they are what the model should match on
+        ordered = sorted(properties.items(), key=lambda item: (label, item[0]) not in unique_keys)
+        fields = ", ".join(
+            f"{name}{'*' if (label, name) in unique_keys else ''}: {prop_type}" for name, prop_type in ordered
+        )
+        lines.append(f"  {label}({fields})")
+
+    lines.append("")
+    lines.append("Relationships:")
+    for source, rel_type, target in schema["patterns"]:
+        properties = schema["relationship_properties"].get(rel_type)
+        fields = " {" + ", ".join(f"{name}: {prop_type}" for name, prop_type in properties.items()) + "}" \
+            if properties else ""
+        lines.append(f"  (:{source})-[:{rel_type}{fields}]->(:{target})")
+
+    return "\n" + "\n".join(lines) + "\n"
+
+
+class SchemaPrompt:
+    """Compact schema summary for the query prompt, rebuilt only when the live schema changes"""
+
+    def __init__(self, refresh_seconds: float = SCHEMA_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.summary = compact_db_structure
+        self.source = "static"
+        self.schema_hash: Optional[str] = None
+        self.checked_at = 0.0
+        self._refreshing = threading.Lock()
+
+    def refresh(self, registry) -> bool:
+        """Introspect the schema and rebuild the summary if it changed; returns True when rebuilt"""
+        self.checked_at = time.time()
+        # Resolving the driver may reconnect, so it happens here, off the event loop
+        driver = registry.get()
+        if driver is None:
+            return False
+        try:
+            schema = introspect_schema(registry, driver)
+        except Exception as e:
+            logger.error(f"Schema introspection failed, keeping the {self.source} schema: {str(e)}")
+            return False
+
+        schema_hash = hashlib.sha1(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+        if schema_hash == self.schema_hash or not schema["nodes"]:
+            return False
+
+        self.summary = summarize_schema(schema)
+        self.source = "live"
+        self.schema_hash = schema_hash
+        logger.info(f"Schema prompt rebuilt: {self.stats()}")
+        return True
+
+    def get(self, registry) -> str:
+        """Return the current summary, checking for schema changes in the background once it is stale"""
+        if time.time() - self.checked_at > self.refresh_seconds and self._refreshing.acquire(blocking=False):
+            self.checked_at = time.time()
+
+            def run():
+                try:
+                    self.refresh(registry)
+                finally:
+                    self._refreshing.release()
+
+            threading.Thread(target=run, daemon=True).start()
+        return self.summary + schema_notes
+
+    def stats(self) -> Dict[str, Any]:
+        """Token counts of the compact prompt against the full LOAD CSV script it replaces"""
+        compact_tokens = count_tokens(self.summary + schema_notes)
+        full_tokens = count_tokens(db_structure)
+        return {
+            "source": self.source,
+            "schema_hash": self.schema_hash,
+            "compact_tokens": compact_tokens,
+            "full_script_tokens": full_tokens,
+            "reduction": round(1 - compact_tokens / full_tokens, 3) if full_tokens else 0.0
+        }
+
+
+# Global instance to be imported by other modules
+schema_prompt = SchemaPrompt()
@@ -0,0 +1,122 @@
+import math
+from datetime import date, datetime, time as dt_time
+from typing import Any, Callable, Dict, List, Optional
+
+import neo4j.time
+from neo4j.graph import Node, Path, Relationship
+from neo4j.spatial import Point
+
+# Values that are already valid JSON; NaN and infinite floats are not, so floats get a converter
+NATIVE_TYPES = frozenset({str, int, bool, type(None)})
+
+# Rows looked at before the converter of a column that has only been null so far is settled
+INFERENCE_ROWS = 20
+
+
+def to_json(value: Any) -> Any:
+    """Convert any value returned by Neo4j into plain JSON types"""
+    kind = type(value)
+    if kind in NATIVE_TYPES:
+        return value
+    if kind is float:
+        return value if math.isfinite(value) else None
+    if isinstance(value, (neo4j.time.DateTime, neo4j.time.Date, neo4j.time.Time, neo4j.time.Duration)):
+        return value.iso_format()
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, (Node, Relationship)):
+        # Queries return entities for their properties; ids are internal to Neo4j
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, Path):
+        return [to_json(node) for node in value.nodes]
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, Point):
+        return list(value)
+    if hasattr(value, "item"):
+        # numpy scalars
+        return to_json(value.item())
+    return str(value)
+
+
+def iso_format(value: Any) -> Any:
+    return value.iso_format()
+
+
+def finite_float(value: float) -> Optional[float]:
+    return value if math.isfinite(value) else None
+
+
+# Converters for column types seen in results; any other type goes through to_json
+COLUMN_CONVERTERS: Dict[type, Callable[[Any], Any]] = {
+    float: finite_float,
+    neo4j.time.DateTime: iso_format,
+    neo4j.time.Date: iso_format,
+    neo4j.time.Time: iso_format,
+    neo4j.time.Duration: iso_format,
+    datetime: datetime.isoformat,
+    date: date.isoformat
+}
+
+
+def column_converter(kind: type) -> Callable[[Any], Any]:
+    """Converter for a column whose values are of `kind`, falling back to to_json for stray values"""
+    convert = COLUMN_CONVERTERS.get(kind)
+    if convert is None:
+        return to_json
+
+    def convert_column_value(value):
+        return convert(value) if type(value) is kind else to_json(value)
+
+    return convert_column_value
+
+
+class RowSerializer:
+    """Serialize the records of one query, choosing a converter per column from its first values"""
+
+    __slots__ = ("keys", "native", "converted", "pending", "rows_seen")
+
+    def __init__(self):
+        self.keys = None
+        self.native = []  # Columns of JSON native values, only checked for strays
+        self.converted = []  # (column, converter)
+        self.pending = []  # Columns that have only been null so far
+        self.rows_seen = 0
+
+    def _infer(self, values: List[Any]):
+        pending = []
+        for index in self.pending:
+            kind = type(values[index])
+            if kind is type(None) and self.rows_seen < INFERENCE_ROWS:
+                pending.append(index)
+            elif kind in NATIVE_TYPES:
+                self.native.append(index)
+            else:
+                self.converted.append((index, column_converter(kind)))
+        self.pending = pending
+
+    def __call__(self, record) -> Dict[str, Any]:
+        if self.keys is None:
+            self.keys = tuple(record.keys())
+            self.pending = list(range(len(self.keys)))
+        values = list(record)
+        if self.pending:
+            self._infer(values)
+            for index in self.pending:
+                values[index] = to_json(values[index])
+        self.rows_seen += 1
+
+        for index in self.native:
+            if type(values[index]) not in NATIVE_TYPES:
+                values[index] = to_json(values[index])
+        for index, convert in self.converted:
+            values[index] = convert(values[index])
+        return dict(zip(self.keys, values))
+
+
+def serialize_records(records) -> List[Dict[str, Any]]:
+    """Serialize all records of a result into JSON ready dicts"""
+    serializer = RowSerializer()
+    return [serializer(record) for record in records]
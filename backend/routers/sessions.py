@@ -0,0 +1,459 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("sessions")
+
+# Configuration
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")  # "memory" or "sqlite"
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", ".sessions.sqlite")  # Shared file for the sqlite backend
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))  # Idle sessions expire after this
+SESSION_HISTORY_TURNS = int(os.getenv("SESSION_HISTORY_TURNS", "50"))  # Turns kept per session, oldest dropped first
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))  # Total history size cap
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+
+# Rough per turn overhead on top of the text, for the byte budget
+TURN_OVERHEAD_BYTES = 120
+
+# Columns of session_turns in Turn argument order
+TURN_COLUMNS = "seq, question, answer, query, insights, asked_at, answered_at, fragment"
+
+
+def format_message(sender: str, text: str, at: float, **extra) -> Dict[str, Any]:
+    moment = datetime.fromtimestamp(at)
+    return {"sender": sender, "text": text, "time": moment.strftime("%I:%M %p"),
+            "timestamp": moment.astimezone().isoformat(timespec="seconds"), **extra}
+
+
+class Turn:
+    """One question and the compact answer to it, with its chat history messages serialized once"""
+
+    __slots__ = ("seq", "question", "answer", "query", "insights", "asked_at", "answered_at", "fragment")
+
+    def __init__(self, seq: int, question: str, answer: Optional[str] = None, query: str = "",
+                 insights: Optional[str] = None, asked_at: Optional[float] = None,
+                 answered_at: Optional[float] = None, fragment: Optional[str] = None):
+        self.seq = seq  # Position in the session, used as the history cursor
+        self.question = question
+        self.answer = answer  # The answer's text explanation, None until answered
+        self.query = query  # The Cypher query behind the answer, if any
+        self.insights = insights
+        self.asked_at = asked_at or time.time()
+        self.answered_at = answered_at
+        self.fragment = fragment if fragment is not None else self.render()
+
+    def messages(self) -> List[Dict[str, Any]]:
+        messages = [format_message("user", self.question, self.asked_at)]
+        if self.answer is not None:
+            messages.append(format_message("bot", self.answer or "No response", self.answered_at or self.asked_at,
+                                           tableData=None, tableInsights=self.insights))
+        return messages
+
+    def render(self) -> str:
+        """The turn's messages as a JSON fragment, ready to be joined into a history response"""
+        return ",".join(json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+                        for message in self.messages())
+
+    def answered(self, answer: str, query: str = "", insights: Optional[str] = None):
+        self.answer = answer
+        self.query = query or ""
+        self.insights = insights
+        self.answered_at = time.time()
+        self.fragment = self.render()
+
+    def size(self) -> int:
+        return (len(self.question) + len(self.answer or "") + len(self.query) + len(self.insights or "")
+                + len(self.fragment) + TURN_OVERHEAD_BYTES)
+
+
+class SessionStore(ABC):
+    """Interface for the session backends: a ring buffer of turns per session, idle expiry and a size budget"""
+
+    def __init__(self, ttl: float, history_turns: int, max_bytes: int, max_sessions: int):
+        self.ttl = ttl
+        self.history_turns = history_turns
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.created = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def create(self) -> str:
+        """Start a session and return its id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_question(self, session_id: str, question: str) -> Optional[int]:
+        """Open a turn with the question and return its seq; returns None for unknown sessions"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_answer(self, session_id: str, seq: int, answer: str, query: str = "", insights: Optional[str] = None):
+        """Complete the turn opened by add_question; overlapping requests each answer their own turn"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def version(self, session_id: str) -> Optional[int]:
+        """Counter that changes whenever the session's history does, or None for unknown sessions"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def history(self, session_id: str) -> Optional[List[Turn]]:
+        """All kept turns, oldest first, or None for unknown sessions"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def size(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def page(self, session_id: str, before: Optional[int], limit: int) -> Optional[Tuple[List[Turn], bool]]:
+        """Up to `limit` turns before the `before` cursor, oldest first, and whether older turns remain"""
+        turns = self.history(session_id)
+        if turns is None:
+            return None
+        if before is not None:
+            turns = [turn for turn in turns if turn.seq < before]
+        return turns[-limit:], len(turns) > limit
+
+    def recent(self, session_id: str, count: int) -> List[Turn]:
+        """The last `count` answered turns, oldest first"""
+        turns = [turn for turn in self.history(session_id) or [] if turn.answer is not None]
+        return turns[-count:] if count > 0 else []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "created": self.created,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "ttl_seconds": self.ttl,
+            "history_turns": self.history_turns,
+            "max_bytes": self.max_bytes,
+            "max_sessions": self.max_sessions,
+            **self.size()
+        }
+
+
+class SessionState:
+    __slots__ = ("turns", "last_access", "size", "version")
+
+    def __init__(self, history_turns: int):
+        self.turns = deque(maxlen=history_turns)  # Ring buffer: appending to a full deque drops the oldest turn
+        self.last_access = time.time()
+        self.size = 0
+        self.version = 0
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions kept in this process, least recently used first out when over budget"""
+
+    def __init__(self, ttl: float, history_turns: int, max_bytes: int, max_sessions: int):
+        super().__init__(ttl, history_turns, max_bytes, max_sessions)
+        self._sessions = OrderedDict()  # session_id -> SessionState, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def create(self) -> str:
+        session_id = str(uuid.uuid4())
+        with self._lock:
+            self._sessions[session_id] = SessionState(self.history_turns)
+            self.created += 1
+            self._evict()
+        return session_id
+
+    def _get(self, session_id: str) -> Optional[SessionState]:
+        """Return a live session and mark it used; the caller holds the lock"""
+        state = self._sessions.get(session_id)
+        if state is None:
+            return None
+        now = time.time()
+        if now - state.last_access > self.ttl:
+            self._remove(session_id)
+            self.expirations += 1
+            return None
+        state.last_access = now
+        self._sessions.move_to_end(session_id)
+        return state
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return self._get(session_id) is not None
+
+    def add_question(self, session_id: str, question: str) -> Optional[int]:
+        with self._lock:
+            state = self._get(session_id)
+            if state is None:
+                return None
+            if len(state.turns) == state.turns.maxlen:
+                self._resize(state, -state.turns[0].size())
+            turn = Turn(state.version + 1, question)
+            state.turns.append(turn)
+            state.version += 1
+            self._resize(state, turn.size())
+            self._evict()
+            return turn.seq
+
+    def add_answer(self, session_id: str, seq: int, answer: str, query: str = "", insights: Optional[str] = None):
+        with self._lock:
+            state = self._get(session_id)
+            if state is None:
+                return
+            # The turn may have been dropped from the ring buffer meanwhile
+            turn = next((turn for turn in reversed(state.turns) if turn.seq == seq), None)
+            if turn is None or turn.answer is not None:
+                return
+            before = turn.size()
+            turn.answered(answer, query, insights)
+            state.version += 1
+            self._resize(state, turn.size() - before)
+            self._evict()
+
+    def version(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            state = self._get(session_id)
+            return state.version if state is not None else None
+
+    def history(self, session_id: str) -> Optional[List[Turn]]:
+        with self._lock:
+            state = self._get(session_id)
+            return list(state.turns) if state is not None else None
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id)
+            return True
+
+    def size(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions), "bytes": self._bytes}
+
+    def _resize(self, state: SessionState, delta: int):
+        state.size += delta
+        self._bytes += delta
+
+    def _remove(self, session_id: str):
+        state = self._sessions.pop(session_id)
+        self._bytes -= state.size
+
+    def _evict(self):
+        """Expire idle sessions at the old end, then drop the least recently used until within budget"""
+        now = time.time()
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_access > self.ttl:
+                self._remove(session_id)
+                self.expirations += 1
+            elif self._bytes > self.max_bytes or len(self._sessions) > self.max_sessions:
+                self._remove(session_id)
+                self.evictions += 1
+            else:
+                break
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions stored in a SQLite file so several uvicorn workers see the same conversations"""
+
+    def __init__(self, ttl: float, history_turns: int, max_bytes: int, max_sessions: int, path: str):
+        super().__init__(ttl, history_turns, max_bytes, max_sessions)
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_lru ON sessions (last_access)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_turns (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT,
+                    query TEXT NOT NULL DEFAULT '',
+                    insights TEXT,
+                    asked_at REAL NOT NULL,
+                    answered_at REAL,
+                    fragment TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (session_id, seq)
+                )
+            """)
+            # Files created before turns kept their rendered messages
+            for table, column, definition in (("sessions", "version", "INTEGER NOT NULL DEFAULT 0"),
+                                              ("session_turns", "insights", "TEXT"),
+                                              ("session_turns", "answered_at", "REAL"),
+                                              ("session_turns", "fragment", "TEXT NOT NULL DEFAULT ''")):
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+
+    def _touch(self, conn, session_id: str) -> bool:
+        """Mark a live session used, expiring it if it has been idle too long"""
+        now = time.time()
+        row = conn.execute("SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return False
+        if now - row[0] > self.ttl:
+            self._remove(conn, session_id)
+            self.expirations += 1
+            return False
+        conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        return True
+
+    def create(self) -> str:
+        session_id = str(uuid.uuid4())
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT INTO sessions (session_id, last_access) VALUES (?, ?)", (session_id, time.time()))
+            self.created += 1
+            self._evict(conn)
+        return session_id
+
+    def exists(self, session_id: str) -> bool:
+        with closing(self._connect()) as conn, conn:
+            return self._touch(conn, session_id)
+
+    def add_question(self, session_id: str, question: str) -> Optional[int]:
+        with closing(self._connect()) as conn, conn:
+            if not self._touch(conn, session_id):
+                return None
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM session_turns WHERE session_id = ?",
+                               (session_id,)).fetchone()[0]
+            turn = Turn(seq, question)
+            conn.execute(
+                "INSERT INTO session_turns (session_id, seq, question, asked_at, fragment) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, question, turn.asked_at, turn.fragment)
+            )
+            conn.execute("UPDATE sessions SET version = version + 1 WHERE session_id = ?", (session_id,))
+            # Keep the ring buffer at history_turns
+            conn.execute("DELETE FROM session_turns WHERE session_id = ? AND seq <= ?",
+                         (session_id, seq - self.history_turns))
+            self._update_size(conn, session_id)
+            self._evict(conn)
+            return seq
+
+    def add_answer(self, session_id: str, seq: int, answer: str, query: str = "", insights: Optional[str] = None):
+        with closing(self._connect()) as conn, conn:
+            if not self._touch(conn, session_id):
+                return
+            row = conn.execute(f"SELECT {TURN_COLUMNS} FROM session_turns WHERE session_id = ? AND seq = ?",
+                               (session_id, seq)).fetchone()
+            if row is None or row[2] is not None:
+                return
+            turn = Turn(*row)
+            turn.answered(answer, query, insights)
+            conn.execute("""
+                UPDATE session_turns SET answer = ?, query = ?, insights = ?, answered_at = ?, fragment = ?
+                WHERE session_id = ? AND seq = ?
+            """, (turn.answer, turn.query, turn.insights, turn.answered_at, turn.fragment, session_id, turn.seq))
+            conn.execute("UPDATE sessions SET version = version + 1 WHERE session_id = ?", (session_id,))
+            self._update_size(conn, session_id)
+            self._evict(conn)
+
+    def version(self, session_id: str) -> Optional[int]:
+        with closing(self._connect()) as conn, conn:
+            if not self._touch(conn, session_id):
+                return None
+            return conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def history(self, session_id: str) -> Optional[List[Turn]]:
+        with closing(self._connect()) as conn, conn:
+            if not self._touch(conn, session_id):
+                return None
+            rows = conn.execute(f"SELECT {TURN_COLUMNS} FROM session_turns WHERE session_id = ? ORDER BY seq",
+                                (session_id,)).fetchall()
+        return [Turn(*row) for row in rows]
+
+    def page(self, session_id: str, before: Optional[int], limit: int) -> Optional[Tuple[List[Turn], bool]]:
+        with closing(self._connect()) as conn, conn:
+            if not self._touch(conn, session_id):
+                return None
+            # One extra row tells whether older turns remain
+            rows = conn.execute(
+                f"SELECT {TURN_COLUMNS} FROM session_turns WHERE session_id = ? AND seq < ? "
+                f"ORDER BY seq DESC LIMIT ?",
+                (session_id, before if before is not None else 2 ** 62, limit + 1)
+            ).fetchall()
+        return [Turn(*row) for row in reversed(rows[:limit])], len(rows) > limit
+
+    def delete(self, session_id: str) -> bool:
+        with closing(self._connect()) as conn, conn:
+            return self._remove(conn, session_id) > 0
+
+    def size(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn:
+            sessions, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return {"sessions": sessions, "bytes": total}
+
+    @staticmethod
+    def _update_size(conn, session_id: str):
+        conn.execute(f"""
+            UPDATE sessions SET size = (
+                SELECT COALESCE(SUM(LENGTH(question) + LENGTH(COALESCE(answer, '')) + LENGTH(query)
+                                    + LENGTH(COALESCE(insights, '')) + LENGTH(fragment) + {TURN_OVERHEAD_BYTES}), 0)
+                FROM session_turns WHERE session_id = ?
+            ) WHERE session_id = ?
+        """, (session_id, session_id))
+
+    @staticmethod
+    def _remove(conn, session_id: str) -> int:
+        conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+        return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+
+    def _evict(self, conn):
+        """Drop expired sessions, then the least recently used until both budgets are respected"""
+        expired = [row[0] for row in conn.execute(
+            "SELECT session_id FROM sessions WHERE last_access < ?", (time.time() - self.ttl,)).fetchall()]
+        for session_id in expired:
+            self._remove(conn, session_id)
+        self.expirations += len(expired)
+
+        sessions, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        if sessions <= self.max_sessions and total <= self.max_bytes:
+            return
+        for session_id, size in conn.execute("SELECT session_id, size FROM sessions ORDER BY last_access").fetchall():
+            if sessions <= self.max_sessions and total <= self.max_bytes:
+                break
+            self._remove(conn, session_id)
+            sessions -= 1
+            total -= size
+            self.evictions += 1
+
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND, path: str = SESSION_STORE_PATH) -> SessionStore:
+    """Create the session store with the configured backend, falling back to memory if SQLite is unavailable"""
+    if backend == "sqlite":
+        try:
+            return SQLiteSessionStore(SESSION_TTL_SECONDS, SESSION_HISTORY_TURNS, SESSION_MAX_BYTES,
+                                      SESSION_MAX_SESSIONS, path)
+        except sqlite3.Error as e:
+            logger.error(f"Could not open SQLite session store at {path}, using memory instead: {str(e)}")
+    return MemorySessionStore(SESSION_TTL_SECONDS, SESSION_HISTORY_TURNS, SESSION_MAX_BYTES, SESSION_MAX_SESSIONS)
+
+
+# Global instance to be imported by other modules
+session_store = create_session_store()
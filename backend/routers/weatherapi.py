@@ -4,7 +4,7 @@ import requests_cache
 from retry_requests import retry
 import logging
 from datetime import datetime, timedelta
-from neo4j import GraphDatabase
+from routers.database import neo4j_registry
 import calendar
 import time
 import os
@@ -38,11 +38,8 @@ class WeatherUpdater:
         self.openmeteo = openmeteo_requests.Client(session=retry_session)
 
     def _get_db_driver(self):
-        """Create and return a Neo4j driver instance."""
-        return GraphDatabase.driver(
-            self.neo4j_uri,
-            auth=(self.neo4j_user, self.neo4j_password)
-        )
+        """Return the shared, pooled Neo4j driver."""
+        return neo4j_registry.require()
 
     def _get_sri_lanka_season(self, month: int) -> str:
         """Determine the season in Sri Lanka based on the month."""
@@ -88,26 +85,25 @@ class WeatherUpdater:
                 return []
 
             # Get last update times from database
-            with self._get_db_driver() as driver:
-                with driver.session() as session:
-                    result = session.run("""
-                        MATCH (a:Area)
-                        OPTIONAL MATCH (a)-[:HAS_WEATHER]->(w:Weather)
-                        RETURN a.Areas as area, 
-                               a.Latitude as latitude,
-                               a.Longitude as longitude,
-                               w.last_updated as last_updated
-                    """)
-
-                    area_updates = {}
-                    for record in result:
-                        area = record["area"]
-                        area_updates[area] = {
-                            "last_updated": datetime.fromisoformat(record["last_updated"]) if record[
-                                "last_updated"] else datetime.min,
-                            "latitude": record["latitude"],
-                            "longitude": record["longitude"]
-                        }
+            with neo4j_registry.session() as session:
+                result = session.run("""
+                    MATCH (a:Area)
+                    OPTIONAL MATCH (a)-[:HAS_WEATHER]->(w:Weather)
+                    RETURN a.Areas as area, 
+                           a.Latitude as latitude,
+                           a.Longitude as longitude,
+                           w.last_updated as last_updated
+                """)
+
+                area_updates = {}
+                for record in result:
+                    area = record["area"]
+                    area_updates[area] = {
+                        "last_updated": datetime.fromisoformat(record["last_updated"]) if record[
+                            "last_updated"] else datetime.min,
+                        "latitude": record["latitude"],
+                        "longitude": record["longitude"]
+                    }
 
             # Determine locations needing update
             cutoff_time = datetime.now() - timedelta(hours=self.update_interval_hours)
@@ -332,68 +328,66 @@ class WeatherUpdater:
 
     def _update_database(self, area: str, monthly_data: Dict[int, Dict[str, Any]], last_updated: str):
         """Update Neo4j database with weather data."""
-        with self._get_db_driver() as driver:
-            with driver.session() as session:
-                # Update all 12 months
-                for month_num in range(1, 13):
-                    try:
-                        data = monthly_data.get(month_num, {
-                            "month_name": calendar.month_name[month_num],
-                            "season": self._get_sri_lanka_season(month_num),
-                            "description": "No data available",
-                            "avg_temp": 0.0,
-                            "avg_precip": 0.0,
-                            "avg_wind": 0.0,
-                            "precip_prob": 0.0
-                        })
-
-                        session.run("""
-                            MERGE (w:Weather {Month: $month})
-                            SET w += $data,
-                                w.last_updated = $last_updated
-                            WITH w
-                            MATCH (a:Area {Areas: $area})
-                            MERGE (a)-[r:HAS_WEATHER]->(w)
-                            SET a.last_weather_update = $last_updated
-                        """, {
-                            "month": calendar.month_name[month_num],
-                            "area": area,
-                            "data": {
-                                "season": data["season"],
-                                "description": data["description"],
-                                "avg_temp": data["avg_temp"],
-                                "avg_precip": data["avg_precip"],
-                                "avg_wind": data["avg_wind"],
-                                "precip_prob": data["precip_prob"],
-                                **({k: v for k, v in data.items() if k in [
-                                    "current_temp", "max_temp", "min_temp",
-                                    "precipitation", "precipitation_prob",
-                                    "wind_speed"
-                                ]} if "current_temp" in data else {})
-                            },
-                            "last_updated": last_updated
-                        })
-                    except Exception as e:
-                        logger.error(f"Database error for {area} month {month_num}: {str(e)}")
+        with neo4j_registry.session() as session:
+            # Update all 12 months
+            for month_num in range(1, 13):
+                try:
+                    data = monthly_data.get(month_num, {
+                        "month_name": calendar.month_name[month_num],
+                        "season": self._get_sri_lanka_season(month_num),
+                        "description": "No data available",
+                        "avg_temp": 0.0,
+                        "avg_precip": 0.0,
+                        "avg_wind": 0.0,
+                        "precip_prob": 0.0
+                    })
+
+                    session.run("""
+                        MERGE (w:Weather {Month: $month})
+                        SET w += $data,
+                            w.last_updated = $last_updated
+                        WITH w
+                        MATCH (a:Area {Areas: $area})
+                        MERGE (a)-[r:HAS_WEATHER]->(w)
+                        SET a.last_weather_update = $last_updated
+                    """, {
+                        "month": calendar.month_name[month_num],
+                        "area": area,
+                        "data": {
+                            "season": data["season"],
+                            "description": data["description"],
+                            "avg_temp": data["avg_temp"],
+                            "avg_precip": data["avg_precip"],
+                            "avg_wind": data["avg_wind"],
+                            "precip_prob": data["precip_prob"],
+                            **({k: v for k, v in data.items() if k in [
+                                "current_temp", "max_temp", "min_temp",
+                                "precipitation", "precipitation_prob",
+                                "wind_speed"
+                            ]} if "current_temp" in data else {})
+                        },
+                        "last_updated": last_updated
+                    })
+                except Exception as e:
+                    logger.error(f"Database error for {area} month {month_num}: {str(e)}")
 
         logger.info(f"Updated database for {area}")
 
     def get_update_stats(self) -> Dict[str, Any]:
         """Get statistics about weather updates."""
         try:
-            with self._get_db_driver() as driver:
-                with driver.session() as session:
-                    result = session.run("""
-                        MATCH (a:Area)
-                        WITH count(a) as total_areas
-                        MATCH (a:Area)-[:HAS_WEATHER]->(w:Weather)
-                        RETURN total_areas,
-                               count(DISTINCT a) as areas_with_weather,
-                               min(w.last_updated) as oldest_update,
-                               max(w.last_updated) as newest_update
-                    """)
-                    record = result.single()
-                    return dict(record) if record else None
+            with neo4j_registry.session() as session:
+                result = session.run("""
+                    MATCH (a:Area)
+                    WITH count(a) as total_areas
+                    MATCH (a:Area)-[:HAS_WEATHER]->(w:Weather)
+                    RETURN total_areas,
+                           count(DISTINCT a) as areas_with_weather,
+                           min(w.last_updated) as oldest_update,
+                           max(w.last_updated) as newest_update
+                """)
+                record = result.single()
+                return dict(record) if record else None
         except Exception as e:
             logger.error(f"Error getting stats: {str(e)}")
             return None
\ No newline at end of file
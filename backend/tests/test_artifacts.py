@@ -0,0 +1,24 @@
+import os
+import time
+
+from routers.artifacts import ArtifactStore
+
+
+def test_read_keeps_table_from_expiring(tmp_path):
+    store = ArtifactStore(tmp_path, ttl=60)
+    read, unread = store.put("<table>read</table>"), store.put("<table>unread</table>")
+    written_at = time.time() - 120
+    for name in (read, unread):
+        os.utime(tmp_path / name, (written_at, written_at))
+
+    assert store.touch(read) == tmp_path / read
+    store.evict()
+
+    assert store.path(read) is not None
+    assert store.path(unread) is None
+
+
+def test_touch_rejects_unknown_names(tmp_path):
+    store = ArtifactStore(tmp_path)
+    assert store.touch("../secrets.html") is None
+    assert store.touch("table_" + "0" * 64 + ".html") is None
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from routers.cache import MemoryCacheBackend, SQLiteCacheBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteCacheBackend("test", 3600, 1024 * 1024, 100, str(tmp_path / "cache.sqlite"))
+    return MemoryCacheBackend("test", 3600, 1024 * 1024, 100)
+
+
+def test_zero_ttl_is_not_the_default(cache):
+    cache.set("expired", "value", ttl=0)
+    cache.set("kept", "value")
+    assert cache.get("expired") is None
+    assert cache.get("kept") == "value"
+
+
+def test_async_access(cache):
+    async def roundtrip():
+        await cache.set_async("key", {"rows": [1, 2]})
+        value = await cache.get_async("key")
+        await cache.delete_async("key")
+        return value, await cache.get_async("key")
+
+    assert asyncio.run(roundtrip()) == ({"rows": [1, 2]}, None)
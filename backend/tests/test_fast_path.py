@@ -0,0 +1,14 @@
+from routers.fast_path import match_template
+
+QUERY = 'MATCH (a:Area {Areas: "Galle"})-[:HAS_ACCOMADATION]->(acc:Accomadation) RETURN acc.Rating AS Rating'
+
+
+def test_template_fills_entities_named_in_the_question():
+    matched = match_template("Accommodations in Ella", [("Accommodations in Galle", QUERY, 0.9)])
+    assert matched is not None and '"Ella"' in matched[0]
+
+
+def test_template_with_hardcoded_entity_is_not_used():
+    query = 'MATCH (a:Area {Areas: "Arugam Bay"})-[:HAS_WEATHER]->(w:Weather {month: "January"}) RETURN w.season'
+    assert match_template("What's the weather like in January?",
+                          [("What's the weather like in January?", query, 0.9)]) is None
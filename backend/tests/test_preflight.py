@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from routers import preflight
+from routers.preflight import add_limit
+
+
+def test_add_limit_appends_limit_to_single_return():
+    assert add_limit("MATCH (a:Area) RETURN a.Areas AS Area;", 10) == "MATCH (a:Area) RETURN a.Areas AS Area\nLIMIT 10;"
+
+
+def test_add_limit_keeps_existing_limit():
+    assert add_limit("MATCH (a:Area) RETURN a.Areas AS Area LIMIT 5") is None
+
+
+def test_add_limit_skips_union():
+    query = "MATCH (h:Hotel) RETURN h.Name AS Name UNION MATCH (r:Restaurant) RETURN r.Name AS Name"
+    assert add_limit(query) is None
+    assert add_limit(query.replace("UNION", "union all")) is None
+
+
+def test_check_rejects_all_nodes_scan_without_limit(monkeypatch):
+    plan = {"operatorType": "ProduceResults@neo4j", "args": {"EstimatedRows": 10.0},
+            "children": [{"operatorType": "AllNodesScan@neo4j", "args": {"EstimatedRows": 10.0}}]}
+    monkeypatch.setattr(preflight, "explain", lambda driver, query: SimpleNamespace(plan=plan, query_type="r"))
+    registry = SimpleNamespace(get=lambda: object())
+
+    verdict = preflight.check(registry, "MATCH (n) WHERE n.Name = 'Ella' RETURN n.Name AS Name")
+    assert verdict["status"] == "rejected"
+    assert verdict["reason"].startswith("AllNodesScan")
+    assert "LIMIT" not in verdict["query"]
@@ -0,0 +1,34 @@
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from routers.chatbot import Question, Settings, build_query_messages
+from routers.sessions import session_store
+
+QUESTIONS = [
+    ("What is the weather like in Ella in March?", "12/03/2025", "09:15"),
+    ("Suggest hotels near Sigiriya", "12/03/2025", "14:40"),
+    ("Which beaches in Galle are good for surfing?", "13/03/2025", "18:05"),
+    ("Emergency contacts in Kandy", "14/03/2025", "23:59"),
+]
+
+
+def build(question_text: str, date: str, time: str, session_id: str):
+    settings = Settings(language="English", politeness_level="Friendly", formality="Informal", creativity=0.5,
+                        response_length="Medium")
+    question = Question(question=question_text, session_id=session_id, settings=settings, date=date, time=time)
+    return build_query_messages(question_text, session_id, question)
+
+
+def test_system_prompt_is_byte_identical_across_requests():
+    # One session without history and one with, so only the request message may differ
+    session_ids = [session_store.create(), session_store.create()]
+    seq = session_store.add_question(session_ids[1], "Where is Ella?")
+    session_store.add_answer(session_ids[1], seq, "Ella is in the Badulla district.")
+    prompts = [build(text, date, time, session_ids[index % 2])
+               for index, (text, date, time) in enumerate(QUESTIONS)]
+
+    system_prompts = {messages[0]["content"][0]["text"] for messages in prompts}
+    assert len(system_prompts) == 1
+    # The per-request parts are in the second message
+    assert len({messages[1]["content"][0]["text"] for messages in prompts}) == len(QUESTIONS)
@@ -0,0 +1,46 @@
+import pytest
+
+from routers.sessions import MemorySessionStore, SessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(3600, 50, 1024 * 1024, 100, str(tmp_path / "sessions.sqlite"))
+    return MemorySessionStore(3600, 50, 1024 * 1024, 100)
+
+
+def test_overlapping_answers_complete_their_own_turns(store):
+    session_id = store.create()
+    first = store.add_question(session_id, "Where is Ella?")
+    second = store.add_question(session_id, "Where is Galle?")
+
+    store.add_answer(session_id, first, "Ella is in the Badulla district.")
+    store.add_answer(session_id, second, "Galle is on the south coast.")
+
+    assert [(turn.question, turn.answer) for turn in store.history(session_id)] == [
+        ("Where is Ella?", "Ella is in the Badulla district."),
+        ("Where is Galle?", "Galle is on the south coast.")
+    ]
+
+
+def test_open_turn_does_not_block_later_answers(store):
+    session_id = store.create()
+    store.add_question(session_id, "Where is Ella?")
+    seq = store.add_question(session_id, "Where is Galle?")
+    store.add_answer(session_id, seq, "Galle is on the south coast.")
+
+    assert [turn.answer for turn in store.recent(session_id, 3)] == ["Galle is on the south coast."]
+
+
+def test_unknown_session_has_no_turns(store):
+    assert store.add_question("missing", "Where is Ella?") is None
+
+
+def test_incomplete_backend_fails_when_created():
+    class PartialStore(SessionStore):
+        def create(self) -> str:
+            return "session"
+
+    with pytest.raises(TypeError):
+        PartialStore(3600, 50, 1024, 10)